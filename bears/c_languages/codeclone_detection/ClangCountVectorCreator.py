@@ -107,18 +107,29 @@ class ClangCountVectorCreator:
 
         return result
 
-    def get_vectors_for_file(self, filename, include_paths=()):
+    def get_vectors_for_file(self,
+                             filename,
+                             include_paths=(),
+                             included_files=None):
         """
         Creates a dictionary associating each function name within the given
         file with another dictionary associating each variable name (local to
         the function) with a CountVector object. Functions of included files
         will not be analyzed.
 
-        :param filename: The path to the file to parse.
-        :return:         The dictionary holding CountVectors for all variables
-                         in all functions.
+        :param filename:       The path to the file to parse.
+        :param include_paths:  The paths to search included files in.
+        :param included_files: An optional set the paths of all files the
+                               file includes, directly or indirectly, are
+                               added to.
+        :return:               The dictionary holding CountVectors for all
+                               variables in all functions.
         """
         args = ['-I'+path for path in include_paths]
-        root = Index.create().parse(filename, args=args).cursor
+        translation_unit = Index.create().parse(filename, args=args)
+        if included_files is not None:
+            included_files.update(inclusion.include.name
+                                  for inclusion
+                                  in translation_unit.get_includes())
 
-        return self._get_vectors_for_cursor(root, filename)
+        return self._get_vectors_for_cursor(translation_unit.cursor, filename)
@@ -1,4 +1,5 @@
 import functools
+import multiprocessing
 from itertools import combinations
 
 from bears.c_languages.ClangBear import clang_available, ClangBear
@@ -7,7 +8,10 @@ from bears.c_languages.codeclone_detection.ClangCountingConditions import (
 from bears.c_languages.codeclone_detection.ClangCountVectorCreator import (
     ClangCountVectorCreator)
 from bears.c_languages.codeclone_detection.CloneDetectionRoutines import (
-    compare_functions, get_count_matrices)
+    compare_functions, get_count_array, get_count_matrices,
+    get_difference_lower_bound, get_function_features, linear_sum_assignment,
+    scipy_assignment)
+from bears.general.PersistentCache import PersistentCache
 from coala_utils.string_processing.StringConverter import StringConverter
 from coalib.bears.GlobalBear import GlobalBear
 from dependency_management.requirements.PipRequirement import PipRequirement
@@ -17,6 +21,12 @@ from coalib.settings.Setting import path_list, typed_ordered_dict
 from coala_utils.decorators import (enforce_signature, generate_ordering,
                                     generate_repr)
 
+# The number of function pairs a worker process compares at once
+DIFFERENCE_CHUNK_SIZE = 500
+
+# The maximum number of files to keep count matrices for between runs
+COUNT_MATRIX_CACHE_SIZE = 10000
+
 # counting_condition_dict is a function object generated by typed_dict. This
 # function takes a setting and creates a dictionary out of it while it
 # converts all keys to counting condition function objects (via the
@@ -73,13 +83,15 @@ def get_difference(function_pair,
                    count_matrices,
                    average_calculation,
                    poly_postprocessing,
-                   exp_postprocessing):
+                   exp_postprocessing,
+                   assignment_backend=None):
     """
     Retrieves the difference between two functions using the munkres algorithm.
 
     :param function_pair:       A tuple containing both indices for the
                                 count_matrices dictionary.
-    :param count_matrices:      A dictionary holding CMs.
+    :param count_matrices:      A dictionary holding CMs or their count
+                                arrays.
     :param average_calculation: If set to true the difference calculation
                                 function will take the average of all variable
                                 differences as the difference, else it will
@@ -91,6 +103,8 @@ def get_difference(function_pair,
     :param exp_postprocessing:  If set to true, the difference value of big
                                 function pairs will be reduced using an
                                 exponential approach.
+    :param assignment_backend:  The function to match the variables with,
+                                see ``get_assignment``.
     :return:                    A tuple containing both function ids and their
                                 difference.
     """
@@ -101,13 +115,84 @@ def get_difference(function_pair,
                               count_matrices[function_2],
                               average_calculation,
                               poly_postprocessing,
-                              exp_postprocessing))
+                              exp_postprocessing,
+                              assignment_backend))
+
+
+# The options of get_difference of a worker process. They are set once
+# when the worker is started, so the count matrices are not pickled for
+# every chunk of function pairs.
+_worker_state = {}
+
+
+def _init_worker(count_matrices, options):
+    _worker_state['get_difference'] = functools.partial(
+        get_difference, count_matrices=count_matrices, **options)
+
+
+def _get_differences(function_pairs):
+    return list(map(_worker_state['get_difference'], function_pairs))
+
+
+def get_differences(function_pairs,
+                    count_matrices,
+                    progress_callback,
+                    max_workers=1,
+                    **options):
+    """
+    Retrieves the differences between the functions of many function pairs,
+    optionally in multiple processes.
+
+    :param function_pairs:    A list of tuples containing both indices for
+                              the count_matrices dictionary.
+    :param count_matrices:    A dictionary holding CMs or their count
+                              arrays, which are smaller to hand to other
+                              processes.
+    :param progress_callback: A function with one float argument which is
+                              called regularly with the progress percentage
+                              (float) as an argument.
+    :param max_workers:       The number of processes to use. 1 compares
+                              the functions in this process, 0 uses one
+                              process per CPU.
+    :param options:           The keyword arguments to pass to
+                              ``get_difference``, i.e.
+                              ``average_calculation``,
+                              ``poly_postprocessing``,
+                              ``exp_postprocessing`` and optionally
+                              ``assignment_backend``.
+    :return:                  A list of tuples containing both function ids
+                              and their difference, in the order of
+                              ``function_pairs``.
+    """
+    combination_length = max(len(function_pairs), 1)
+    if max_workers == 1 or len(function_pairs) <= DIFFERENCE_CHUNK_SIZE:
+        differences = []
+        partial_get_difference = functools.partial(
+            get_difference, count_matrices=count_matrices, **options)
+        for i, elem in enumerate(map(partial_get_difference,
+                                     function_pairs)):
+            if i % 50 == 0:
+                progress_callback(100*i/combination_length)
+            differences.append(elem)
+        return differences
+
+    chunks = [function_pairs[i:i+DIFFERENCE_CHUNK_SIZE]
+              for i in range(0, len(function_pairs), DIFFERENCE_CHUNK_SIZE)]
+    differences = []
+    with multiprocessing.Pool(max_workers or None,
+                              _init_worker,
+                              (count_matrices, options)) as pool:
+        for chunk_differences in pool.imap(_get_differences, chunks):
+            progress_callback(100*len(differences)/combination_length)
+            differences.extend(chunk_differences)
+    return differences
 
 
 class ClangFunctionDifferenceBear(GlobalBear):
     check_prerequisites = classmethod(clang_available)
     LANGUAGES = ClangBear.LANGUAGES
-    REQUIREMENTS = ClangBear.REQUIREMENTS | {PipRequirement('munkres3', '1.0')}
+    REQUIREMENTS = ClangBear.REQUIREMENTS | {PipRequirement('munkres3', '1.0'),
+                                             PipRequirement('numpy', '1.13')}
 
     def run(self,
             counting_conditions: counting_condition_dict = default_cc_dict,
@@ -115,6 +200,9 @@ class ClangFunctionDifferenceBear(GlobalBear):
             poly_postprocessing: bool = True,
             exp_postprocessing: bool = False,
             extra_include_paths: path_list = (),
+            max_clone_difference: float = 0.185,
+            max_workers: int = 1,
+            fast_variable_matching: bool = False,
             ):
         """
         Retrieves similarities for code clone detection. Those can be reused in
@@ -124,6 +212,14 @@ class ClangFunctionDifferenceBear(GlobalBear):
         be clones at the same difference value than big functions which may
         provide a better refactoring opportunity for the user.
 
+        Function pairs whose difference can't be lower than
+        ``max_clone_difference`` are skipped without matching their
+        variables and are not part of the result.
+
+        The count matrices of the files are kept between runs, so files
+        which did not change, including the files they include, are not
+        parsed again.
+
         :param counting_conditions: A comma seperated list of counting
                                     conditions. Possible values are: used,
                                     returned, is_condition, in_condition,
@@ -153,6 +249,18 @@ class ClangFunctionDifferenceBear(GlobalBear):
         :param exp_postprocessing:  If set to true, the difference value of big
                                     function pairs will be reduced using an
                                     exponential approach.
+        :param max_clone_difference: The maximum difference a clone should
+                                     have.
+        :param max_workers:         The number of processes to parse files
+                                    and compare functions in. 0 uses one
+                                    process per CPU.
+        :param fast_variable_matching: Match the variables of functions
+                                       with SciPy, which is a lot faster
+                                       for functions with many variables.
+                                       If several matchings are equally
+                                       good it may choose another one, so
+                                       the differences can change slightly.
+                                       This needs SciPy to be installed.
         """
         self.debug('Using the following counting conditions:')
         for key, val in counting_conditions.items():
@@ -165,26 +273,44 @@ class ClangFunctionDifferenceBear(GlobalBear):
             list(self.file_dict.keys()),
             lambda prog: self.debug('{:2.4f}%...'.format(prog)),
             self.section['files'].origin,
-            collect_dirs(extra_include_paths))
+            collect_dirs(extra_include_paths),
+            PersistentCache(self.data_dir, COUNT_MATRIX_CACHE_SIZE),
+            max_workers)
 
         self.debug('Calculating differences...')
 
-        differences = []
+        count_arrays = {function: get_count_array(count_matrix)
+                        for function, count_matrix in count_matrices.items()}
+        features = {function: get_function_features(count_array)
+                    for function, count_array in count_arrays.items()}
+        function_pairs = [
+            (f1, f2) for f1, f2 in combinations(count_matrices, 2)
+            if get_difference_lower_bound(features[f1],
+                                          features[f2],
+                                          average_calculation,
+                                          poly_postprocessing,
+                                          exp_postprocessing)
+            < max_clone_difference]
+        assignment_backend = None
+        if fast_variable_matching:
+            if linear_sum_assignment is None:
+                self.warn('Fast variable matching needs SciPy. Install it '
+                          'with `pip install scipy`.')
+            else:
+                assignment_backend = scipy_assignment
+
         function_count = len(count_matrices)
-        # Thats n over 2, hardcoded to simplify calculation
-        combination_length = function_count * (function_count-1) / 2
-        partial_get_difference = functools.partial(
-            get_difference,
-            count_matrices=count_matrices,
+        self.debug('Comparing {} of {} function pairs...'.format(
+            len(function_pairs), function_count * (function_count-1) // 2))
+
+        differences = get_differences(
+            function_pairs,
+            count_arrays,
+            lambda prog: self.debug('{:2.4f}%...'.format(prog)),
+            max_workers,
             average_calculation=average_calculation,
             poly_postprocessing=poly_postprocessing,
-            exp_postprocessing=exp_postprocessing)
-
-        for i, elem in enumerate(
-                map(partial_get_difference,
-                    [(f1, f2) for f1, f2 in combinations(count_matrices, 2)])):
-            if i % 50 == 0:
-                self.debug('{:2.4f}%...'.format(100*i/combination_length))
-            differences.append(elem)
+            exp_postprocessing=exp_postprocessing,
+            assignment_backend=assignment_backend)
 
         yield ClangFunctionDifferenceResult(self, differences, count_matrices)
@@ -1,15 +1,24 @@
-import copy
+import functools
 import math
+import multiprocessing
 import os
 
+import numpy
 from munkres import Munkres
 
 from coalib.collecting.Collectors import collect_dirs
+from bears.c_languages.codeclone_detection.CountMatrixCache import (
+    CountMatrixCache, get_count_dict, get_file_entry)
 from bears.c_languages.codeclone_detection.CountVector import CountVector
 
 # Instantiate globally since this class is holding stateless public methods.
 munkres = Munkres()
 
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # pragma: no cover
+    linear_sum_assignment = None
+
 
 def exclude_function(count_matrix):
     """
@@ -40,32 +49,70 @@ def get_count_matrices(count_vector_creator,
                        filenames,
                        progress_callback,
                        base_path,
-                       extra_include_paths):
+                       extra_include_paths,
+                       cache=None,
+                       max_workers=1):
     """
     Retrieves matrices holding count vectors for all variables for all
     functions in the given file.
 
     :param count_vector_creator: A object with a get_vectors_for_file method
-                                 taking a filename as argument.
+                                 taking a filename, the include paths and a
+                                 set to add the included files to as
+                                 arguments.
     :param filenames:            The files to create count vectors for.
     :param progress_callback:    A function with one float argument which is
                                  called after processing each file with the
                                  progress percentage (float) as an argument.
     :param extra_include_paths:  A list containing additional include paths.
+    :param cache:                An optional ``PersistentCache`` to keep the
+                                 count matrices of the files in, so files
+                                 that did not change since the last run are
+                                 not parsed again.
+    :param max_workers:          The number of processes to parse files in.
+                                 0 uses one process per CPU.
     :return:                     A dict holding a tuple of (file, line,
                                  function) as key and as value a dict with
                                  variable names as key and count vector
                                  objects as value.
     """
-    result = {}
     maxlen = len(filenames)
     include_paths = collect_dirs([os.path.dirname(base_path) + '/**'])
     include_paths += extra_include_paths
 
-    for i, filename in enumerate(filenames):
-        progress_callback(100*(i/maxlen))
-        count_dict = count_vector_creator.get_vectors_for_file(filename,
-                                                               include_paths)
+    entries = {}
+    if cache is not None:
+        cache = CountMatrixCache(cache, count_vector_creator, include_paths)
+        for filename in filenames:
+            entry = cache.get(filename)
+            if entry is not None:
+                entries[filename] = entry
+    misses = [filename for filename in filenames if filename not in entries]
+
+    parse = functools.partial(get_file_entry,
+                              count_vector_creator,
+                              include_paths=include_paths)
+    if max_workers == 1 or len(misses) < 2:
+        parsed = map(parse, misses)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(max_workers or None)
+        parsed = pool.imap(parse, misses)
+
+    try:
+        for i, (filename, entry) in enumerate(zip(misses, parsed),
+                                              maxlen - len(misses)):
+            progress_callback(100*(i/maxlen))
+            if cache is not None:
+                cache.add(filename, entry)
+            entries[filename] = entry
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    result = {}
+    for filename in filenames:
+        count_dict = get_count_dict(entries[filename], count_vector_creator)
         for function in count_dict:
             if not exclude_function(count_dict[function]):
                 result[(filename,
@@ -75,36 +122,136 @@ def get_count_matrices(count_vector_creator,
     return result
 
 
+def get_count_array(count_matrix):
+    """
+    Converts a count matrix into a compact array, which is what
+    ``compare_functions`` works on.
+
+    :param count_matrix: A dictionary with count vectors representing all
+                         variables for a function.
+    :return:             A ``numpy`` float array with the weighted counts of
+                         one variable per row, in the order of the count
+                         matrix.
+    """
+    return numpy.array([cv.count_vector for cv in count_matrix.values()],
+                       dtype=float)
+
+
 def pad_count_vectors(cm1, cm2):
     """
-    Pads the smaller count matrix with zeroed count vectors.
-
-    :param cm1: First cm. Will not be modified.
-    :param cm2: Second cm. Will not be modified.
-    :return:    A tuple holding two cms.
-    """
-    cm1len = len(cm1)
-    cm2len = len(cm2)
-    if cm1len != cm2len:
-        # Copy the smaller matrix as it will be altered
-        if cm1len > cm2len:
-            cm2 = copy.copy(cm2)
-        else:  # make cm1 the larger (or equal) one
-            tmp = cm2
-            cm2 = copy.copy(cm1)
-            cm1 = tmp
-
-        any_count_vector = list(cm1.values())[0]
-        # Fill up smaller count matrix with zero vectors. This way no
+    Pads the smaller count array with zeroed rows.
+
+    :param cm1: First count array. Will not be modified.
+    :param cm2: Second count array. Will not be modified.
+    :return:    A tuple holding two count arrays, the one which was larger
+                first.
+    """
+    if len(cm1) < len(cm2):
+        cm1, cm2 = cm2, cm1
+
+    if len(cm1) != len(cm2):
+        # Fill up the smaller count array with zero vectors. This way no
         # padding is needed later and if count vectors are zero on both
         # side, the difference is zero too which wouldn't be taken into
         # account with simple padding of ones.
-        for i in range(len(cm1) - len(cm2)):
-            cm2[i] = any_count_vector.create_null_vector(i)
+        cm2 = numpy.concatenate(
+            (cm2, numpy.zeros((len(cm1) - len(cm2), cm2.shape[1]))))
 
     return cm1, cm2
 
 
+def get_distance_matrices(cm1, cm2):
+    """
+    Calculates the ``CountVector.difference`` and ``CountVector.maxabs`` of
+    all pairs of variables of two functions at once.
+
+    :param cm1: The count array of the first function.
+    :param cm2: The count array of the second function.
+    :return:    A tuple of two ``numpy`` arrays, holding the difference and
+                the maxabs of the variables i and j in the i/j field.
+    """
+    differences = numpy.zeros((len(cm1), len(cm2)))
+    maxabs = numpy.zeros((len(cm1), len(cm2)))
+    # Sum up one counting condition after the other, like CountVector does,
+    # so the values are exactly the same.
+    for column_1, column_2 in zip(cm1.T, cm2.T):
+        differences += (column_1[:, None] - column_2[None, :])**2
+        maxabs += numpy.maximum(column_1[:, None], column_2[None, :])**2
+
+    return numpy.sqrt(differences), numpy.sqrt(maxabs)
+
+
+def munkres_assignment(cost_matrix):
+    """
+    Solves an assignment problem with the pure Python Munkres algorithm.
+
+    :param cost_matrix: A square ``numpy`` array of costs.
+    :return:            A list of tuples of the row and the column of every
+                        assigned field, ordered by rows.
+    """
+    return munkres.compute(cost_matrix.tolist())
+
+
+def scipy_assignment(cost_matrix):
+    """
+    Solves an assignment problem with SciPy, which is a lot faster than
+    ``munkres_assignment`` but needs SciPy to be installed. If several
+    assignments have the same minimal cost, it may choose another one than
+    ``munkres_assignment``, which can change the difference of two
+    functions.
+
+    :param cost_matrix: A square ``numpy`` array of costs.
+    :return:            A list of tuples of the row and the column of every
+                        assigned field, ordered by rows.
+    """
+    rows, columns = linear_sum_assignment(cost_matrix)
+    return list(zip(rows.tolist(), columns.tolist()))
+
+
+def get_assignment(cost_matrix, backend=None):
+    """
+    Solves an assignment problem, i.e. finds the fields of a square cost
+    matrix with one field per row and column and a minimal sum.
+
+    Matrices with one or two rows are solved directly, choosing the same
+    fields as ``munkres_assignment`` would, including which of two
+    assignments with the same cost.
+
+    >>> get_assignment(numpy.array([[0.5, 0.2], [0.1, 0.7]]))
+    [(0, 1), (1, 0)]
+
+    :param cost_matrix: A square ``numpy`` array of costs.
+    :param backend:     A function solving bigger problems, taking the cost
+                        matrix and returning a list of tuples of the row and
+                        the column of every assigned field.
+                        ``munkres_assignment`` is used if ``None``.
+    :return:            A list of tuples of the row and the column of every
+                        assigned field, ordered by rows.
+    """
+    if len(cost_matrix) == 1:
+        return [(0, 0)]
+
+    if len(cost_matrix) == 2:
+        # This mimics the arithmetic of the Munkres algorithm. It subtracts
+        # the minimum of each row and assigns the first zero of the first
+        # row, then a zero of the second row in the other column.
+        rows = [[cost - min(row) for cost in row]
+                for row in cost_matrix.tolist()]
+        first_column = rows[0].index(0)
+        other_column = 1 - first_column
+        first, second = rows[0][other_column], rows[1][other_column]
+        # If the second row has no zero there, the minimum of the other
+        # column is subtracted and the first row with a zero there takes it.
+        # The Munkres implementation takes the last zero of a row, so on a
+        # tie the second row keeps a zero in the last column.
+        if second != 0 and (first < second or
+                            (first == second and other_column == 0)):
+            return [(0, other_column), (1, first_column)]
+        return [(0, first_column), (1, other_column)]
+
+    return (backend or munkres_assignment)(cost_matrix)
+
+
 def relative_difference(difference, maxabs):
     if maxabs == 0:
         return 1
@@ -163,11 +310,82 @@ def get_difference(matching_iterator,
     return difference
 
 
+def get_function_features(count_array):
+    """
+    Retrieves the features of a function needed for
+    ``get_difference_lower_bound``.
+
+    :param count_array: The count array of the function, see
+                        ``get_count_array``.
+    :return:            A tuple of the sum of all count vectors, the sum of
+                        their absolute values, the maximum of their absolute
+                        values and the number of count vectors.
+    """
+    norms = numpy.sqrt((count_array**2).sum(axis=1))
+    return (count_array.sum(axis=0),
+            float(norms.sum()),
+            float(norms.max()),
+            len(count_array))
+
+
+def get_difference_lower_bound(features_1,
+                               features_2,
+                               average_calculation=False,
+                               poly_postprocessing=True,
+                               exp_postprocessing=False):
+    """
+    Calculates a value the difference of two functions is guaranteed to be
+    bigger or equal than, without matching their variables. This is a lot
+    cheaper than ``compare_functions`` and used to skip function pairs which
+    can't be clones.
+
+    Whatever variables get matched, the sum of the differences of the
+    matched count vectors is at least the difference of the sums of all
+    count vectors of both functions. The ``maxabs`` of two count vectors is
+    at most the sum of their absolute values, which bounds the values the
+    differences get normalized with.
+
+    :param features_1:          The features of the first function, see
+                                ``get_function_features``.
+    :param features_2:          The features of the second function.
+    :param average_calculation: See ``compare_functions``.
+    :param poly_postprocessing: See ``compare_functions``.
+    :param exp_postprocessing:  See ``compare_functions``.
+    :return:                    A lower bound of the difference between 0
+                                and 1.
+    """
+    sum_1, norm_sum_1, max_norm_1, count_1 = features_1
+    sum_2, norm_sum_2, max_norm_2, count_2 = features_2
+    sum_difference = float(numpy.sqrt(((sum_1 - sum_2)**2).sum()))
+    # Bounds the normalization values and thus the norm_sum of
+    # get_difference
+    max_norm_sum = norm_sum_1 + norm_sum_2
+    if max_norm_sum == 0:
+        return 0
+
+    if average_calculation:
+        difference = sum_difference / (max(count_1, count_2) *
+                                       (max_norm_1 + max_norm_2))
+    else:
+        difference = sum_difference / max_norm_sum
+
+    # The postprocessing factors decrease with the norm_sum
+    if poly_postprocessing:
+        difference *= (3*max_norm_sum+1)/(4*max_norm_sum)
+    if exp_postprocessing:
+        difference *= math.exp(1-max_norm_sum)/4 + 0.75
+
+    # Leave some room for rounding errors, the bound must never exceed the
+    # actual difference
+    return min(difference, 1) * (1 - 1e-9)
+
+
 def compare_functions(cm1,
                       cm2,
                       average_calculation=False,
                       poly_postprocessing=True,
-                      exp_postprocessing=False):
+                      exp_postprocessing=False,
+                      assignment_backend=None):
     """
     Compares the functions represented by the given count matrices.
 
@@ -175,8 +393,11 @@ def compare_functions(cm1,
     clones at the same difference value than big functions which may provide a
     better refactoring opportunity for the user.
 
-    :param cm1:                 Count vector dict for the first function.
-    :param cm2:                 Count vector dict for the second function.
+    :param cm1:                 Count vector dict or count array, see
+                                ``get_count_array``, for the first
+                                function.
+    :param cm2:                 Count vector dict or count array for the
+                                second function.
     :param average_calculation: If set to true the difference calculation
                                 function will take the average of all variable
                                 differences as the difference, else it will
@@ -188,17 +409,19 @@ def compare_functions(cm1,
     :param exp_postprocessing:  If set to true, the difference value of big
                                 function pairs will be reduced using an
                                 exponential approach.
+    :param assignment_backend:  The function to match the variables with,
+                                see ``get_assignment``.
     :return:                    The difference between these functions, 0 is
                                 identical and 1 is not similar at all.
     """
     assert 0 not in (len(cm1), len(cm2))
 
+    if isinstance(cm1, dict):
+        cm1 = get_count_array(cm1)
+    if isinstance(cm2, dict):
+        cm2 = get_count_array(cm2)
     cm1, cm2 = pad_count_vectors(cm1, cm2)
-
-    diff_table = [(cv1,
-                   [(cv2, cv1.difference(cv2), cv1.maxabs(cv2))
-                    for cv2 in cm2.values()])
-                  for cv1 in cm1.values()]
+    differences, maxabs = get_distance_matrices(cm1, cm2)
 
     # The cost matrix holds the difference between the two variables i and
     # j in the i/j field. This is a representation of a bipartite weighted
@@ -206,16 +429,17 @@ def compare_functions(cm1,
     # (rows) and the nodes representing the second function on the other
     #  side (columns). The fields in the matrix are the weighted nodes
     # connecting each element from one side to the other.
-    cost_matrix = [[relative_difference(difference, maxabs)
-                    for cv2, difference, maxabs in lst]
-                   for cv1, lst in diff_table]
+    cost_matrix = numpy.ones_like(differences)
+    numpy.divide(differences, maxabs, out=cost_matrix, where=maxabs != 0)
 
     # The munkres algorithm will calculate a matching such that the sum of
     # the taken fields is minimal. It thus will associate each variable
     # from one function to one on the other function.
-    matching = munkres.compute(cost_matrix)
+    matching = get_assignment(cost_matrix, assignment_backend)
 
-    return get_difference([(diff_table[x][1][y][1], diff_table[x][1][y][2])
+    differences = differences.tolist()
+    maxabs = maxabs.tolist()
+    return get_difference([(differences[x][y], maxabs[x][y])
                            for x, y in matching],
                           average_calculation,
                           poly_postprocessing,
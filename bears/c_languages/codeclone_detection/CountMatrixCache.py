@@ -0,0 +1,159 @@
+import hashlib
+
+from bears.c_languages.codeclone_detection.CountVector import CountVector
+
+
+def get_file_digest(filename):
+    """
+    Computes the digest of the contents of a file.
+
+    :param filename: The path to the file.
+    :return:         The digest as hexadecimal string or ``None`` if the
+                     file can't be read.
+    """
+    try:
+        with open(filename, 'rb') as file:
+            return hashlib.sha1(file.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def get_file_entry(count_vector_creator, filename, include_paths):
+    """
+    Parses a file and packs its count matrices into plain tuples, which are
+    small to pickle, be it for the cache or to return them from another
+    process.
+
+    :param count_vector_creator: A ClangCountVectorCreator.
+    :param filename:             The file to create count vectors for.
+    :param include_paths:        The paths to search included files in.
+    :return:                     A tuple of the functions and the digests of
+                                 the included files. The functions are
+                                 tuples of their line, their name and a
+                                 tuple of their variables, each being a
+                                 tuple of its name, its category, its count
+                                 vector and its unweighted counts.
+    """
+    included_files = set()
+    count_dict = count_vector_creator.get_vectors_for_file(filename,
+                                                           include_paths,
+                                                           included_files)
+    functions = tuple(
+        (line, name, tuple((count_vector.name,
+                            count_vector.category,
+                            tuple(count_vector.count_vector),
+                            tuple(count_vector.unweighted))
+                           for count_vector in count_matrix.values()))
+        for (line, name), count_matrix in count_dict.items())
+    return functions, {included_file: get_file_digest(included_file)
+                       for included_file in included_files}
+
+
+def get_count_dict(entry, count_vector_creator):
+    """
+    Unpacks the count matrices of a file.
+
+    :param entry:                A tuple as returned by ``get_file_entry``.
+    :param count_vector_creator: The ClangCountVectorCreator holding the
+                                 counting conditions and weightings of the
+                                 count vectors.
+    :return:                     A dictionary like returned by
+                                 ``get_vectors_for_file`` of the
+                                 ClangCountVectorCreator.
+    """
+    count_dict = {}
+    for line, name, variables in entry[0]:
+        count_matrix = {}
+        for variable, category, counts, unweighted in variables:
+            count_vector = CountVector(variable,
+                                       category,
+                                       count_vector_creator.conditions,
+                                       count_vector_creator.weightings)
+            count_vector.count_vector = list(counts)
+            count_vector.unweighted = list(unweighted)
+            count_matrix[variable] = count_vector
+        count_dict[(line, name)] = count_matrix
+    return count_dict
+
+
+class CountMatrixCache:
+    """
+    Keeps the count matrices of files between runs, so only files that
+    changed have to be parsed again.
+
+    The files are stored in a ``PersistentCache``, keyed by a digest of
+    their path, their contents, the include paths, the counting conditions
+    and the weightings. Every entry holds the digests of the files included
+    as well and is only used if none of them changed.
+    """
+
+    def __init__(self, cache, count_vector_creator, include_paths):
+        """
+        Creates a new CountMatrixCache.
+
+        :param cache:                The ``PersistentCache`` to store the
+                                     files in.
+        :param count_vector_creator: The ClangCountVectorCreator the files
+                                     are parsed with.
+        :param include_paths:        The paths to search included files in.
+        """
+        self.cache = cache
+        self._settings = repr((
+            list(include_paths),
+            [condition.__name__
+             for condition in count_vector_creator.conditions or ()],
+            count_vector_creator.weightings))
+        # Included files are usually shared by many files, so they are only
+        # read once.
+        self._included_digests = {}
+
+    def get_key(self, filename):
+        """
+        Computes the key of a file.
+
+        :param filename: The path to the file.
+        :return:         The key as string or ``None`` if the file can't be
+                         read.
+        """
+        digest = hashlib.sha1(self._settings.encode('utf-8'))
+        digest.update(filename.encode('utf-8', 'surrogatepass'))
+        try:
+            with open(filename, 'rb') as file:
+                digest.update(file.read())
+        except OSError:
+            return None
+        return 'count-matrix:' + digest.hexdigest()
+
+    def _get_included_digest(self, filename):
+        if filename not in self._included_digests:
+            self._included_digests[filename] = get_file_digest(filename)
+        return self._included_digests[filename]
+
+    def get(self, filename):
+        """
+        Retrieves the stored entry of a file.
+
+        :param filename: The path to the file.
+        :return:         A tuple as returned by ``get_file_entry`` or
+                         ``None`` if the file or one of its included files
+                         changed since it was stored.
+        """
+        key = self.get_key(filename)
+        entry = None if key is None else self.cache.get(key)
+        if entry is None or any(
+                self._get_included_digest(included_file) != digest
+                for included_file, digest in entry[1].items()):
+            return None
+        return entry
+
+    def add(self, filename, entry):
+        """
+        Stores the entry of a file.
+
+        :param filename: The path to the file.
+        :param entry:    A tuple as returned by ``get_file_entry``.
+        """
+        key = self.get_key(filename)
+        if key is not None:
+            self._included_digests.update(entry[1])
+            self.cache[key] = entry
@@ -1,10 +1,16 @@
+import hashlib
+import os
+import re
+from bisect import bisect_right
+from itertools import accumulate, chain
+
 from coalib.bearlib.languages.LanguageDefinition import LanguageDefinition
 from coalib.bears.LocalBear import LocalBear
 from coalib.results.HiddenResult import HiddenResult
 from coalib.results.Result import Result, RESULT_SEVERITY
 from coalib.results.SourceRange import SourceRange
-from coalib.results.AbsolutePosition import AbsolutePosition
-from coala_utils.string_processing.Core import unescaped_search_for
+
+from bears.general.PersistentCache import PersistentCache
 
 
 class AnnotationBear(LocalBear):
@@ -12,7 +18,9 @@ class AnnotationBear(LocalBear):
     AUTHORS_EMAILS = {'coala-devel@googlegroups.com'}
     LICENSE = 'AGPL-3.0'
 
-    def run(self, filename, file, language: str, coalang_dir: str = None):
+    def run(self, filename, file, language: str, coalang_dir: str = None,
+            annotation_cache_size: int = 0,
+            ):
         """
         Finds out all the positions of strings and comments in a file.
         The Bear searches for valid comments and strings and yields their
@@ -22,6 +30,12 @@ class AnnotationBear(LocalBear):
             The programming language of the source code.
         :param coalang_dir:
             External directory for coalang file.
+        :param annotation_cache_size:
+            Number of entries kept in an on-disk cache shared between coala
+            runs, so unchanged files don't have to be scanned again and
+            changed files are only scanned again where they changed. Every
+            file takes up to two entries, the least recently used ones are
+            dropped first. Set to 0 to disable the cache.
         :return:
             One HiddenResult containing a dictionary with keys being 'strings'
             or 'comments' and values being a tuple of SourceRanges pointing to
@@ -44,23 +58,78 @@ class AnnotationBear(LocalBear):
         multiline_comment_delimiters = dict(
             lang_dict['multiline_comment_delimiters'])
         comment_delimiter = dict(lang_dict['comment_delimiters'])
+        delimiters = (string_delimiters,
+                      multiline_string_delimiters,
+                      comment_delimiter,
+                      multiline_comment_delimiters)
+
+        cache = cache_key = previous_key = previous = None
+        if annotation_cache_size > 0:
+            cache = self.get_annotation_cache(annotation_cache_size)
+            cache_key = get_annotation_cache_key(file, language, *delimiters)
+            cached_content = cache.get(cache_key)
+            if cached_content is not None:
+                yield HiddenResult(self, {
+                    key: tuple(SourceRange.from_values(filename, *values)
+                               for values in ranges)
+                    for key, ranges in cached_content.items()})
+                return
+
+            previous_key = get_previous_version_cache_key(
+                filename, language, *delimiters)
+            previous = cache.get(previous_key)
+
         string_ranges = comment_ranges = ()
         try:
-            string_ranges, comment_ranges = self.find_annotation_ranges(
-                file,
-                filename,
-                string_delimiters,
-                multiline_string_delimiters,
-                comment_delimiter,
-                multiline_comment_delimiters)
+            if previous is not None:
+                string_ranges, comment_ranges = self.update_annotation_ranges(
+                    previous['file'],
+                    previous['ranges'],
+                    file,
+                    filename,
+                    *delimiters)
+            else:
+                string_ranges, comment_ranges = self.find_annotation_ranges(
+                    file,
+                    filename,
+                    *delimiters)
 
         except NoCloseError as e:
             yield Result(self, str(e), severity=RESULT_SEVERITY.MAJOR,
                          affected_code=(e.code,))
+            # Files with unclosed annotations are not cached, the Result
+            # has to be yielded on every run.
+            cache = None
 
         content = {'strings': string_ranges, 'comments': comment_ranges}
+        if cache is not None:
+            cache[cache_key] = {
+                key: tuple((_range.start.line, _range.start.column,
+                            _range.end.line, _range.end.column)
+                           for _range in ranges)
+                for key, ranges in content.items()}
+            cache[previous_key] = {'file': tuple(file),
+                                   'ranges': (string_ranges, comment_ranges)}
+
         yield HiddenResult(self, content)
 
+    def get_annotation_cache(self, max_entries):
+        """
+        Gets the on-disk annotation cache, it is opened once per bear
+        instance.
+
+        :param max_entries:
+            The maximum number of files to keep annotations for.
+        :return:
+            A PersistentCache object.
+        """
+        cache = getattr(self, '_annotation_cache', None)
+        if cache is None or cache.max_entries != max_entries:
+            cache = PersistentCache(self.data_dir, max_entries)
+            self._annotation_cache = cache
+
+        return cache
+
     def find_annotation_ranges(self,
                                file,
                                filename,
@@ -92,65 +161,260 @@ class AnnotationBear(LocalBear):
             of comments.
         """
         text = ''.join(file)
-        strings_range = []
-        comments_range = []
-        position = 0
-        while position <= len(text):
+        line_offsets = get_line_offsets(file)
+        ranges = {'strings': [], 'comments': []}
+        for kind, _range in self.scan_annotations(
+                line_offsets,
+                filename,
+                text,
+                string_delimiters,
+                multiline_string_delimiters,
+                comment_delimiter,
+                multiline_comment_delimiters):
+            ranges[kind].append(_range)
 
-            def get_new_position():
-                _range, end_position = self.get_range_end_position(
-                    file,
-                    filename,
-                    text,
-                    multiline_string_delimiters,
-                    position,
-                    self.get_multiline)
-                if end_position and _range:
-                    strings_range.append(_range)
-                    return end_position + 1
+        return (get_source_ranges(filename, line_offsets, ranges['strings']),
+                get_source_ranges(filename, line_offsets, ranges['comments']))
 
-                _range, end_position = self.get_range_end_position(
-                    file,
-                    filename,
-                    text,
-                    string_delimiters,
-                    position,
-                    self.get_singleline_strings)
-                if end_position and _range:
-                    strings_range.append(_range)
-                    return end_position + 1
+    def update_annotation_ranges(self,
+                                 old_file,
+                                 old_ranges,
+                                 file,
+                                 filename,
+                                 string_delimiters,
+                                 multiline_string_delimiters,
+                                 comment_delimiter,
+                                 multiline_comment_delimiters):
+        """
+        Finds ranges of all annotations of a file, reusing the ranges found
+        for a previous version of it.
 
-                _range, end_position = self.get_range_end_position(
-                    file,
-                    filename,
-                    text,
-                    multiline_comment_delimiters,
-                    position,
-                    self.get_multiline)
-                if end_position and _range:
-                    comments_range.append(_range)
-                    return end_position + 1
+        Only the lines from the first to the last changed one are scanned
+        again, starting at the last position before the change that is
+        not inside an annotation. Once the scan has passed the change and
+        reaches a position that was not inside an annotation before either,
+        the rest of the old ranges are shifted instead of scanning further.
+        The result is the same as the one of ``find_annotation_ranges``.
+
+        :param old_file:
+            The previous version of the file as a tuple of strings.
+        :param old_ranges:
+            The tuple of string ranges and comment ranges
+            ``find_annotation_ranges`` returned for ``old_file`` with the same
+            delimiters. It must not have raised a ``NoCloseError``.
+        :param file:
+            A tuple of strings, with each string being a line in the file.
+        :param filename:
+            The name of the file.
+        :param string_delimiters:
+            A dictionary containing the various ways to  define single-line
+            strings in a language.
+        :param multiline_string_delimiters:
+            A dictionary containing the various ways to define multi-line
+            strings in a language.
+        :param comment_delimiter:
+            A dictionary containing the various ways to define single-line
+            comments in a language.
+        :param multiline_comment_delimiters:
+            A dictionary containing the various ways to define multi-line
+            comments in a language.
+        :return:
+            Two tuples first containing a tuple of strings, the second a tuple
+            of comments.
+        """
+        delimiters = (string_delimiters,
+                      multiline_string_delimiters,
+                      comment_delimiter,
+                      multiline_comment_delimiters)
+
+        if tuple(old_file) == tuple(file):
+            return tuple(old_ranges[0]), tuple(old_ranges[1])
+
+        # Only lines ending with an unescaped newline can be part of the
+        # unchanged prefix, annotations on them can't depend on what follows.
+        prefix_lines = 0
+        for old_line, line in zip(old_file, file):
+            if (old_line != line or not line.endswith('\n') or
+                    line.endswith('\\\n')):
+                break
+            prefix_lines += 1
+
+        suffix_lines = 0
+        for old_line, line in zip(reversed(old_file[prefix_lines:]),
+                                  reversed(file[prefix_lines:])):
+            if old_line != line:
+                break
+            suffix_lines += 1
+
+        if prefix_lines + suffix_lines == 0:
+            return self.find_annotation_ranges(file, filename, *delimiters)
+
+        text = ''.join(file)
+        line_offsets = get_line_offsets(file)
+        change_start = line_offsets[prefix_lines]
+        change_end = line_offsets[len(file) - suffix_lines]
+        # Positions and lines after the change are shifted by this much.
+        shift = len(text) - sum(len(line) for line in old_file)
+        line_shift = len(file) - len(old_file)
+
+        def find_old_annotation(line, column, include_start=False):
+            for kind, ranges in enumerate(old_ranges):
+                index = bisect_ranges(ranges, line, column + include_start)
+                if index and ((ranges[index - 1].end.line,
+                               ranges[index - 1].end.column) >=
+                              (line, column)):
+                    return kind, index - 1
+            return None
+
+        # Resume at the start of the annotation the change begins in, if any.
+        kept = [bisect_ranges(ranges, prefix_lines + 1, 1)
+                for ranges in old_ranges]
+        resume_position = change_start
+        old_annotation = find_old_annotation(prefix_lines + 1, 1)
+        if old_annotation:
+            kind, kept[kind] = old_annotation
+            start = old_ranges[kind][kept[kind]].start
+            resume_position = line_offsets[start.line - 1] + start.column - 1
+
+        # A single-line string delimiter before the change without a closing
+        # delimiter on its line is only skipped if there is a closing
+        # delimiter somewhere after it, else a NoCloseError is raised. If
+        # the change removed the last closing delimiters and there are such
+        # delimiters, this has to be decided by a full scan.
+        if resume_position and not all(
+                get_end_position(end, text, change_start - 1) != -1
+                for end in string_delimiters.values()):
+            # Look ahead so overlapping delimiters are all found
+            string_regex = re.compile('(?={})'.format(
+                get_annotation_start_regex(string_delimiters).pattern))
+            string_starts = [match.start() for match in
+                             string_regex.finditer(text, 0, resume_position)]
+            if any(not find_old_annotation(line, column, include_start=True)
+                   for line, column in calc_line_cols(line_offsets,
+                                                      string_starts)):
+                return self.find_annotation_ranges(file, filename,
+                                                   *delimiters)
+
+        new_ranges = ([], [])
+        suffixes = ((), ())
+        for kind, (start, end) in self.scan_annotations(line_offsets,
+                                                        filename,
+                                                        text,
+                                                        *delimiters,
+                                                        resume_position):
+            kind = ('strings', 'comments').index(kind)
+            # Annotations ending at position 0 are dropped by the scanner,
+            # so the very start of the old file can't be used to sync.
+            if start >= change_end and start - shift > 0:
+                line, column = calc_line_col(line_offsets, start)
+                if not find_old_annotation(line - line_shift, column):
+                    # The scan is in sync with the old one again.
+                    suffixes = tuple(
+                        ranges[bisect_ranges(ranges, line - line_shift,
+                                             column):]
+                        for ranges in old_ranges)
+                    break
+
+            new_ranges[kind].append((start, end))
 
+        if line_shift:
+            suffixes = tuple(
+                tuple(SourceRange.from_values(
+                          filename,
+                          _range.start.line + line_shift,
+                          _range.start.column,
+                          _range.end.line + line_shift,
+                          _range.end.column)
+                      for _range in ranges)
+                for ranges in suffixes)
+
+        return tuple(tuple(ranges[:kept_count]) +
+                     get_source_ranges(filename, line_offsets, new) +
+                     tuple(suffix)
+                     for ranges, kept_count, new, suffix in zip(
+                         old_ranges, kept, new_ranges, suffixes))
+
+    def scan_annotations(self,
+                         line_offsets,
+                         filename,
+                         text,
+                         string_delimiters,
+                         multiline_string_delimiters,
+                         comment_delimiter,
+                         multiline_comment_delimiters,
+                         position=0):
+        """
+        Scans the text for annotations.
+
+        :param line_offsets:
+            The line offsets of the file as given by ``get_line_offsets``.
+        :param filename:
+            The name of the file.
+        :param text:
+            The whole text of the file.
+        :param string_delimiters:
+            A dictionary containing the various ways to  define single-line
+            strings in a language.
+        :param multiline_string_delimiters:
+            A dictionary containing the various ways to define multi-line
+            strings in a language.
+        :param comment_delimiter:
+            A dictionary containing the various ways to define single-line
+            comments in a language.
+        :param multiline_comment_delimiters:
+            A dictionary containing the various ways to define multi-line
+            comments in a language.
+        :param position:
+            The position to start scanning at. It must not be inside an
+            annotation.
+        :return:
+            An iterator yielding tuples of either 'strings' or 'comments'
+            and a tuple holding the start and end position of the
+            annotation, in the order they appear in the text.
+        """
+        annotation_regex = get_annotation_start_regex(
+            string_delimiters,
+            multiline_string_delimiters,
+            comment_delimiter,
+            multiline_comment_delimiters)
+        if annotation_regex is None:
+            return
+
+        annotation_types = (
+            ('strings', multiline_string_delimiters, self.get_multiline,
+             False),
+            ('strings', string_delimiters, self.get_singleline_strings,
+             False),
+            ('comments', multiline_comment_delimiters, self.get_multiline,
+             False),
+            ('comments', comment_delimiter, self.get_singleline_comment,
+             True))
+
+        # Only positions where some delimiter starts can open an annotation,
+        # so jump from one such position to the next instead of trying every
+        # delimiter at every character of the file.
+        match = annotation_regex.search(text, position)
+        while match:
+            position = match.start()
+            new_position = position + 1
+            for kind, annotations, func, single_comment in annotation_types:
                 _range, end_position = self.get_range_end_position(
-                    file,
+                    line_offsets,
                     filename,
                     text,
-                    comment_delimiter,
+                    annotations,
                     position,
-                    self.get_singleline_comment,
-                    single_comment=True)
+                    func,
+                    single_comment=single_comment)
                 if end_position and _range:
-                    comments_range.append(_range)
-                    return end_position + 1
-
-                return position + 1
+                    yield kind, _range
+                    new_position = end_position + 1
+                    break
 
-            position = get_new_position()
-
-        return tuple(strings_range), tuple(comments_range)
+            match = annotation_regex.search(text, new_position)
 
     @staticmethod
-    def get_range_end_position(file,
+    def get_range_end_position(line_offsets,
                                filename,
                                text,
                                annotations,
@@ -159,16 +423,16 @@ class AnnotationBear(LocalBear):
                                single_comment=False):
         _range = end_position = None
         for annotation in annotations.keys():
-            if text[position:].startswith(annotation):
+            if text.startswith(annotation, position):
                 if not single_comment:
-                    ret_val = func(file,
+                    ret_val = func(line_offsets,
                                    filename,
                                    text,
                                    annotation,
                                    annotations[annotation],
                                    position)
                 else:
-                    ret_val = func(file,
+                    ret_val = func(line_offsets,
                                    filename,
                                    text,
                                    annotation,
@@ -179,18 +443,18 @@ class AnnotationBear(LocalBear):
         return _range, end_position
 
     @staticmethod
-    def get_multiline(file,
+    def get_multiline(line_offsets,
                       filename,
                       text,
                       annotation_start,
                       annotation_end,
                       position):
         """
-        Gets sourcerange and end position of an annotation that can span
+        Gets the range and end position of an annotation that can span
         multiple lines.
 
-        :param file:
-            A tuple of strings, with each string being a line in the file.
+        :param line_offsets:
+            The line offsets of the file as given by ``get_line_offsets``.
         :param filename:
             The name of the file.
         :param annotation_start:
@@ -200,36 +464,30 @@ class AnnotationBear(LocalBear):
         :param position:
             An integer identifying the position where the annotation started.
         :return:
-            A SourceRange object holding the range of the multi-line annotation
-            and the end_position of the annotation as an integer.
+            A tuple holding the start and end position of the multi-line
+            annotation and the end_position of the annotation as an integer.
         """
         end_end = get_end_position(annotation_end,
                                    text,
                                    position + len(annotation_start) - 1)
         if end_end == -1:
-            _range = SourceRange.from_absolute_position(
-                filename,
-                AbsolutePosition(file, position))
+            _range = get_source_range(filename, line_offsets, position)
             raise NoCloseError(annotation_start, _range)
 
-        return (SourceRange.from_absolute_position(
-                    filename,
-                    AbsolutePosition(file, position),
-                    AbsolutePosition(file, end_end)),
-                end_end)
+        return (position, end_end), end_end
 
     @staticmethod
-    def get_singleline_strings(file,
+    def get_singleline_strings(line_offsets,
                                filename,
                                text,
                                string_start,
                                string_end,
                                position):
         """
-        Gets sourcerange of a single-line string and its end position.
+        Gets the range of a single-line string and its end position.
 
-        :param file:
-            A tuple of strings, with each string being a line in the file.
+        :param line_offsets:
+            The line offsets of the file as given by ``get_line_offsets``.
         :param filename:
             The name of the file.
         :param string_start:
@@ -239,7 +497,7 @@ class AnnotationBear(LocalBear):
         :position:
             An integer identifying the position where the string started.
         :return:
-            A SourceRange object identifying the range of the single-line
+            A tuple holding the start and end position of the single-line
             string and the end_position of the string as an integer.
         """
         end_position = get_end_position(string_end,
@@ -249,25 +507,20 @@ class AnnotationBear(LocalBear):
         if newline == -1:
             newline = len(text)
         if end_position == -1:
-            _range = SourceRange.from_absolute_position(
-                filename,
-                AbsolutePosition(file, position))
+            _range = get_source_range(filename, line_offsets, position)
             raise NoCloseError(string_start, _range)
         if newline > end_position:
-            return (SourceRange.from_absolute_position(
-                        filename,
-                        AbsolutePosition(file, position),
-                        AbsolutePosition(file, end_position)),
-                    end_position)
+            return (position, end_position), end_position
 
     @staticmethod
-    def get_singleline_comment(file, filename, text, comment, position):
+    def get_singleline_comment(line_offsets, filename, text, comment,
+                               position):
         """
-        Gets Sourcerange of a single-line comment where the start is the
+        Gets the range of a single-line comment where the start is the
         start of comment and the end is the end of line.
 
-        :param file:
-            A tuple of strings, with each string being a line in the file.
+        :param line_offsets:
+            The line offsets of the file as given by ``get_line_offsets``.
         :param filename:
             The name of the file.
         :param comment:
@@ -275,7 +528,7 @@ class AnnotationBear(LocalBear):
         :position:
             An integer identifying the position where the string started.
         :return:
-            A SourceRange object identifying the range of the single-line
+            A tuple holding the start and end position of the single-line
             comment and the end_position of the comment as an integer.
         """
         end_position = get_end_position('\n',
@@ -283,21 +536,235 @@ class AnnotationBear(LocalBear):
                                         position + len(comment) - 1)
         if end_position == -1:
             end_position = len(text) - 1
-        return (SourceRange.from_absolute_position(
-                    filename,
-                    AbsolutePosition(file, position),
-                    AbsolutePosition(file, end_position)),
-                end_position)
+        return (position, end_position), end_position
+
+
+def get_line_offsets(file):
+    """
+    Computes the position every line of the file starts at. This is built
+    once per file so converting positions to lines and columns does not have
+    to walk over all lines again.
+
+    :param file:
+        A tuple of strings, with each string being a line in the file.
+    :return:
+        A tuple holding the start position of every line, followed by the
+        length of the whole file.
+    """
+    return tuple(accumulate(chain((0,), (len(line) for line in file))))
+
+
+def calc_line_col(line_offsets, position):
+    """
+    Converts an absolute position into a line and column, the same way
+    ``coalib.results.AbsolutePosition.calc_line_col`` does.
+
+    >>> line_offsets = get_line_offsets(('a\\n', 'b\\n'))
+    >>> calc_line_col(line_offsets, 1)
+    (1, 2)
+    >>> calc_line_col(line_offsets, 2)
+    (2, 1)
+
+    :param line_offsets:
+        The line offsets of the file as given by ``get_line_offsets``.
+    :param position:
+        Position (starting from 0) of the character.
+    :return:
+        A tuple of the form (line, column), both starting from 1.
+    """
+    return calc_line_cols(line_offsets, (position,))[0]
+
+
+def calc_line_cols(line_offsets, positions):
+    """
+    Converts absolute positions into lines and columns in one sweep over
+    the line offsets.
+
+    :param line_offsets:
+        The line offsets of the file as given by ``get_line_offsets``.
+    :param positions:
+        The positions to convert. They have to be sorted in ascending order.
+    :return:
+        A list holding a (line, column) tuple for every position.
+    """
+    line_cols = []
+    line = 0
+    for position in positions:
+        if not 0 <= position < line_offsets[-1]:
+            raise ValueError('Position not found in text')
+
+        line = bisect_right(line_offsets, position, line)
+        line_cols.append((line, position - line_offsets[line - 1] + 1))
+
+    return line_cols
+
+
+def bisect_ranges(ranges, line, column):
+    """
+    Counts the ranges starting before the given line and column.
+
+    :param ranges:
+        A sequence of SourceRanges, sorted by their start.
+    :param line:
+        The line, starting from 1.
+    :param column:
+        The column, starting from 1.
+    :return:
+        The number of ranges starting before the given position.
+    """
+    low, high = 0, len(ranges)
+    while low < high:
+        middle = (low + high) // 2
+        start = ranges[middle].start
+        if (start.line, start.column) < (line, column):
+            low = middle + 1
+        else:
+            high = middle
+
+    return low
+
+
+def get_source_range(filename, line_offsets, start, end=None):
+    """
+    Creates a SourceRange from absolute start and end positions.
+
+    :param filename:
+        The name of the file.
+    :param line_offsets:
+        The line offsets of the file as given by ``get_line_offsets``.
+    :param start:
+        The start position of the range.
+    :param end:
+        The end position of the range or None.
+    :return:
+        A SourceRange object.
+    """
+    return get_source_ranges(
+        filename, line_offsets,
+        ((start, start if end is None else end),))[0]
+
+
+def get_source_ranges(filename, line_offsets, ranges):
+    """
+    Creates SourceRanges from pairs of absolute start and end positions.
+    All positions are converted in a single sorted sweep.
+
+    :param filename:
+        The name of the file.
+    :param line_offsets:
+        The line offsets of the file as given by ``get_line_offsets``.
+    :param ranges:
+        An iterable of (start, end) position tuples.
+    :return:
+        A tuple of SourceRange objects in the order of ``ranges``.
+    """
+    ranges = tuple(ranges)
+    positions = sorted({position
+                        for _range in ranges
+                        for position in _range})
+    line_cols = dict(zip(positions, calc_line_cols(line_offsets, positions)))
+
+    return tuple(SourceRange.from_values(filename,
+                                         *(line_cols[start] + line_cols[end]))
+                 for start, end in ranges)
+
+
+def get_annotation_cache_key(file, language, *delimiter_dicts):
+    """
+    Creates the key annotations of a file are cached with. The result of the
+    AnnotationBear only depends on the file contents and the delimiters of
+    the language, so the key is a digest of exactly those.
+
+    :param file:
+        A tuple of strings, with each string being a line in the file.
+    :param language:
+        The language setting the file is scanned with.
+    :param delimiter_dicts:
+        The delimiter dictionaries passed to ``find_annotation_ranges``.
+    :return:
+        A string to be used as the cache key.
+    """
+    digest = hashlib.sha1()
+    for line in file:
+        # Prefix the length as lines are not necessarily terminated by a
+        # newline, and the line structure matters for the ranges.
+        digest.update(str(len(line)).encode() + b':')
+        digest.update(line.encode('utf-8', 'surrogatepass'))
+
+    return '{}:{}:{}'.format(
+        language.lower(),
+        repr([sorted(delimiters.items()) for delimiters in delimiter_dicts]),
+        digest.hexdigest())
+
+
+def get_previous_version_cache_key(filename, language, *delimiter_dicts):
+    """
+    Creates the key the last scanned version of a file and its annotations
+    are cached with, so it can be scanned incrementally next time.
+
+    :param filename:
+        The name of the file.
+    :param language:
+        The language setting the file is scanned with.
+    :param delimiter_dicts:
+        The delimiter dictionaries passed to ``find_annotation_ranges``.
+    :return:
+        A string to be used as the cache key.
+    """
+    return 'previous:{}:{}:{}'.format(
+        language.lower(),
+        repr([sorted(delimiters.items()) for delimiters in delimiter_dicts]),
+        os.path.abspath(filename))
+
+
+def get_annotation_start_regex(*delimiter_dicts):
+    """
+    Compiles a single regex matching the start of any annotation.
+
+    :param delimiter_dicts:
+        Dictionaries having the annotation start delimiters as keys.
+    :return:
+        A compiled regex or ``None`` if there are no delimiters at all.
+    """
+    starts = {start
+              for delimiters in delimiter_dicts
+              for start in delimiters}
+    if not starts:
+        return None
+
+    return re.compile('|'.join(re.escape(start) for start in sorted(starts)))
 
 
 def get_end_position(end_marker, text, position):
-    try:
-        end_match = next(unescaped_search_for(end_marker, text[position + 1:]))
-        end_position = position + end_match.span()[1]
-    except StopIteration:
-        end_position = -1
+    """
+    Finds the first unescaped occurrence of ``end_marker`` after
+    ``position``.
+
+    :param end_marker:
+        The string to search for.
+    :param text:
+        The whole text of the file.
+    :param position:
+        The search starts right after this position. Backslashes before it
+        are not taken into account when checking for escapes.
+    :return:
+        The position of the last character of the end marker or -1 if it
+        can't be found.
+    """
+    start = position + 1
+    search_position = start
+    while True:
+        end_start = text.find(end_marker, search_position)
+        if end_start == -1:
+            return -1
+
+        escape_position = end_start - 1
+        while escape_position >= start and text[escape_position] == '\\':
+            escape_position -= 1
+        if (end_start - escape_position) % 2:
+            return end_start + len(end_marker) - 1
 
-    return end_position
+        search_position = end_start + max(len(end_marker), 1)
 
 
 class NoCloseError(Exception):
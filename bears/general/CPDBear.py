@@ -1,8 +1,8 @@
-from shutil import which
-from xml.etree import ElementTree
+import os.path
 
+from bears.general.CopyPasteDetector import CloneIndex, find_duplicates
+from bears.general.PersistentCache import PersistentCache
 from coalib.bears.GlobalBear import GlobalBear
-from coalib.misc.Shell import run_shell_command
 from coalib.results.Result import Result
 from coalib.results.SourceRange import SourceRange
 from coalib.settings.Setting import language
@@ -35,16 +35,6 @@ class CPDBear(GlobalBear):
     LICENSE = 'AGPL-3.0'
     CAN_DETECT = {'Duplication'}
 
-    @classmethod
-    def check_prerequisites(cls):  # pragma: no cover
-        if which('bash') is None:
-            return 'bash is not installed.'
-        if which('pmd') is None and which('run.sh') is None:
-            return ('PMD is missing. Make sure to install it from '
-                    '<https://pmd.github.io/>.')
-        else:
-            return True
-
     def run(self, language: language,
             minimum_tokens: int = 20,
             ignore_annotations: bool = False,
@@ -52,13 +42,21 @@ class CPDBear(GlobalBear):
             ignore_literals: bool = False,
             ignore_usings: bool = False,
             skip_duplicate_files: bool = True,
+            clone_index_size: int = 0,
+            only_changed_files: bool = False,
             ):
         """
         Checks for similar code that looks as it could be replaced to reduce
         redundancy.
 
-        For more details see:
-        <https://pmd.github.io/pmd-6.4.0/pmd_userdocs_cpd.html>
+        The files are split into tokens and every run of at least
+        ``minimum_tokens`` tokens occurring more than once is reported, like
+        the copy/paste detector of PMD does, see
+        <https://pmd.github.io/pmd-6.4.0/pmd_userdocs_cpd.html>.
+
+        With ``clone_index_size`` set, the tokens of the files are kept
+        between runs, so only files that changed since the last run are
+        tokenized again.
 
         :param language:
             One of the supported languages of this bear.
@@ -75,6 +73,16 @@ class CPDBear(GlobalBear):
         :param skip_duplicate_files:
             Ignore multiple copies of files of the same name and length in
             comparison.
+        :param clone_index_size:
+            Number of files whose tokens are kept in an on-disk index shared
+            between coala runs, so unchanged files don't have to be tokenized
+            again. The least recently used files are dropped first. Set to 0
+            to disable the index.
+        :param only_changed_files:
+            Only report duplicates involving a file that changed since the
+            last coala run on this machine with the same settings, as
+            recorded in the index. Needs ``clone_index_size`` to be set,
+            otherwise all duplicates are reported.
         """
         for supported_lang in self.language_dict:
             if supported_lang in language:
@@ -85,50 +93,50 @@ class CPDBear(GlobalBear):
                      "'{}'.".format(language))
             return
 
-        options = {
-            '--ignore-annotations': ignore_annotations,
-            '--ignore-identifiers': ignore_identifiers,
-            '--ignore-literals': ignore_literals,
-            '--ignore-usings': ignore_usings,
-            '--skip-duplicate-files': skip_duplicate_files}
-
-        files = ','.join(self.file_dict.keys())
-        executable = which('pmd') or which('run.sh')
-        arguments = ('bash', executable, 'cpd', '--skip-lexical-errors',
-                     '--minimum-tokens', str(minimum_tokens),
-                     '--language', cpd_language,
-                     '--files', files,
-                     '--format', 'xml')
-
-        arguments += tuple(option
-                           for option, enable in options.items()
-                           if enable is True)
-
-        stdout_output, _ = run_shell_command(arguments)
-
-        if stdout_output:
-            root = ElementTree.fromstring(stdout_output)
-
-            for duplication in root.findall('duplication'):
-                length = int(duplication.attrib['lines'])
-                affected_code = list()
-
-                for xml_file in duplication.findall('file'):
-                    filename = xml_file.attrib['path']
-                    start_line = int(xml_file.attrib['line'])
-                    end_line = min(start_line + length - 1,
-                                   len(self.file_dict[filename]))
-
-                    affected_code.append(
-                        SourceRange.from_values(filename,
-                                                start_line=start_line,
-                                                end_line=end_line))
-
-                yield Result(
-                    self, 'Duplicate code found.', affected_code,
-                    additional_info=(
-                        'Duplicate code is an indicator '
-                        'that you have more code than you need. Consider'
-                        ' refactor your code to remove one of the'
-                        ' occurrences. For more information go here:'
-                        'http://tinyurl.com/coala-clone'))
+        cache = (PersistentCache(self.data_dir, clone_index_size)
+                 if clone_index_size > 0 else None)
+        index = CloneIndex(cache, cpd_language, minimum_tokens,
+                           ignore_identifiers=ignore_identifiers,
+                           ignore_literals=ignore_literals,
+                           ignore_annotations=ignore_annotations,
+                           ignore_usings=ignore_usings)
+        files = []
+        changed = set()
+        seen_files = set()
+        for filename, lines in self.file_dict.items():
+            if skip_duplicate_files:
+                key = (os.path.basename(filename), sum(map(len, lines)))
+                if key in seen_files:
+                    continue
+                seen_files.add(key)
+
+            *entry, is_changed = index.get_file(filename, ''.join(lines))
+            if is_changed:
+                changed.add(len(files))
+            files.append((filename,) + tuple(entry))
+        index.save()
+
+        duplicates = find_duplicates(
+            [(file_index, values, hashes)
+             for file_index, (_, values, _, _, hashes) in enumerate(files)],
+            minimum_tokens,
+            changed if only_changed_files else None)
+
+        for length, occurrences in duplicates:
+            affected_code = []
+            for file_index, offset in occurrences:
+                filename, _, start_lines, end_lines, _ = files[file_index]
+                affected_code.append(
+                    SourceRange.from_values(
+                        filename,
+                        start_line=start_lines[offset],
+                        end_line=end_lines[offset + length - 1]))
+
+            yield Result(
+                self, 'Duplicate code found.', affected_code,
+                additional_info=(
+                    'Duplicate code is an indicator '
+                    'that you have more code than you need. Consider'
+                    ' refactor your code to remove one of the'
+                    ' occurrences. For more information go here:'
+                    'http://tinyurl.com/coala-clone'))
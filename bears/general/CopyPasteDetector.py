@@ -0,0 +1,645 @@
+import hashlib
+import os.path
+import re
+import zlib
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from itertools import accumulate, chain, combinations
+
+# Karp-Rabin rolling hash parameters
+HASH_BASE = 1000003
+HASH_MODULUS = (1 << 61) - 1
+
+IDENTIFIER = 'ID'
+LITERAL = 'LITERAL'
+
+Syntax = namedtuple('Syntax', ('line_comments', 'block_comments', 'strings',
+                               'keywords', 'case_sensitive'))
+Syntax.__doc__ = """
+The lexical syntax of a language, as far as needed to find duplicates.
+
+:param line_comments:  Regexes of comments ending at the end of the line.
+:param block_comments: Regexes of comments spanning multiple lines.
+:param strings:        Regexes of string literals.
+:param keywords:       The keywords of the language, which are never
+                       treated as identifiers.
+:param case_sensitive: Whether keywords are case sensitive.
+"""
+
+_c_line_comments = (r'//[^\n]*',)
+_c_block_comments = (r'/\*[\s\S]*?(?:\*/|\Z)',)
+_c_strings = (r'"(?:\\[\s\S]|[^"\\\n])*"', r"'(?:\\[\s\S]|[^'\\\n])*'")
+_c_keywords = {
+    'auto', 'break', 'case', 'char', 'const', 'continue', 'default', 'do',
+    'double', 'else', 'enum', 'extern', 'float', 'for', 'goto', 'if', 'int',
+    'long', 'register', 'return', 'short', 'signed', 'sizeof', 'static',
+    'struct', 'switch', 'typedef', 'union', 'unsigned', 'void', 'volatile',
+    'while'}
+_java_keywords = {
+    'abstract', 'assert', 'boolean', 'break', 'byte', 'case', 'catch', 'char',
+    'class', 'const', 'continue', 'default', 'do', 'double', 'else', 'enum',
+    'extends', 'false', 'final', 'finally', 'float', 'for', 'goto', 'if',
+    'implements', 'import', 'instanceof', 'int', 'interface', 'long',
+    'native', 'new', 'null', 'package', 'private', 'protected', 'public',
+    'return', 'short', 'static', 'strictfp', 'super', 'switch',
+    'synchronized', 'this', 'throw', 'throws', 'transient', 'true', 'try',
+    'void', 'volatile', 'while'}
+
+
+def _c_syntax(keywords, strings=_c_strings):
+    return Syntax(_c_line_comments, _c_block_comments, strings, keywords,
+                  case_sensitive=True)
+
+
+SYNTAXES = {
+    'cpp': _c_syntax(_c_keywords | {
+        'bool', 'catch', 'class', 'delete', 'false', 'friend', 'inline',
+        'namespace', 'new', 'nullptr', 'operator', 'private', 'protected',
+        'public', 'template', 'this', 'throw', 'true', 'try', 'typename',
+        'using', 'virtual'}),
+    'cs': _c_syntax({
+        'abstract', 'as', 'base', 'bool', 'break', 'byte', 'case', 'catch',
+        'char', 'class', 'const', 'continue', 'decimal', 'default',
+        'delegate', 'do', 'double', 'else', 'enum', 'event', 'explicit',
+        'extern', 'false', 'finally', 'fixed', 'float', 'for', 'foreach',
+        'goto', 'if', 'implicit', 'in', 'int', 'interface', 'internal', 'is',
+        'lock', 'long', 'namespace', 'new', 'null', 'object', 'operator',
+        'out', 'override', 'params', 'private', 'protected', 'public',
+        'readonly', 'ref', 'return', 'sbyte', 'sealed', 'short', 'sizeof',
+        'static', 'string', 'struct', 'switch', 'this', 'throw', 'true',
+        'try', 'typeof', 'uint', 'ulong', 'unchecked', 'unsafe', 'ushort',
+        'using', 'var', 'virtual', 'void', 'volatile', 'while'},
+        (r'@"(?:""|[^"])*"',) + _c_strings),
+    'ecmascript': _c_syntax({
+        'break', 'case', 'catch', 'class', 'const', 'continue', 'debugger',
+        'default', 'delete', 'do', 'else', 'export', 'extends', 'false',
+        'finally', 'for', 'function', 'if', 'import', 'in', 'instanceof',
+        'let', 'new', 'null', 'return', 'super', 'switch', 'this', 'throw',
+        'true', 'try', 'typeof', 'undefined', 'var', 'void', 'while', 'with',
+        'yield'}, _c_strings + (r'`(?:\\[\s\S]|[^`\\])*`',)),
+    'fortran': Syntax((r'![^\n]*',), (), _c_strings, {
+        'call', 'character', 'close', 'contains', 'do', 'else', 'elseif',
+        'end', 'enddo', 'endif', 'function', 'go', 'goto', 'if', 'implicit',
+        'integer', 'logical', 'module', 'none', 'open', 'print', 'program',
+        'read', 'real', 'return', 'stop', 'subroutine', 'then', 'to', 'type',
+        'use', 'while', 'write'}, case_sensitive=False),
+    'go': _c_syntax({
+        'break', 'case', 'chan', 'const', 'continue', 'default', 'defer',
+        'else', 'fallthrough', 'for', 'func', 'go', 'goto', 'if', 'import',
+        'interface', 'map', 'package', 'range', 'return', 'select', 'struct',
+        'switch', 'type', 'var'}, _c_strings + (r'`[^`]*`',)),
+    'java': _c_syntax(_java_keywords),
+    'jsp': Syntax(_c_line_comments,
+                  (r'<%--[\s\S]*?(?:--%>|\Z)',) + _c_block_comments,
+                  _c_strings, _java_keywords, case_sensitive=True),
+    'matlab': Syntax((r'%[^\n]*',), (r'^\s*%\{[\s\S]*?(?:^\s*%\}|\Z)',), (
+        _c_strings[0], r"(?<![\w)\].'])'(?:''|[^'\n])*'"), {
+        'break', 'case', 'catch', 'classdef', 'continue', 'else', 'elseif',
+        'end', 'for', 'function', 'global', 'if', 'otherwise', 'parfor',
+        'persistent', 'return', 'switch', 'try', 'while'},
+        case_sensitive=True),
+    'objectivec': _c_syntax(_c_keywords | {
+        'BOOL', 'NO', 'YES', 'id', 'implementation', 'interface', 'nil',
+        'property', 'protocol', 'self', 'super'},
+        (r'@"(?:\\[\s\S]|[^"\\\n])*"',) + _c_strings),
+    'php': Syntax(_c_line_comments + (r'#[^\n]*',), _c_block_comments,
+                  _c_strings, {
+        'abstract', 'and', 'array', 'as', 'break', 'case', 'catch', 'class',
+        'clone', 'const', 'continue', 'declare', 'default', 'do', 'echo',
+        'else', 'elseif', 'extends', 'false', 'final', 'finally', 'for',
+        'foreach', 'function', 'global', 'if', 'implements', 'include',
+        'instanceof', 'interface', 'isset', 'list', 'namespace', 'new',
+        'null', 'or', 'print', 'private', 'protected', 'public', 'require',
+        'return', 'static', 'switch', 'throw', 'trait', 'true', 'try',
+        'unset', 'use', 'var', 'while'}, case_sensitive=False),
+    'plsql': Syntax((r'--[^\n]*',), _c_block_comments, (r"'(?:''|[^'])*'",), {
+        'and', 'begin', 'by', 'case', 'close', 'cursor', 'declare', 'delete',
+        'else', 'elsif', 'end', 'exception', 'exit', 'fetch', 'for', 'from',
+        'function', 'if', 'in', 'insert', 'into', 'is', 'loop', 'not',
+        'null', 'open', 'or', 'order', 'procedure', 'return', 'select',
+        'set', 'then', 'update', 'values', 'when', 'where', 'while'},
+        case_sensitive=False),
+    'python': Syntax((r'#[^\n]*',), (), (
+        r'[rRbBuUfF]{0,2}"""[\s\S]*?(?:"""|\Z)',
+        r"[rRbBuUfF]{0,2}'''[\s\S]*?(?:'''|\Z)",
+        r'[rRbBuUfF]{0,2}"(?:\\[\s\S]|[^"\\\n])*"',
+        r"[rRbBuUfF]{0,2}'(?:\\[\s\S]|[^'\\\n])*'"), {
+        'False', 'None', 'True', 'and', 'as', 'assert', 'async', 'await',
+        'break', 'class', 'continue', 'def', 'del', 'elif', 'else', 'except',
+        'exec', 'finally', 'for', 'from', 'global', 'if', 'import', 'in',
+        'is', 'lambda', 'nonlocal', 'not', 'or', 'pass', 'print', 'raise',
+        'return', 'try', 'while', 'with', 'yield'}, case_sensitive=True),
+    'ruby': Syntax((r'#[^\n]*',), (r'^=begin[\s\S]*?(?:^=end|\Z)',),
+                   _c_strings, {
+        'BEGIN', 'END', 'alias', 'and', 'begin', 'break', 'case', 'class',
+        'def', 'defined', 'do', 'else', 'elsif', 'end', 'ensure', 'false',
+        'for', 'if', 'in', 'module', 'next', 'nil', 'not', 'or', 'redo',
+        'rescue', 'retry', 'return', 'self', 'super', 'then', 'true',
+        'undef', 'unless', 'until', 'when', 'while', 'yield'},
+        case_sensitive=True),
+    'scala': _c_syntax({
+        'abstract', 'case', 'catch', 'class', 'def', 'do', 'else', 'extends',
+        'false', 'final', 'finally', 'for', 'forSome', 'if', 'implicit',
+        'import', 'lazy', 'match', 'new', 'null', 'object', 'override',
+        'package', 'private', 'protected', 'return', 'sealed', 'super',
+        'this', 'throw', 'trait', 'true', 'try', 'type', 'val', 'var',
+        'while', 'with', 'yield'}, (r'"""[\s\S]*?(?:"""|\Z)',) + _c_strings),
+    'swift': _c_syntax({
+        'as', 'break', 'case', 'catch', 'class', 'continue', 'default',
+        'defer', 'do', 'else', 'enum', 'extension', 'false', 'fileprivate',
+        'for', 'func', 'guard', 'if', 'import', 'in', 'init', 'internal',
+        'is', 'let', 'nil', 'private', 'protocol', 'public', 'repeat',
+        'return', 'self', 'static', 'struct', 'super', 'switch', 'throw',
+        'throws', 'true', 'try', 'var', 'where', 'while'},
+        (r'"""[\s\S]*?(?:"""|\Z)', _c_strings[0])),
+}
+
+_OPERATORS = (r'<<=|>>=|\.\.\.|->|=>|::|\+\+|--|&&|\|\||<<|>>|'
+              r'[-+*/%&|^!=<>]=|[^\s\w]')
+
+
+def _compile_token_regex(syntax):
+    """
+    Combines the token regexes of a syntax into one regex. Comments are
+    matched before strings, strings before numbers, identifiers and
+    operators, so every token is matched by the first group able to.
+    """
+    groups = (
+        ('comment', syntax.block_comments + syntax.line_comments),
+        ('string', syntax.strings),
+        ('number', (r'\.?\d(?:[eE][-+]?\d|[\w.])*',)),
+        ('identifier', (r'[^\W\d][\w$]*', r'\$[\w$]+')),
+        ('operator', (_OPERATORS,)))
+    return re.compile('|'.join(
+        '(?P<{}>{})'.format(name, '|'.join(regexes))
+        for name, regexes in groups if regexes), re.MULTILINE)
+
+
+_token_regexes = {}
+
+
+def tokenize(text, language,
+             ignore_identifiers=True,
+             ignore_literals=False,
+             ignore_annotations=False,
+             ignore_usings=False):
+    """
+    Splits source code into normalized tokens, skipping whitespace and
+    comments.
+
+    >>> tokenize('int a = 42; // answer\\n', 'java')
+    (['int', 'ID', '=', '42', ';'], [1, 1, 1, 1, 1], [1, 1, 1, 1, 1])
+
+    :param text:               The source code.
+    :param language:           The language as key of ``SYNTAXES``.
+    :param ignore_identifiers: Whether identifiers other than keywords are
+                               replaced by ``ID``.
+    :param ignore_literals:    Whether string and number literals are
+                               replaced by ``LITERAL``.
+    :param ignore_annotations: Whether annotations like ``@Override`` or
+                               ``@SuppressWarnings("unused")`` are skipped.
+    :param ignore_usings:      Whether ``using`` directives are skipped.
+    :return:                   A tuple of the list of tokens and the lists
+                               of the lines each token starts and ends in.
+    """
+    syntax = SYNTAXES[language]
+    if language not in _token_regexes:
+        _token_regexes[language] = _compile_token_regex(syntax)
+    keywords = (syntax.keywords if syntax.case_sensitive
+                else {keyword.lower() for keyword in syntax.keywords})
+
+    line_offsets = list(accumulate(chain(
+        (0,), (len(line) + 1 for line in text.split('\n')[:-1]))))
+    values, start_lines, end_lines = [], [], []
+    for match in _token_regexes[language].finditer(text):
+        kind = match.lastgroup
+        if kind == 'comment':
+            continue
+
+        value = match.group()
+        if kind == 'identifier':
+            word = value if syntax.case_sensitive else value.lower()
+            if word in keywords:
+                value = word
+            elif ignore_identifiers:
+                value = IDENTIFIER
+        elif ignore_literals and kind in ('string', 'number'):
+            value = LITERAL
+
+        values.append(value)
+        start_lines.append(bisect_right(line_offsets, match.start()))
+        end_lines.append(bisect_right(line_offsets, match.end() - 1))
+
+    skipped = set()
+    if ignore_annotations:
+        skipped |= _find_annotations(values)
+    if ignore_usings:
+        skipped |= _find_usings(values)
+    if skipped:
+        kept = [index for index in range(len(values))
+                if index not in skipped]
+        values = [values[index] for index in kept]
+        start_lines = [start_lines[index] for index in kept]
+        end_lines = [end_lines[index] for index in kept]
+
+    return values, start_lines, end_lines
+
+
+def _find_annotations(values):
+    """
+    Finds the indices of the tokens forming annotations, i.e. ``@``
+    followed by a (dotted) name and optionally by arguments in parentheses.
+    """
+    skipped = set()
+    index = 0
+    while index < len(values):
+        if values[index] != '@' or index + 1 == len(values):
+            index += 1
+            continue
+
+        start = index
+        index += 2
+        while (index + 1 < len(values) and values[index] == '.' and
+               values[index + 1] not in ('(', '@')):
+            index += 2
+        if index < len(values) and values[index] == '(':
+            depth = 0
+            while index < len(values):
+                depth += {'(': 1, ')': -1}.get(values[index], 0)
+                index += 1
+                if depth == 0:
+                    break
+        skipped.update(range(start, index))
+    return skipped
+
+
+def _find_usings(values):
+    """
+    Finds the indices of the tokens forming ``using`` directives, i.e.
+    ``using`` followed by anything but a parenthesis, up to the next
+    semicolon.
+    """
+    skipped = set()
+    for index, value in enumerate(values):
+        if (value == 'using' and index + 1 < len(values) and
+                values[index + 1] != '(' and index not in skipped):
+            end = index
+            while end < len(values) and values[end] != ';':
+                end += 1
+            skipped.update(range(index, end + 1))
+    return skipped
+
+
+def get_token_ids(values):
+    """
+    Converts tokens to integers. The same token always gets the same
+    integer, also in other runs.
+
+    :param values: The tokens.
+    :return:       A list of the integers.
+    """
+    return [zlib.crc32(value.encode('utf-8', 'surrogatepass'))
+            for value in values]
+
+
+def get_window_hashes(token_ids, window_size):
+    """
+    Computes the Karp-Rabin rolling hash of every run of ``window_size``
+    consecutive tokens.
+
+    >>> get_window_hashes([1, 2, 3, 1, 2], 2) == [
+    ...     1 * HASH_BASE + 2, 2 * HASH_BASE + 3, 3 * HASH_BASE + 1,
+    ...     1 * HASH_BASE + 2]
+    True
+
+    :param token_ids:   The tokens as integers, see ``get_token_ids``.
+    :param window_size: The number of tokens in a window.
+    :return:            A list with the hash of the window starting at each
+                        token, as long as the window fits.
+    """
+    if len(token_ids) < window_size:
+        return []
+
+    highest_power = pow(HASH_BASE, window_size - 1, HASH_MODULUS)
+    window_hash = 0
+    for token_id in token_ids[:window_size]:
+        window_hash = (window_hash * HASH_BASE + token_id) % HASH_MODULUS
+
+    hashes = [window_hash]
+    for index in range(window_size, len(token_ids)):
+        window_hash = (
+            (window_hash - token_ids[index - window_size] * highest_power) *
+            HASH_BASE + token_ids[index]) % HASH_MODULUS
+        hashes.append(window_hash)
+    return hashes
+
+
+def _get_common_length(values, offset, other_values, other_offset, length):
+    """
+    Counts the tokens two runs of tokens have in common, comparing growing
+    slices at once instead of single tokens.
+
+    >>> _get_common_length([1, 2, 3, 4], 0, [1, 2, 3, 5], 0, 1)
+    3
+
+    :param values:       The tokens of the first file.
+    :param offset:       The index of the first token of the first run.
+    :param other_values: The tokens of the second file.
+    :param other_offset: The index of the first token of the second run.
+    :param length:       The number of tokens known to be equal.
+    :return:             The number of equal tokens at the start of both
+                         runs.
+    """
+    end = min(len(values) - offset, len(other_values) - other_offset)
+    step = 1
+    while length < end:
+        step = min(step, end - length)
+        if (values[offset + length:offset + length + step] ==
+                other_values[other_offset + length:
+                             other_offset + length + step]):
+            length += step
+            step *= 2
+        elif step == 1:
+            break
+        else:
+            step //= 2
+    return length
+
+
+def find_duplicates(files, minimum_tokens, changed=None):
+    """
+    Finds runs of at least ``minimum_tokens`` tokens occurring more than
+    once.
+
+    All windows of ``minimum_tokens`` tokens are bucketed by their hash.
+    Windows overlapping an equal window in the same file are part of a
+    periodic run, like an array of zeros, of which only the first window
+    is kept, so runs are only reported if they occur elsewhere. Equal
+    windows whose preceding tokens are not all equal start a duplicate. How
+    far every occurrence matches the first one is measured once, which
+    gives the length of the duplicate. Where only some occurrences continue
+    to be equal, they form a longer duplicate themselves. Occurrences
+    overlapping a previous occurrence in the same file shorten the
+    duplicate, or are dropped if it would get shorter than
+    ``minimum_tokens``. Of duplicates spanning the same code, like the
+    nested duplicates of a block repeated many times, only the longest one
+    is kept.
+
+    If ``changed`` is given, only windows of unchanged files also occurring
+    in a changed file are bucketed and only duplicates involving a changed
+    file are found.
+
+    :param files:          A list of tuples of a key identifying a file,
+                           its tokens and their window hashes, see
+                           ``get_window_hashes``.
+    :param minimum_tokens: The size of the windows and the minimum number
+                           of tokens of a duplicate.
+    :param changed:        A set of the keys of the changed files, or
+                           ``None`` to find all duplicates.
+    :return:               A list of the duplicates, each being a tuple of
+                           the number of tokens and a sorted list of tuples
+                           of the key of the file and the index of the
+                           first token of each occurrence.
+    """
+    if changed is not None:
+        changed_hashes = {window_hash
+                          for key, _, hashes in files if key in changed
+                          for window_hash in hashes}
+
+    buckets = defaultdict(list)
+    for file_index, (key, _, hashes) in enumerate(files):
+        is_changed = changed is None or key in changed
+        for offset, window_hash in enumerate(hashes):
+            if is_changed or window_hash in changed_hashes:
+                buckets[window_hash].append((file_index, offset))
+
+    def get_token(position, index):
+        values = files[position[0]][1]
+        index += position[1]
+        return values[index] if 0 <= index < len(values) else position
+
+    def get_common_length(position, other_position, length):
+        return _get_common_length(files[position[0]][1], position[1],
+                                  files[other_position[0]][1],
+                                  other_position[1], length)
+
+    # The duplicates by the code they span
+    duplicates = {}
+    for positions in buckets.values():
+        if len(positions) < 2:
+            continue
+
+        # Verify the windows are equal, in case their hashes collide
+        groups = defaultdict(list)
+        for position in positions:
+            groups[tuple(files[position[0]][1][
+                position[1]:position[1] + minimum_tokens])].append(position)
+
+        stack = []
+        for group in groups.values():
+            group = _remove_periodic_windows(group, minimum_tokens)
+            if len(group) > 1:
+                stack.append((group, minimum_tokens, None))
+
+        while stack:
+            group, length, common_lengths = stack.pop()
+            # Windows preceded by equal tokens are part of a duplicate
+            # starting one token earlier. Tokens beyond the start or end of
+            # a file are unique.
+            if (len({get_token(position, -1) for position in group}) == 1 or
+                    (changed is not None and
+                     not any(files[file_index][0] in changed
+                             for file_index, _ in group))):
+                continue
+
+            first = group[0]
+            if common_lengths is None:
+                common_lengths = {
+                    position: get_common_length(first, position, length)
+                    for position in group[1:]}
+            length = min(common_lengths[position] for position in group[1:])
+
+            # The occurrences still matching the first one go on together,
+            # the others are grouped by their next token.
+            next_tokens = defaultdict(list)
+            for position in group[1:]:
+                if common_lengths[position] == length:
+                    next_tokens[get_token(position, length)].append(position)
+            longer = [first] + [position for position in group[1:]
+                                if common_lengths[position] > length]
+            if len(longer) > 1:
+                stack.append((longer, length, common_lengths))
+            stack.extend((subgroup, length, None)
+                         for subgroup in next_tokens.values()
+                         if len(subgroup) > 1)
+
+            duplicate = _remove_overlaps(group, length, minimum_tokens)
+            if duplicate is not None:
+                extent = _get_extent(group, length)
+                if (extent not in duplicates or
+                        _get_size(duplicate) > _get_size(duplicates[extent])):
+                    duplicates[extent] = duplicate
+
+    return sorted(((length, sorted((files[file_index][0], offset)
+                                   for file_index, offset in positions))
+                   for length, positions in duplicates.values()),
+                  key=lambda duplicate: duplicate[1])
+
+
+def _remove_periodic_windows(positions, minimum_tokens):
+    """
+    Drops the windows overlapping the previous equal window in the same
+    file. Equal windows only overlap in periodic runs, like an array of
+    zeros, so only the first window of every run is kept and a run counts
+    as a single occurrence.
+
+    >>> _remove_periodic_windows([(0, 0), (0, 2), (0, 4), (0, 9), (1, 0)], 3)
+    [(0, 0), (0, 9), (1, 0)]
+    """
+    positions = sorted(positions)
+    return positions[:1] + [
+        position for previous, position in zip(positions, positions[1:])
+        if (position[0] != previous[0] or
+            position[1] >= previous[1] + minimum_tokens)]
+
+
+def _get_extent(positions, length):
+    """
+    Computes the code spanned by the occurrences of a duplicate, merging
+    overlapping occurrences.
+
+    >>> _get_extent([(0, 0), (0, 2), (1, 5)], 3)
+    ((0, 0, 5), (1, 5, 8))
+    """
+    extent = []
+    for file_index, offset in sorted(positions):
+        if (extent and extent[-1][0] == file_index and
+                offset <= extent[-1][2]):
+            extent[-1][2] = offset + length
+        else:
+            extent.append([file_index, offset, offset + length])
+    return tuple(map(tuple, extent))
+
+
+def _get_size(duplicate):
+    """
+    Orders duplicates by their length and the number of their occurrences.
+    """
+    length, positions = duplicate
+    return length, len(positions)
+
+
+def _remove_overlaps(positions, length, minimum_tokens):
+    """
+    Shortens a duplicate so its occurrences in the same file don't overlap,
+    or drops occurrences if it would get shorter than ``minimum_tokens``.
+
+    :return: A tuple of the length and the positions, or ``None`` if less
+             than two occurrences are left.
+    """
+    positions = sorted(positions)
+    gaps = [second[1] - first[1]
+            for first, second in zip(positions, positions[1:])
+            if first[0] == second[0]]
+    if not gaps or min(gaps) >= length:
+        return length, positions
+    if min(gaps) >= minimum_tokens:
+        return min(gaps), positions
+
+    kept = positions[:1]
+    for position in positions[1:]:
+        if position[0] != kept[-1][0] or position[1] >= kept[-1][1] + length:
+            kept.append(position)
+    return (length, kept) if len(kept) > 1 else None
+
+
+class CloneIndex:
+    """
+    Keeps the tokens and window hashes of files between runs, so only files
+    that changed since the last run have to be tokenized and hashed again.
+
+    The files are stored in a ``PersistentCache``, keyed by a digest of
+    their contents and the settings affecting their tokens. The digests of
+    the files of the last run with the same settings are stored as well,
+    to tell which files changed. Without a cache nothing is kept and every
+    file counts as changed.
+    """
+
+    def __init__(self, cache, language, minimum_tokens, **options):
+        """
+        Creates a new CloneIndex.
+
+        :param cache:          The ``PersistentCache`` to store the files in
+                               or None.
+        :param language:       The language as key of ``SYNTAXES``.
+        :param minimum_tokens: The minimum number of tokens of a duplicate.
+        :param options:        The keyword arguments to pass to
+                               ``tokenize``.
+        """
+        self.cache = cache
+        self.language = language
+        self.minimum_tokens = minimum_tokens
+        self.options = options
+        self._settings = repr((language, minimum_tokens,
+                               sorted(options.items())))
+        self._manifest_key = 'cpd-manifest:' + self._settings
+        self._last_digests = ({} if cache is None
+                              else cache.get(self._manifest_key, {}))
+        self._digests = {}
+
+    def get_digest(self, text):
+        """
+        Computes the digest of a file, which also covers the settings.
+
+        :param text: The contents of the file.
+        :return:     The digest as hexadecimal string.
+        """
+        digest = hashlib.sha1(self._settings.encode('utf-8'))
+        digest.update(text.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def get_file(self, filename, text):
+        """
+        Retrieves the tokens and window hashes of a file, from the cache if
+        possible.
+
+        :param filename: The name of the file.
+        :param text:     The contents of the file.
+        :return:         A tuple of the tokens, the lines they start and end
+                         in, see ``tokenize``, their window hashes, see
+                         ``get_window_hashes``, and whether the file changed
+                         since the last run.
+        """
+        if self.cache is None:
+            digest = key = entry = None
+        else:
+            digest = self.get_digest(text)
+            self._digests[filename] = digest
+            key = 'cpd:' + digest
+            entry = self.cache.get(key)
+        if entry is None:
+            values, start_lines, end_lines = tokenize(text, self.language,
+                                                      **self.options)
+            entry = (values, start_lines, end_lines,
+                     get_window_hashes(get_token_ids(values),
+                                       self.minimum_tokens))
+            if self.cache is not None:
+                self.cache[key] = entry
+
+        return entry + (digest is None or
+                        self._last_digests.get(filename) != digest,)
+
+    def save(self):
+        """
+        Remembers the digests of the files retrieved, so the next run can
+        tell which files changed. Files that were not retrieved are kept,
+        unless they do not exist anymore.
+        """
+        if self.cache is None:
+            return
+
+        digests = {filename: digest
+                   for filename, digest in self._last_digests.items()
+                   if os.path.exists(filename)}
+        digests.update(self._digests)
+        self.cache[self._manifest_key] = digests
@@ -1,9 +1,48 @@
-import itertools
+import hashlib
+from collections import OrderedDict
 
 from coalib.bears.GlobalBear import GlobalBear
 from coalib.results.Result import Result
 from coalib.results.RESULT_SEVERITY import RESULT_SEVERITY
 
+try:
+    from bears.general.MinHash import MinHashLSH, get_shingles
+except ImportError:  # pragma: no cover
+    MinHashLSH = None
+
+# BLAKE2 is only available from Python 3.6 on
+_hash = getattr(hashlib, 'blake2b', hashlib.sha1)
+
+
+def get_digest(lines):
+    """
+    Computes a digest of the contents of a file, one line at a time.
+
+    :param lines: The lines of the file.
+    :return:      The digest as bytes.
+    """
+    digest = _hash()
+    for line in lines:
+        digest.update(line.encode('utf-8', 'surrogatepass'))
+    return digest.digest()
+
+
+def group_by(items, key):
+    """
+    Groups items by a key, keeping the order of the items.
+
+    >>> group_by(['bb', 'a', 'cc', 'ddd'], len)
+    [['bb', 'cc'], ['a'], ['ddd']]
+
+    :param items: The items to group.
+    :param key:   A function computing the key of an item.
+    :return:      A list of the groups, each being a list of items.
+    """
+    groups = OrderedDict()
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return list(groups.values())
+
 
 class DuplicateFileBear(GlobalBear):
     LANGUAGES = {'All'}
@@ -12,9 +51,74 @@ class DuplicateFileBear(GlobalBear):
     LICENSE = 'AGPL-3.0'
     CAN_DETECT = {'Duplication'}
 
-    def run(self):
+    # The number of consecutive lines hashed together for near duplicates
+    SHINGLE_SIZE = 3
+
+    def get_identical_groups(self):
+        """
+        Finds the groups of identical files.
+
+        The files are bucketed by their number of lines and length first,
+        then by a digest of their contents. Only files with the same digest
+        are compared fully.
+
+        :return: A list of the groups of identical files with more than one
+                 file, each being a list of file names in the order of the
+                 ``file_dict``.
+        """
+        groups = []
+        for bucket in group_by(
+                self.file_dict,
+                lambda filename: (len(self.file_dict[filename]),
+                                  sum(map(len, self.file_dict[filename])))):
+            if len(bucket) < 2:
+                continue
+
+            for candidates in group_by(
+                    bucket,
+                    lambda filename: get_digest(self.file_dict[filename])):
+                while len(candidates) > 1:
+                    contents = self.file_dict[candidates[0]]
+                    group = [filename for filename in candidates
+                             if self.file_dict[filename] == contents]
+                    if len(group) > 1:
+                        groups.append(group)
+                    grouped = set(group)
+                    candidates = [filename for filename in candidates
+                                  if filename not in grouped]
+
+        order = {filename: index
+                 for index, filename in enumerate(self.file_dict)}
+        return sorted(groups, key=lambda group: order[group[0]])
+
+    def get_near_duplicate_pairs(self, filenames, threshold):
+        """
+        Finds the pairs of similar files with MinHash and LSH.
+
+        :param filenames: The names of the files to compare.
+        :param threshold: The minimum Jaccard similarity of the sets of
+                          shingles of two files.
+        :return:          A list of tuples of the names of both files and
+                          their estimated similarity.
+        """
+        lsh = MinHashLSH(threshold)
+        for filename in filenames:
+            shingles = get_shingles(self.file_dict[filename],
+                                    self.SHINGLE_SIZE)
+            if len(shingles):
+                lsh.add(filename, shingles)
+        return lsh.get_similar_pairs()
+
+    def run(self, near_duplicate_threshold: float = 0):
         """
         Checks for Duplicate Files
+
+        :param near_duplicate_threshold:
+            Set to a value between 0 and 1 to also find files which are not
+            identical but similar, e.g. copies with a different license
+            header. It is the minimum share of runs of three lines, ignoring
+            whitespace and empty lines, two files need to have in common.
+            This needs NumPy to be installed. 0 disables it.
         """
         if not self.file_dict:
             yield Result(self, 'You did not add any file to compare',
@@ -23,16 +127,37 @@ class DuplicateFileBear(GlobalBear):
             yield Result(self, 'You included only one file',
                          severity=RESULT_SEVERITY.MAJOR)
         else:
-            unique_tuples = [file_tuple for file_tuple in
-                             itertools.combinations(self.file_dict, 2)]
-
-            for file_pair in unique_tuples:
-                if (self.file_dict[file_pair[0]] ==
-                        self.file_dict[file_pair[1]]):
-                    first_file_name = file_pair[0]
-                    second_file_name = file_pair[1]
-                    message = ('File ' + first_file_name + ' is identical'
-                               ' to File ' + second_file_name)
-                    yield Result.from_values(origin=self, message=message,
-                                             severity=RESULT_SEVERITY.INFO,
-                                             file=first_file_name)
+            identical_groups = self.get_identical_groups()
+            for first_file_name, *other_file_names in identical_groups:
+                message = ('File ' + first_file_name + ' is identical'
+                           ' to ' + ', '.join('File ' + file_name
+                                              for file_name
+                                              in other_file_names))
+                yield Result.from_values(origin=self, message=message,
+                                         severity=RESULT_SEVERITY.INFO,
+                                         file=first_file_name)
+
+            if near_duplicate_threshold <= 0:
+                return
+
+            if MinHashLSH is None:
+                self.err('Finding near duplicates needs NumPy. Install it '
+                         'with `pip install numpy`.')
+                return
+
+            # Identical files are only compared once
+            duplicates = {file_name for group in identical_groups
+                          for file_name in group[1:]}
+            pairs = self.get_near_duplicate_pairs(
+                [file_name for file_name in self.file_dict
+                 if file_name not in duplicates],
+                min(near_duplicate_threshold, 1))
+
+            for first_file_name, second_file_name, similarity in pairs:
+                message = ('File {} is similar to File {} ({:.0%} of their '
+                           'contents are shared)'.format(
+                               first_file_name, second_file_name,
+                               similarity))
+                yield Result.from_values(origin=self, message=message,
+                                         severity=RESULT_SEVERITY.INFO,
+                                         file=first_file_name)
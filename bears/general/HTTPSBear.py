@@ -1,5 +1,10 @@
-from urllib.parse import urlparse
+from concurrent.futures import Future
+from urllib.parse import urlparse, urlunparse
 
+import requests
+
+from bears.general.HeadRequestEngine import get_engine
+from bears.general.HostScheduler import get_host_setting, parse_host_settings
 from bears.general.URLHeadBear import URLHeadBear
 from coalib.bears.LocalBear import LocalBear
 from coalib.results.Result import Result
@@ -21,8 +26,63 @@ class HTTPSBear(LocalBear):
     HTTPS_PREFIX = 'https'
     HTTP_PREFIX = 'http'
 
+    @staticmethod
+    def supports_https(host_response):
+        """
+        Checks whether a host accepts https connections.
+
+        :param host_response: The response to a HEAD request to the https
+                              version of the host's root page, or the
+                              exception raised by it.
+        :return:              False if connecting to the host failed, e.g.
+                              because of a TLS error or a connect timeout.
+                              A slow response doesn't mean https isn't
+                              supported, so the links are still probed.
+        """
+        return not isinstance(host_response,
+                              (requests.exceptions.SSLError,
+                               requests.exceptions.ConnectionError))
+
+    @staticmethod
+    def probe_link(engine, host_probe, https_link, timeout):
+        """
+        Requests the https version of a link as soon as its host was probed,
+        without waiting for the probes of other hosts.
+
+        :param engine:     The ``HeadRequestEngine`` to send the request
+                           with.
+        :param host_probe: The future of the request to the root page of
+                           the host.
+        :param https_link: The https version of the link.
+        :param timeout:    The timeout of the request in seconds.
+        :return:           A ``concurrent.futures.Future`` resolving to the
+                           response to the link or the exception raised by
+                           the request, or to None if the host doesn't
+                           support https.
+        """
+        link_probe = Future()
+
+        def on_link_probed(probe):
+            link_probe.set_result(probe.result())
+
+        def on_host_probed(host_probe):
+            try:
+                if HTTPSBear.supports_https(host_probe.result()):
+                    engine.submit(https_link, timeout).add_done_callback(
+                        on_link_probed)
+                else:
+                    link_probe.set_result(None)
+            except Exception as exception:  # pragma: no cover
+                link_probe.set_exception(exception)
+
+        host_probe.add_done_callback(on_host_probed)
+        return link_probe
+
     def run(self, filename, file, dependency_results=dict(),
-            network_timeout: typed_dict(str, int, DEFAULT_TIMEOUT) = dict()):
+            network_timeout: typed_dict(str, int, DEFAULT_TIMEOUT) = dict(),
+            max_requests_per_second: typed_dict(str, float, 0) = dict(),
+            max_connection_failures: int = 5,
+            ):
         """
         Find http links in any text file and check if the https version of
         link is valid. If so, an option is provided for replacing them with
@@ -45,7 +105,35 @@ class HTTPSBear(LocalBear):
                                       '*'. The timeout of all the websites not
                                       in the dict will be the value of the key
                                       '*'.
+        :param max_requests_per_second:
+                                      A dict mapping URLs and the maximum
+                                      number of HEAD requests per second sent
+                                      to the host of that URL. It can contain
+                                      a wildcard entry with key '*' for all
+                                      other hosts. Hosts without a positive
+                                      limit are not limited.
+        :param max_connection_failures:
+                                      The number of failed connections to a
+                                      host in a row after which the https
+                                      versions of the remaining links to that
+                                      host are not requested anymore. 0
+                                      disables this.
         """
+        network_timeout = parse_host_settings(network_timeout)
+        engine = get_engine(
+            self,
+            requests_per_second=parse_host_settings(max_requests_per_second),
+            max_connection_failures=max_connection_failures)
+
+        def get_timeout(host):
+            return get_host_setting(network_timeout, host,
+                                    HTTPSBear.DEFAULT_TIMEOUT)
+
+        # Probe every host once with its root page first. The engine
+        # remembers the responses for the whole run, so every host is only
+        # probed once even if it appears in many files. Hosts which don't
+        # support https at all don't need their other links to be probed.
+        probes = []
         for result in dependency_results.get(URLHeadBear.name, []):
             line_number, link, code, context = result.contents
             if link.startswith(self.HTTPS_PREFIX):
@@ -53,16 +141,16 @@ class HTTPSBear(LocalBear):
 
             https_link = self.HTTPS_PREFIX + link[len(self.HTTP_PREFIX):]
             host = urlparse(https_link).netloc
-            network_timeout = {
-                urlparse(url).netloc if not url == '*' else '*': timeout
-                for url, timeout in network_timeout.items()}
-            https_response = URLHeadBear.get_head_response(
-                https_link,
-                network_timeout.get(host)
-                if host in network_timeout
-                else network_timeout.get('*')
-                if '*' in network_timeout
-                else HTTPSBear.DEFAULT_TIMEOUT)
+            host_probe = engine.submit(
+                urlunparse((self.HTTPS_PREFIX, host, '/', '', '', '')),
+                get_timeout(host))
+            probes.append((line_number, link, self.probe_link(
+                engine, host_probe, https_link, get_timeout(host))))
+
+        for line_number, link, probe in probes:
+            https_response = probe.result()
+            if https_response is None:
+                continue
 
             try:
                 https_code = https_response.status_code
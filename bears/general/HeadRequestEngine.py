@@ -0,0 +1,306 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from bears.general.HostScheduler import HostScheduler, HostUnavailableError
+from bears.general.PersistentCache import PersistentCache
+
+STATUS_CACHE_SIZE = 10000
+
+
+def normalize_url(url):
+    """
+    Normalizes a URL so that URLs requesting the same resource are equal.
+
+    The scheme and host are lowercased, default ports and the fragment,
+    which is never sent to the server, are removed and an empty path is
+    replaced by ``/``.
+
+    >>> normalize_url('HTTP://Example.COM:80#top')
+    'http://example.com/'
+    >>> normalize_url('https://example.com:8443/a?b=c')
+    'https://example.com:8443/a?b=c'
+
+    :param url: The URL to normalize.
+    :return:    The normalized URL.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme, netloc.rpartition(':')[2]) in (('http', '80'),
+                                               ('https', '443')):
+        netloc = netloc.rpartition(':')[0]
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def get_redirect_location(response):
+    """
+    Retrieves the URL a response redirects to.
+
+    :param response: A ``requests.models.Response`` or the exception raised
+                     by a request.
+    :return:         The absolute URL of the ``Location`` header if the
+                     response is a redirect, else None.
+    """
+    if (isinstance(response, requests.models.Response) and
+            response.is_redirect):
+        return urljoin(response.url, response.headers['location'])
+    return None
+
+
+class HeadRequestEngine:
+    """
+    Sends HEAD requests with a bounded number of them in flight at once.
+
+    All requests share a ``requests.Session``, so connections to a host
+    are kept alive and reused instead of being opened for every link. The
+    number of concurrent requests is limited globally by the number of
+    worker threads and per host by a ``HostScheduler``, which can also
+    limit the requests per second and stop requesting hosts that fail to
+    connect.
+
+    Every URL is only requested once per engine and timeout, the response
+    is shared by all links to it. The status codes can also be kept in a
+    ``PersistentCache`` to share them between runs.
+    """
+
+    DEFAULT_MAX_REQUESTS = 10
+    DEFAULT_MAX_REQUESTS_PER_HOST = 2
+    DEFAULT_MAX_REDIRECTS = 30
+
+    def __init__(self,
+                 max_requests=DEFAULT_MAX_REQUESTS,
+                 max_requests_per_host=DEFAULT_MAX_REQUESTS_PER_HOST,
+                 status_cache=None,
+                 status_cache_ttl=0,
+                 negative_status_cache_ttl=0,
+                 requests_per_second=None,
+                 max_connection_failures=0):
+        """
+        Creates a new HeadRequestEngine.
+
+        :param max_requests:              The maximum number of requests in
+                                          flight at once.
+        :param max_requests_per_host:     The maximum number of requests in
+                                          flight at once to the same host.
+        :param status_cache:              A ``PersistentCache`` to keep the
+                                          status codes in, or None.
+        :param status_cache_ttl:          The number of seconds a successful
+                                          status code (below 400) is used
+                                          from the ``status_cache``.
+        :param negative_status_cache_ttl: The number of seconds a failed
+                                          request or a status code of 400 or
+                                          above is used from the
+                                          ``status_cache``.
+        :param requests_per_second:       A dict as returned by
+                                          ``parse_host_settings`` holding
+                                          the maximum number of requests
+                                          per second to every host.
+        :param max_connection_failures:   The number of consecutive failed
+                                          connections after which the rest
+                                          of the requests to a host fail
+                                          instantly. 0 disables this.
+        """
+        if max_requests < 1 or max_requests_per_host < 1:
+            raise ValueError('At least one request has to be allowed at '
+                             'once.')
+
+        self.max_requests = max_requests
+        self.max_requests_per_host = max_requests_per_host
+        self.status_cache = status_cache
+        self.status_cache_ttl = status_cache_ttl
+        self.negative_status_cache_ttl = negative_status_cache_ttl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_requests_per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.scheduler = HostScheduler(max_requests_per_host,
+                                       requests_per_second,
+                                       max_connection_failures)
+        self._executor = ThreadPoolExecutor(max_requests)
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def _get_cached_response(self, url):
+        cache_key = 'head:' + normalize_url(url)
+        entry = self.status_cache.get(cache_key)
+        if entry is None:
+            return None
+
+        timestamp, status_code, error, location = entry
+        ttl = (self.status_cache_ttl
+               if status_code is not None and status_code < 400
+               else self.negative_status_cache_ttl)
+        if time.time() - timestamp >= ttl:
+            return None
+
+        if status_code is None:
+            exception_type, message = error
+            return getattr(requests.exceptions, exception_type,
+                           requests.exceptions.RequestException)(message)
+
+        response = requests.models.Response()
+        response.status_code = status_code
+        response.url = url
+        if location is not None:
+            response.headers['Location'] = location
+        return response
+
+    def _cache_response(self, url, response):
+        if isinstance(response, requests.models.Response):
+            entry = (time.time(), response.status_code, None,
+                     response.headers.get('location'))
+        else:
+            entry = (time.time(), None, (type(response).__name__,
+                                         str(response)), None)
+        self.status_cache['head:' + normalize_url(url)] = entry
+
+    def _request(self, url, timeout):
+        use_cache = self.status_cache is not None and (
+            self.status_cache_ttl > 0 or self.negative_status_cache_ttl > 0)
+        if use_cache:
+            response = self._get_cached_response(url)
+            if response is not None:
+                return response
+
+        host = urlsplit(url).netloc
+        try:
+            with self.scheduler.request(host):
+                response = self.session.head(url, allow_redirects=False,
+                                             timeout=timeout)
+        except requests.exceptions.RequestException as exc:
+            response = exc
+        self.scheduler.report(host, response)
+
+        if use_cache and not isinstance(response, HostUnavailableError):
+            self._cache_response(url, response)
+        return response
+
+    def submit(self, url, timeout):
+        """
+        Schedules a HEAD request to a URL, which does not follow redirects.
+        If the same URL was already requested with the same timeout, the
+        earlier request is reused.
+
+        :param url:     The URL to request.
+        :param timeout: The timeout of the request in seconds.
+        :return:        A ``concurrent.futures.Future`` resolving to the
+                        ``requests.models.Response`` or the
+                        ``requests.exceptions.RequestException`` raised.
+        """
+        key = (normalize_url(url), timeout)
+        with self._lock:
+            if key not in self._responses:
+                self._responses[key] = self._executor.submit(self._request,
+                                                             url, timeout)
+            return self._responses[key]
+
+    def head(self, url, timeout):
+        """
+        Sends a HEAD request to a URL and waits for its response. See
+        ``submit``.
+
+        :param url:     The URL to request.
+        :param timeout: The timeout of the request in seconds.
+        :return:        The ``requests.models.Response`` or the
+                        ``requests.exceptions.RequestException`` raised.
+        """
+        return self.submit(url, timeout).result()
+
+    def head_all(self, requests_to_send):
+        """
+        Sends HEAD requests concurrently.
+
+        :param requests_to_send: An iterable of tuples of a URL and the
+                                 timeout to use for it.
+        :return:                 An iterator yielding the result of
+                                 ``head`` for every request, in the order
+                                 of ``requests_to_send``.
+        """
+        futures = [self.submit(url, timeout)
+                   for url, timeout in requests_to_send]
+        for future in futures:
+            yield future.result()
+
+    def resolve_all(self, requests_to_send,
+                    max_redirects=DEFAULT_MAX_REDIRECTS):
+        """
+        Sends HEAD requests concurrently and follows their redirects. Every
+        URL of a redirect chain is requested with ``submit``, so URLs shared
+        by several chains are only requested once. A chain ends at a
+        response which is no redirect, a failed request, a redirect loop or
+        after ``max_redirects`` redirects.
+
+        :param requests_to_send: An iterable of tuples of a URL and the
+                                 timeout to use for it and its redirects.
+        :param max_redirects:    The maximum number of redirects followed.
+        :return:                 An iterator yielding a tuple of the list
+                                 of responses of the chain, starting with
+                                 the response to the URL itself, and the
+                                 URL the chain ends at, in the order of
+                                 ``requests_to_send``.
+        """
+        chains = [([url], [self.submit(url, timeout)], timeout)
+                  for url, timeout in requests_to_send]
+
+        # Follow all chains one redirect at a time, so the requests of a
+        # round are sent concurrently.
+        pending = chains
+        while pending:
+            unresolved = []
+            for urls, futures, timeout in pending:
+                location = get_redirect_location(futures[-1].result())
+                if (location is None or len(futures) > max_redirects or
+                        normalize_url(location) in map(normalize_url, urls)):
+                    continue
+                urls.append(location)
+                futures.append(self.submit(location, timeout))
+                unresolved.append((urls, futures, timeout))
+            pending = unresolved
+
+        for urls, futures, _ in chains:
+            responses = [future.result() for future in futures]
+            yield responses, (
+                responses[-1].url
+                if isinstance(responses[-1], requests.models.Response)
+                else urls[-1])
+
+    def close(self):
+        """
+        Waits for all pending requests and closes all connections.
+        """
+        self._executor.shutdown()
+        self.session.close()
+
+
+def get_engine(bear, **settings):
+    """
+    Retrieves the ``HeadRequestEngine`` of a bear. It is created once and
+    reused for all files, so open connections and the responses to URLs
+    already requested are reused as well. A new engine is created if the
+    settings change.
+
+    :param bear:     The bear using the engine. The status cache is kept
+                     in its data directory.
+    :param settings: The keyword arguments to create the engine with,
+                     except for ``status_cache``.
+    :return:         A ``HeadRequestEngine``.
+    """
+    if getattr(bear, '_engine_settings', None) != settings:
+        if getattr(bear, '_engine', None) is not None:
+            bear._engine.close()
+
+        status_cache = (
+            PersistentCache(bear.data_dir, STATUS_CACHE_SIZE)
+            if (settings.get('status_cache_ttl', 0) > 0 or
+                settings.get('negative_status_cache_ttl', 0) > 0)
+            else None)
+        bear._engine = HeadRequestEngine(status_cache=status_cache,
+                                         **settings)
+        bear._engine_settings = settings
+
+    return bear._engine
@@ -0,0 +1,153 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+
+
+def parse_host_settings(url_settings):
+    """
+    Converts a dict of per URL settings into a dict of per host settings.
+
+    >>> sorted(parse_host_settings({'https://coala.io/docs': 10,
+    ...                             '*': 20}).items())
+    [('*', 20), ('coala.io', 10)]
+
+    :param url_settings: A dict mapping URLs to a value. It can contain a
+                         wildcard entry with the key ``*``.
+    :return:             A dict mapping the hosts of the URLs to the values.
+    """
+    return {urlparse(url).netloc if not url == '*' else '*': value
+            for url, value in url_settings.items()}
+
+
+def get_host_setting(host_settings, host, default):
+    """
+    Retrieves the setting to use for a host.
+
+    :param host_settings: A dict as returned by ``parse_host_settings``.
+    :param host:          The host to get the setting of.
+    :param default:       The value to use if neither the host nor the
+                          wildcard ``*`` is in ``host_settings``.
+    :return:              The setting of the host.
+    """
+    return (host_settings.get(host)
+            if host in host_settings
+            else host_settings.get('*')
+            if '*' in host_settings
+            else default)
+
+
+class HostUnavailableError(requests.exceptions.ConnectionError):
+    """
+    Used as the response to a request to a host which failed too many times
+    in a row, without connecting to it.
+    """
+
+
+class HostScheduler:
+    """
+    Schedules requests to hosts, so that every host gets a limited number of
+    requests in flight and per second.
+
+    It also acts as circuit breaker. Once a number of connections to a host
+    failed in a row, all further requests to it fail instantly with a
+    ``HostUnavailableError`` instead of waiting for the timeout again.
+    """
+
+    def __init__(self,
+                 max_requests_per_host,
+                 requests_per_second=None,
+                 max_connection_failures=0):
+        """
+        Creates a new HostScheduler.
+
+        :param max_requests_per_host:   The maximum number of requests in
+                                        flight at once to the same host.
+        :param requests_per_second:     A dict as returned by
+                                        ``parse_host_settings`` holding
+                                        the maximum number of requests per
+                                        second to every host. Hosts without
+                                        a positive limit are not limited.
+        :param max_connection_failures: The number of consecutive failed
+                                        connections after which a host is
+                                        not requested anymore. 0 disables
+                                        the circuit breaker.
+        """
+        self.max_requests_per_host = max_requests_per_host
+        self.requests_per_second = requests_per_second or {}
+        self.max_connection_failures = max_connection_failures
+        self._semaphores = {}
+        self._next_request_times = {}
+        self._connection_failures = {}
+        self._lock = threading.Lock()
+
+    def is_available(self, host):
+        """
+        Checks whether the circuit breaker of a host is closed.
+
+        :param host: The host to check.
+        :return:     False if too many connections to the host failed.
+        """
+        return not (self.max_connection_failures and
+                    self._connection_failures.get(host, 0) >=
+                    self.max_connection_failures)
+
+    def _wait_for_rate_limit(self, host):
+        rate = get_host_setting(self.requests_per_second, host, 0)
+        if not rate or rate <= 0:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_request_times.get(host, now))
+            self._next_request_times[host] = request_time + 1 / rate
+
+        if request_time > now:
+            time.sleep(request_time - now)
+
+    @contextmanager
+    def request(self, host):
+        """
+        Waits until a request to a host may be sent. The request has to be
+        sent inside of the context.
+
+        :param host: The host to send the request to.
+        :raises HostUnavailableError:
+                     If too many connections to the host failed.
+        """
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(
+                    self.max_requests_per_host)
+            semaphore = self._semaphores[host]
+
+        with semaphore:
+            # Other requests may have failed while waiting
+            if not self.is_available(host):
+                raise HostUnavailableError(
+                    'Skipped the request to {} as too many connections to '
+                    'it failed.'.format(host))
+
+            self._wait_for_rate_limit(host)
+            yield
+
+    def report(self, host, response):
+        """
+        Reports the outcome of a request to a host for its circuit breaker.
+
+        :param host:     The host the request was sent to.
+        :param response: The ``requests.models.Response`` or the exception
+                         raised by the request.
+        """
+        if isinstance(response, HostUnavailableError):
+            return
+
+        with self._lock:
+            if isinstance(response, (requests.exceptions.ConnectionError,
+                                     requests.exceptions.Timeout)):
+                self._connection_failures[host] = (
+                    self._connection_failures.get(host, 0) + 1)
+            else:
+                self._connection_failures[host] = 0
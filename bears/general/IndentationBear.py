@@ -1,4 +1,8 @@
-from coala_utils.string_processing.Core import unescaped_search_for
+import re
+from itertools import chain
+
+from coala_utils.string_processing.Core import (position_is_escaped,
+                                                unescaped_search_for)
 from coalib.bears.LocalBear import LocalBear
 from coalib.bearlib import deprecate_settings
 from coalib.bearlib.languages.LanguageDefinition import LanguageDefinition
@@ -8,7 +12,9 @@ from coalib.results.Result import Result, RESULT_SEVERITY
 from coalib.results.AbsolutePosition import AbsolutePosition
 from coalib.results.Diff import Diff
 
-from bears.general.AnnotationBear import AnnotationBear
+from bears.general.AnnotationBear import (AnnotationBear, calc_line_cols,
+                                          get_line_offsets)
+from bears.general.RangeIndex import RangeIndex
 
 
 class IndentationBear(LocalBear):
@@ -68,7 +74,9 @@ class IndentationBear(LocalBear):
         """
         lang_settings_dict = LanguageDefinition(
             language, coalang_dir=coalang_dir)
-        annotation_dict = dependency_results[AnnotationBear.name][0].contents
+        annotation_dict = {
+            kind: RangeIndex(ranges) for kind, ranges in
+            dependency_results[AnnotationBear.name][0].contents.items()}
         # sometimes can't convert strings with ':' to dict correctly
         if ':' in dict(lang_settings_dict['indent_types']).keys():
             indent_types = dict(lang_settings_dict['indent_types'])
@@ -79,13 +87,8 @@ class IndentationBear(LocalBear):
         encapsulators = (dict(lang_settings_dict['encapsulators']) if
                          'encapsulators' in lang_settings_dict else {})
 
-        encaps_pos = []
-        for encapsulator in encapsulators:
-            encaps_pos += self.get_specified_block_range(
-                file, filename,
-                encapsulator, encapsulators[encapsulator],
-                annotation_dict)
-        encaps_pos = tuple(sorted(encaps_pos, key=lambda x: x.start.line))
+        encaps_pos = RangeIndex(self.get_block_ranges(
+            file, filename, encapsulators, annotation_dict))
 
         comments = dict(lang_settings_dict['comment_delimiters'])
         comments.update(
@@ -206,35 +209,33 @@ class IndentationBear(LocalBear):
         :return:                A tuple containing the levels of indentation of
                                 each line.
         """
-        ranges = []
+        specified_types = {open_specifier: close_specifier
+                           for open_specifier, close_specifier
+                           in indent_types.items() if close_specifier}
+        ranges = list(self.get_block_ranges(
+            file, filename, specified_types, annotation_dict))
         for indent_specifier in indent_types:
-            if indent_types[indent_specifier]:
-                ranges += self.get_specified_block_range(
-                    file, filename,
-                    indent_specifier, indent_types[indent_specifier],
-                    annotation_dict)
-            else:
+            if not indent_types[indent_specifier]:
                 ranges += self.get_unspecified_block_range(
                     file, filename,
                     indent_specifier, annotation_dict, encapsulators, comments)
 
-        ranges = sorted(ranges, key=lambda x: x.start.line)
+        # Count the blocks opening and closing in every line, so the levels
+        # are computed in a single pass over the file.
+        openings = [0] * (len(file) + 1)
+        closings = [0] * (len(file) + 1)
+        for _range in ranges:
+            openings[_range.start.line - 1] += 1
+            closings[_range.end.line - 1] += 1
+
         indent_levels = []
-        indent, next_indent = 0, 0
+        next_indent = 0
         for line in range(0, len(file)):
             indent = next_indent
-            for _range in ranges:
-                if _range.start.line == line + 1:
-                    next_indent += 1
-
-                first_ch = file[line].lstrip()[:1]
-                if(_range.end.line == line + 1 and
-                   first_ch in indent_types.values()):
-                    indent -= 1
-                    next_indent -= 1
-
-                elif _range.end.line == line + 1:
-                    next_indent -= 1
+            first_ch = file[line].lstrip()[:1]
+            if first_ch in indent_types.values():
+                indent -= closings[line]
+            next_indent += openings[line] - closings[line]
             indent_levels.append(indent)
 
         return tuple(indent_levels)
@@ -265,50 +266,91 @@ class IndentationBear(LocalBear):
                                 Equal level indents appear in the order of
                                 first encounter or left to right.
         """
-        ranges = []
-
-        open_pos = list(self.get_valid_sequences(
-            file, open_specifier, annotation_dict))
-        close_pos = list(self.get_valid_sequences(
-            file, close_specifier, annotation_dict))
+        return self.get_block_ranges(file, filename,
+                                     {open_specifier: close_specifier},
+                                     annotation_dict)
+
+    def get_block_ranges(self,
+                         file,
+                         filename,
+                         specifiers,
+                         annotation_dict):
+        """
+        Gets the sourceranges of all blocks of several types of specifiers.
 
-        number_of_encaps = len(open_pos)
-        if number_of_encaps != len(close_pos):
-            raise UnmatchedIndentError(open_specifier, close_specifier)
+        All specifiers are searched for in a single pass over the file,
+        skipping the ones inside of strings and comments. Blocks are only
+        matched with blocks of the same type, so blocks of different types
+        may overlap. Where specifiers start with one another, the longest
+        one is used.
 
-        if number_of_encaps == 0:
+        :param file:            File that needs to be checked in the form of
+                                a list of strings.
+        :param filename:        Name of the file that needs to be checked.
+        :param specifiers:      A dictionary with the opening specifiers of
+                                the blocks as keys and the closing ones as
+                                values.
+        :param annotation_dict: A dictionary containing RangeIndexes of all
+                                the strings and comments within a file.
+        :return:                A tuple of SourceRanges sorted by their
+                                start line. Blocks starting in the same line
+                                are ordered by the type of their specifiers
+                                and then by the position of their end.
+        :raises UnmatchedIndentError:
+                                If the specifiers of a type don't match.
+                                The first type in ``specifiers`` without
+                                matching specifiers is reported.
+        """
+        specifiers = list(specifiers.items())
+        if not specifiers:
             return ()
 
-        stack = []
+        # Every specifier can open and close blocks of several types.
+        roles = {}
+        for index, (open_specifier, close_specifier) in enumerate(specifiers):
+            roles.setdefault(open_specifier, ([], []))[0].append(index)
+            roles.setdefault(close_specifier, ([], []))[1].append(index)
+        specifier_regex = re.compile('|'.join(
+            re.escape(specifier)
+            for specifier in sorted(roles, key=len, reverse=True)))
+
         text = ''.join(file)
-        open_counter = close_counter = position = 0
-        op_limit = cl_limit = False
-        for position in range(len(text)):
-            if not op_limit:
-                if open_pos[open_counter].position == position:
-                    stack.append(open_pos[open_counter])
-                    open_counter += 1
-                    if open_counter == number_of_encaps:
-                        op_limit = True
-
-            if not cl_limit:
-                if close_pos[close_counter].position == position:
-                    try:
-                        op = stack.pop()
-                    except IndexError:
-                        raise UnmatchedIndentError(open_specifier,
-                                                   close_specifier)
-                    ranges.append(SourceRange.from_values(
-                        filename,
-                        start_line=op.line,
-                        start_column=op.column,
-                        end_line=close_pos[close_counter].line,
-                        end_column=close_pos[close_counter].column))
-                    close_counter += 1
-                    if close_counter == number_of_encaps:
-                        cl_limit = True
-
-        return tuple(ranges)
+        matches = [match for match in specifier_regex.finditer(text)
+                   if not position_is_escaped(text, match.start())]
+        line_cols = calc_line_cols(get_line_offsets(file),
+                                   [match.start() for match in matches])
+
+        stacks = [[] for _ in specifiers]
+        ranges = [[] for _ in specifiers]
+        unmatched = set()
+        for match, (line, column) in zip(matches, line_cols):
+            if (annotation_dict['strings'].contains_position(line, column) or
+                    annotation_dict['comments'].contains_position(line,
+                                                                  column)):
+                continue
+
+            opens, closes = roles[match.group()]
+            for index in opens:
+                stacks[index].append((line, column))
+            for index in closes:
+                if not stacks[index]:
+                    unmatched.add(index)
+                    continue
+                start_line, start_column = stacks[index].pop()
+                ranges[index].append(SourceRange.from_values(
+                    filename,
+                    start_line=start_line,
+                    start_column=start_column,
+                    end_line=line,
+                    end_column=column))
+
+        unmatched.update(index for index, stack in enumerate(stacks)
+                         if stack)
+        if unmatched:
+            raise UnmatchedIndentError(*specifiers[min(unmatched)])
+
+        return tuple(sorted(chain.from_iterable(ranges),
+                            key=lambda x: x.start.line))
 
     def get_unspecified_block_range(self,
                                     file,
@@ -373,9 +415,9 @@ class IndentationBear(LocalBear):
         :param file:            File that needs to be checked in the form of
                                 a list of strings.
         :param sequence:        Sequence whose validity is to be checked.
-        :param annotation_dict: A dictionary containing sourceranges of all the
-                                strings and comments within a file.
-        :param encapsulators:   A tuple of SourceRanges of code regions
+        :param annotation_dict: A dictionary containing RangeIndexes of all
+                                the strings and comments within a file.
+        :param encapsulators:   A RangeIndex of SourceRanges of code regions
                                 trapped in between a matching pair of
                                 encapsulators.
         :param check_ending:    Check whether sequence falls at the end of the
@@ -393,31 +435,22 @@ class IndentationBear(LocalBear):
                                     file, sequence_match.start())
             sequence_line_text = file[sequence_position.line - 1]
 
-            # ignore if within string
-            for string in annotation_dict['strings']:
-                if(gt_eq(sequence_position, string.start) and
-                   lt_eq(sequence_position, string.end)):
-                    valid = False
-
-            # ignore if within comments
-            for comment in annotation_dict['comments']:
-                if(gt_eq(sequence_position, comment.start) and
-                   lt_eq(sequence_position, comment.end)):
-                    valid = False
-
-                if(comment.start.line == sequence_position.line and
-                        comment.end.line == sequence_position.line and
-                        check_ending):
+            # ignore if within strings, comments or encapsulators
+            if (annotation_dict['strings'].contains_position(
+                    sequence_position.line, sequence_position.column) or
+                    annotation_dict['comments'].contains_position(
+                        sequence_position.line, sequence_position.column) or
+                    (encapsulators and encapsulators.contains_position(
+                        sequence_position.line, sequence_position.column))):
+                valid = False
+
+            if check_ending:
+                for comment in annotation_dict['comments'].ranges_in_line(
+                        sequence_position.line):
                     sequence_line_text = sequence_line_text[
                         :comment.start.column - 1] + sequence_line_text[
                         comment.end.column-1:]
 
-            if encapsulators:
-                for encapsulator in encapsulators:
-                    if(gt_eq(sequence_position, encapsulator.start) and
-                       lt_eq(sequence_position, encapsulator.end)):
-                        valid = False
-
             if not sequence_line_text.rstrip().endswith(':') and check_ending:
                 valid = False
 
@@ -463,10 +496,11 @@ def get_first_unindent(indent,
     :param file:            A tuple of strings.
     :param start_line:      The line from where to start searching for
                             unindent.
-    :param annotation_dict: A dictionary containing sourceranges of all the
+    :param annotation_dict: A dictionary containing RangeIndexes of all the
                             strings and comments within a file.
-    :param encapsulators:   A tuple of SourceRanges of code regions trapped in
-                            between a matching pair of encapsulators.
+    :param encapsulators:   A RangeIndex of SourceRanges of code regions
+                            trapped in between a matching pair of
+                            encapsulators.
     :param comments:        A dict containing all the types of comments
                             specifiers in a language.
     :return:                The line where unindent is found (intial 0).
@@ -474,22 +508,11 @@ def get_first_unindent(indent,
     line_nr = start_line
 
     while line_nr < len(file):
-        valid = True
-
-        for comment in annotation_dict['comments']:
-            if(comment.start.line < line_nr + 1 and
-               comment.end.line >= line_nr + 1):
-                valid = False
-
-            first_char = file[line_nr].lstrip()[0] if file[line_nr].strip()\
-                else ''
-            if first_char in comments:
-                valid = False
-
-        for encapsulator in encapsulators:
-            if(encapsulator.start.line < line_nr + 1 and
-               encapsulator.end.line >= line_nr + 1):
-                valid = False
+        first_char = file[line_nr].lstrip()[0] if file[line_nr].strip()\
+            else ''
+        valid = not (annotation_dict['comments'].covers_line(line_nr + 1) or
+                     first_char in comments or
+                     encapsulators.covers_line(line_nr + 1))
 
         line_indent = len(file[line_nr]) - len(file[line_nr].lstrip())
         if line_indent <= indent and valid:
@@ -499,22 +522,6 @@ def get_first_unindent(indent,
     return line_nr
 
 
-# TODO remove these once https://github.com/coala/coala/issues/2377
-# gets a fix
-def lt_eq(absolute, source):
-    if absolute.line == source.line:
-        return absolute.column <= source.column
-
-    return absolute.line < source.line
-
-
-def gt_eq(absolute, source):
-    if absolute.line == source.line:
-        return absolute.column >= source.column
-
-    return absolute.line > source.line
-
-
 def get_element_indent(file, encaps):
     """
     Gets indent of elements inside encapsulator.
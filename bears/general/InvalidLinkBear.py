@@ -1,7 +1,8 @@
-import requests
-
 from difflib import SequenceMatcher
 
+import requests
+
+from bears.general.HeadRequestEngine import get_redirect_location
 from bears.general.URLHeadBear import URLHeadBear
 from coalib.results.Diff import Diff
 from coalib.bears.LocalBear import LocalBear
@@ -74,8 +75,18 @@ class InvalidLinkBear(LocalBear):
                         line=line_number,
                         severity=RESULT_SEVERITY.NORMAL)
                 if follow_redirects and 300 <= code < 400:  # HTTP status 30x
-                    redirect_url = requests.head(link,
-                                                 allow_redirects=True).url
+                    redirect_url = result.final_url
+                    # Only suggest URLs the redirects were followed to the
+                    # end to, which respond with something else than a
+                    # redirect.
+                    final_response = result.final_response
+                    if (redirect_url == link or
+                            not isinstance(final_response,
+                                           requests.models.Response) or
+                            get_redirect_location(final_response)
+                            is not None):
+                        continue
+
                     matcher = SequenceMatcher(
                         None, redirect_url, link)
                     if (matcher.real_quick_ratio() > 0.7 and
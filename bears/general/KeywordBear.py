@@ -8,6 +8,7 @@ from coalib.results.Result import RESULT_SEVERITY, Result
 from coalib.results.SourceRange import SourceRange
 
 from bears.general.AnnotationBear import AnnotationBear
+from bears.general.RangeIndex import RangeIndex
 
 
 def _get_comments(dependency_results):
@@ -23,12 +24,33 @@ def _get_comments(dependency_results):
             yield from result.contents.get('comments', [])
 
 
+def _get_comment_spans(file, comments):
+    """
+    Splits comments into the parts of them in every line.
+
+    :param file:     A tuple of strings, with each string being a line in the
+                     file.
+    :param comments: An iterable of the SourceRanges of the comments.
+    :return:         An iterator yielding tuples of the line number and the
+                     start and end index of the comment in that line.
+    """
+    for comment in comments:
+        for line_number in range(comment.start.line, comment.end.line + 1):
+            start = (comment.start.column - 1
+                     if line_number == comment.start.line else 0)
+            end = (comment.end.column
+                   if line_number == comment.end.line
+                   else len(file[line_number - 1]))
+            yield line_number, start, end
+
+
 def generate_diff(comments, file, filename,
                   line, line_number, pos):
     todo_source_range = SourceRange.from_values(filename, line_number,
                                                 pos + 1)
     affected_comment_sourcerange = [
-        c for c in comments if todo_source_range in c]
+        c for c in comments.get_containing_ranges(line_number, pos + 1)
+        if todo_source_range in c]
 
     affected_len = len(affected_comment_sourcerange)
 
@@ -81,6 +103,7 @@ class KeywordBear(LocalBear):
             file,
             keywords: list = ['todo', 'fixme'],
             regex_keyword: str = '',
+            comments_only: bool = False,
             dependency_results: dict = None,
             ):
         """
@@ -91,8 +114,13 @@ class KeywordBear(LocalBear):
             Default are TODO and FIXME.
         :param regex_keyword:
             A regular expression to search for matching keywords in a file.
+        :param comments_only:
+            Only search for keywords inside of comments. The rest of the
+            code, including strings, is not scanned at all.
         """
-        comments = list(_get_comments(dependency_results))
+        comments = RangeIndex(_get_comments(dependency_results))
+        spans = (tuple(_get_comment_spans(file, comments)) if comments_only
+                 else None)
 
         if keywords:
             simple_keywords_regex = re.compile(
@@ -101,24 +129,28 @@ class KeywordBear(LocalBear):
 
             message = "The line contains the keyword '{}'."
             yield from self.check_keywords(filename, file, comments,
-                                           simple_keywords_regex, message)
+                                           simple_keywords_regex, message,
+                                           spans)
 
         if regex_keyword is not '':
             regex = re.compile(regex_keyword)
             message = ("The line contains the keyword '{}' which "
                        'resulted in a match with given regex.')
             yield from self.check_keywords(filename, file, comments, regex,
-                                           message)
+                                           message, spans)
 
     def check_keywords(self,
                        filename,
                        file,
                        comments,
                        regex,
-                       message):
+                       message,
+                       spans=None):
         """
         Checks for the presence of keywords according to regex in a given file.
 
+        :param comments:
+            A RangeIndex of the comments in the file.
         :param regex:
             A regular expression which is used to search matching
             keywords in a file.
@@ -126,10 +158,18 @@ class KeywordBear(LocalBear):
             A message to be displayed to the user when a keyword in a given
             file results in a match. It may have an unnamed placeholder for the
             keyword.
+        :param spans:
+            An iterable of tuples of a line number and the start and end
+            index of the part of the line to search in. All lines are
+            searched as a whole by default.
         """
+        if spans is None:
+            spans = ((line_number, 0, len(line))
+                     for line_number, line in enumerate(file, start=1))
 
-        for line_number, line in enumerate(file, start=1):
-            for keyword in regex.finditer(line):
+        for line_number, start, end in spans:
+            line = file[line_number - 1]
+            for keyword in regex.finditer(line, start, end):
                 diffs = generate_diff(
                     comments,
                     file,
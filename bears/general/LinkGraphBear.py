@@ -0,0 +1,417 @@
+import os
+import re
+from collections import Counter
+from urllib.parse import unquote, urlsplit
+
+from bears.general.HeadRequestEngine import HeadRequestEngine, get_engine
+from bears.general.HostScheduler import get_host_setting, parse_host_settings
+from bears.general.URLBear import LINK_CONTEXT, URLBear
+
+from coalib.bears.GlobalBear import GlobalBear
+from coalib.results.Result import Result
+from coalib.results.RESULT_SEVERITY import RESULT_SEVERITY
+from coalib.settings.Setting import path, typed_dict, typed_list
+from dependency_management.requirements.PipRequirement import PipRequirement
+
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+RST_EXTENSIONS = ('.rst', '.rest')
+HTML_EXTENSIONS = ('.html', '.htm')
+
+# Files a link to a directory or to a rendered page without extension
+# can point to.
+INDEX_NAMES = ('index', 'README')
+
+MARKDOWN_LINK_REGEX = re.compile(
+    r'!?\[[^\]]*\]\(\s*<?([^\s()<>]+)>?(?:\s+["\'(][^)]*)?\)')
+MARKDOWN_REFERENCE_REGEX = re.compile(r'^ {0,3}\[[^\]]+\]:\s*<?([^\s<>]+)')
+MARKDOWN_HEADING_REGEX = re.compile(r'^ {0,3}#{1,6}\s+(.*?)(?:\s+#+)?\s*$')
+MARKDOWN_SETEXT_REGEX = re.compile(r'^ {0,3}(?:=+|-+)\s*$')
+MARKDOWN_FENCE_REGEX = re.compile(r'^ {0,3}(?:```|~~~)')
+RST_LINK_REGEX = re.compile(r'`[^`<]*<([^`<>]+)>`__?')
+RST_TARGET_REGEX = re.compile(r'^\.\. _[^:]+:\s+(\S+)\s*$')
+RST_LABEL_REGEX = re.compile(r'^\.\. _([^:]+):\s*$')
+RST_UNDERLINE_REGEX = re.compile(r'^([!-/:-@[-`{-~])\1*\s*$')
+HTML_LINK_REGEX = re.compile(r'\b(?:href|src)\s*=\s*["\']([^"\']+)["\']')
+HTML_ANCHOR_REGEX = re.compile(r'\b(?:id|name)\s*=\s*["\']([^"\']+)["\']')
+SCHEME_REGEX = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*:')
+
+
+def get_markdown_anchor(title):
+    """
+    Generates the anchor of a Markdown heading the way GitHub does.
+
+    >>> get_markdown_anchor('Getting Started: The `run` Method!')
+    'getting-started-the-run-method'
+
+    :param title: The text of the heading.
+    :return:      The anchor.
+    """
+    return re.sub(r'[^\w\- ]', '', title.strip().lower()).replace(' ', '-')
+
+
+def get_rst_anchor(title):
+    """
+    Generates the anchor of a reStructuredText section title or label the
+    way docutils does.
+
+    >>> get_rst_anchor('2. Getting Started: The ``run`` Method!')
+    'getting-started-the-run-method'
+
+    :param title: The section title or the name of the label.
+    :return:      The anchor.
+    """
+    return re.sub(r'^[-0-9]+|-+$', '',
+                  re.sub(r'[^a-z0-9]+', '-', title.lower()))
+
+
+def get_markdown_lines(file):
+    """
+    Yields the lines of a Markdown file which are not inside of fenced
+    code blocks.
+
+    :param file: The lines of the file.
+    :return:     An iterator of tuples of the index of the line and the
+                 line itself.
+    """
+    in_code_block = False
+    for index, line in enumerate(file):
+        if MARKDOWN_FENCE_REGEX.match(line):
+            in_code_block = not in_code_block
+        elif not in_code_block:
+            yield index, line
+
+
+def get_anchors(filename, file):
+    """
+    Collects the anchors links to a file can point to, which are its
+    headings and the ``id`` and ``name`` attributes of HTML elements.
+
+    :param filename: The name of the file, whose extension decides on its
+                     format.
+    :param file:     The lines of the file.
+    :return:         A set of the anchors or None if the format of the file
+                     is not supported.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in MARKDOWN_EXTENSIONS + RST_EXTENSIONS + HTML_EXTENSIONS:
+        return None
+
+    anchors = {anchor for line in file
+               for anchor in HTML_ANCHOR_REGEX.findall(line)}
+
+    if extension in MARKDOWN_EXTENSIONS:
+        # Headings with the same anchor get a number appended
+        anchor_counts = Counter()
+        previous_line = ''
+        for _, line in get_markdown_lines(file):
+            match = MARKDOWN_HEADING_REGEX.match(line)
+            title = (match.group(1) if match
+                     else previous_line
+                     if MARKDOWN_SETEXT_REGEX.match(line)
+                     else None)
+            previous_line = line.strip()
+            if not title:
+                continue
+
+            anchor = get_markdown_anchor(title)
+            if anchor_counts[anchor]:
+                anchors.add('{}-{}'.format(anchor, anchor_counts[anchor]))
+            else:
+                anchors.add(anchor)
+            anchor_counts[anchor] += 1
+
+    elif extension in RST_EXTENSIONS:
+        for index, line in enumerate(file):
+            match = RST_LABEL_REGEX.match(line)
+            if match:
+                anchors.add(get_rst_anchor(match.group(1)))
+
+            title = line.strip()
+            if (title and index + 1 < len(file) and
+                    not RST_UNDERLINE_REGEX.match(line) and
+                    RST_UNDERLINE_REGEX.match(file[index + 1]) and
+                    len(file[index + 1].strip()) >= len(title)):
+                anchors.add(get_rst_anchor(title))
+
+    return anchors
+
+
+def get_local_links(filename, file):
+    """
+    Finds the links in the markup of a file which don't have a scheme, i.e.
+    links relative to the file, to the site root or to an anchor.
+
+    :param filename: The name of the file, whose extension decides on its
+                     format.
+    :param file:     The lines of the file.
+    :return:         An iterator of tuples of the line number, the column
+                     and the link.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in MARKDOWN_EXTENSIONS:
+        lines = get_markdown_lines(file)
+        regexes = (MARKDOWN_LINK_REGEX, MARKDOWN_REFERENCE_REGEX,
+                   HTML_LINK_REGEX)
+    elif extension in RST_EXTENSIONS:
+        lines = enumerate(file)
+        regexes = (RST_LINK_REGEX, RST_TARGET_REGEX)
+    elif extension in HTML_EXTENSIONS:
+        lines = enumerate(file)
+        regexes = (HTML_LINK_REGEX,)
+    else:
+        return
+
+    for index, line in lines:
+        matches = sorted((match for regex in regexes
+                          for match in regex.finditer(line)),
+                         key=lambda match: match.start(1))
+        for match in matches:
+            link = match.group(1)
+            # Links with a scheme are found by URLBear, links ending with
+            # an underscore are references to reStructuredText targets.
+            if (SCHEME_REGEX.match(link) or link.startswith('//') or
+                    link.endswith('_')):
+                continue
+            yield index + 1, match.start(1) + 1, link
+
+
+class SiteIndex:
+    """
+    An index of the files of a site and their anchors, which resolves links
+    between them with dictionary lookups.
+
+    The anchors of a file are only collected once a link to an anchor in it
+    is checked.
+    """
+
+    def __init__(self, file_dict):
+        """
+        Creates a new SiteIndex.
+
+        :param file_dict: A dict mapping the names of the files of the site
+                          to their lines.
+        """
+        self.file_dict = file_dict
+        self._files = {}
+        self._stems = {}
+        self._anchors = {}
+        for filename in file_dict:
+            key = os.path.normcase(os.path.abspath(filename))
+            self._files[key] = filename
+            self._stems.setdefault(os.path.splitext(key)[0], filename)
+
+    def find_file(self, path):
+        """
+        Finds the file a path points to. A path to a rendered HTML page or
+        without extension also matches its source file and a path to a
+        directory also matches its index page.
+
+        :param path: The absolute path to look up.
+        :return:     The name of the file in the ``file_dict`` or None if
+                     the path does not point to any of them.
+        """
+        key = os.path.normcase(os.path.normpath(path))
+        if key in self._files:
+            return self._files[key]
+
+        stem, extension = os.path.splitext(key)
+        if extension.lower() in HTML_EXTENSIONS + ('',):
+            if stem in self._stems:
+                return self._stems[stem]
+            for name in INDEX_NAMES:
+                index = os.path.normcase(
+                    os.path.join(stem if extension else key, name))
+                if index in self._stems:
+                    return self._stems[index]
+        return None
+
+    def get_anchors(self, filename):
+        """
+        Retrieves the anchors of a file, see ``get_anchors``.
+
+        :param filename: The name of the file in the ``file_dict``.
+        :return:         A set of the anchors or None if the format of the
+                         file is not supported.
+        """
+        if filename not in self._anchors:
+            self._anchors[filename] = get_anchors(filename,
+                                                  self.file_dict[filename])
+        return self._anchors[filename]
+
+
+class LinkGraphBear(GlobalBear):
+    DEFAULT_TIMEOUT = 15
+    LANGUAGES = {'Markdown', 'reStructuredText', 'HTML'}
+    REQUIREMENTS = {PipRequirement('requests', '2.12'),
+                    PipRequirement('aenum', '2.0.8')}
+    AUTHORS = {'The coala developers'}
+    AUTHORS_EMAILS = {'coala-devel@googlegroups.com'}
+    LICENSE = 'AGPL-3.0'
+    CAN_DETECT = {'Documentation'}
+
+    @staticmethod
+    def check_local_link(index, filename, site_root, link):
+        """
+        Checks a link to a file of the site without going to the network.
+
+        :param index:     The ``SiteIndex`` of the site.
+        :param filename:  The name of the file containing the link.
+        :param site_root: The directory the root of the site is in.
+        :param link:      The path of the link, relative to the file or to
+                          the site root, with an optional anchor.
+        :return:          A message describing why the link is broken or
+                          None if it is valid.
+        """
+        parts = urlsplit(link)
+        link_path = unquote(parts.path)
+        if not link_path:
+            target = filename
+        else:
+            if link_path.startswith('/'):
+                link_path = os.path.join(site_root, link_path.lstrip('/'))
+            else:
+                link_path = os.path.join(
+                    os.path.dirname(os.path.abspath(filename)), link_path)
+
+            target = index.find_file(link_path)
+            if target is None:
+                # Files not given to coala, like images, are looked up on
+                # disk instead.
+                return (None if os.path.exists(link_path) else
+                        'Broken link - {} points to a file that does not '
+                        'exist'.format(link))
+
+        if not parts.fragment:
+            return None
+
+        anchors = index.get_anchors(target)
+        if anchors is not None and unquote(parts.fragment) not in anchors:
+            return ('Broken link - {} points to an anchor that does not '
+                    'exist in {}'.format(link, target))
+        return None
+
+    def run(self,
+            site_root: path = '',
+            site_url: str = '',
+            check_external_links: bool = True,
+            link_ignore_regex: str = r'([.\/]example\.com|\{|\$)',
+            link_ignore_list: typed_list(str) = '',
+            network_timeout: typed_dict(str, int, DEFAULT_TIMEOUT) = dict(),
+            max_concurrent_requests: int = (
+                HeadRequestEngine.DEFAULT_MAX_REQUESTS),
+            max_concurrent_requests_per_host: int = (
+                HeadRequestEngine.DEFAULT_MAX_REQUESTS_PER_HOST),
+            ):
+        """
+        Finds broken links in a set of documentation files.
+
+        Links relative to a file, links to the site root and links starting
+        with ``site_url`` are resolved against the given files and the
+        anchors in them, which are their headings and HTML ``id`` and
+        ``name`` attributes. Only links to other sites are checked with a
+        HEAD request.
+
+        Warning: This bear will make HEAD requests to all external URLs
+        mentioned in your documentation, which can potentially be
+        destructive. As an example, this bear would naively just visit the
+        URL from a line that goes like
+        `do_not_ever_open = 'https://api.acme.inc/delete-all-data'` wiping out
+        all your data.
+
+        :param site_root:            The directory links starting with ``/``
+                                     or ``site_url`` are resolved against.
+                                     Defaults to the directory of the
+                                     configuration file.
+        :param site_url:             The URL the site is published at, e.g.
+                                     ``https://docs.coala.io/``.
+        :param check_external_links: Set to false to only check the links
+                                     inside of the site.
+        :param link_ignore_regex:    A regex for urls to ignore.
+        :param link_ignore_list:     Comma separated url globs to ignore.
+        :param network_timeout:      A dict mapping URLs and timeout to be
+                                     used for that URL. All the URLs that
+                                     have the same host as that of URLs
+                                     provided will be passed that timeout.
+                                     It can also contain a wildcard timeout
+                                     entry with key '*'. The timeout of all
+                                     the websites not in the dict will be
+                                     the value of the key '*'.
+        :param max_concurrent_requests:
+                                     The maximum number of HEAD requests
+                                     sent at once.
+        :param max_concurrent_requests_per_host:
+                                     The maximum number of HEAD requests
+                                     sent at once to the same host.
+        """
+        site_root = site_root or self.get_config_dir()
+        site_url = site_url.rstrip('/') + '/' if site_url else None
+        ignore_regex = re.compile(link_ignore_regex)
+        index = SiteIndex(self.file_dict)
+
+        external_links = []
+        for filename in sorted(self.file_dict):
+            file = self.file_dict[filename]
+            local_links = list(get_local_links(filename, file))
+
+            for link, line_number, context in URLBear.extract_links_from_file(
+                    file, link_ignore_regex, link_ignore_list):
+                if context & LINK_CONTEXT.xml_namespace:
+                    continue
+                if context & LINK_CONTEXT.pip_vcs_url:
+                    link = URLBear.parse_pip_vcs_url(link)
+
+                if site_url is not None and link.startswith(site_url):
+                    local_links.append((line_number + 1, None,
+                                        '/' + link[len(site_url):]))
+                elif check_external_links:
+                    external_links.append((filename, line_number + 1, link))
+
+            for line_number, column, link in sorted(
+                    local_links, key=lambda link: (link[0], link[1] or 0)):
+                if ignore_regex.search(link):
+                    continue
+
+                message = LinkGraphBear.check_local_link(
+                    index, filename, site_root, link)
+                if message is not None:
+                    yield Result.from_values(
+                        origin=self,
+                        message=message,
+                        file=filename,
+                        line=line_number,
+                        column=column,
+                        severity=RESULT_SEVERITY.NORMAL)
+
+        if not external_links:
+            return
+
+        network_timeout = parse_host_settings(network_timeout)
+        engine = get_engine(
+            self,
+            max_requests=max_concurrent_requests,
+            max_requests_per_host=max_concurrent_requests_per_host)
+        responses = engine.head_all(
+            (link, get_host_setting(network_timeout, urlsplit(link).netloc,
+                                    LinkGraphBear.DEFAULT_TIMEOUT))
+            for _, _, link in external_links)
+
+        for (filename, line_number, link), response in zip(external_links,
+                                                           responses):
+            code = getattr(response, 'status_code', None)
+            if code is None:
+                yield Result.from_values(
+                    origin=self,
+                    message=('Broken link - unable to connect to '
+                             '{url}').format(url=link),
+                    file=filename,
+                    line=line_number,
+                    severity=RESULT_SEVERITY.MAJOR)
+            elif code in (404, 410) or 500 <= code < 600:
+                yield Result.from_values(
+                    origin=self,
+                    message=('Broken link - HTTP Error: {code} '
+                             'generated when connecting to {url}'
+                             ).format(url=link, code=code),
+                    file=filename,
+                    line=line_number,
+                    severity=RESULT_SEVERITY.NORMAL)
@@ -1,5 +1,11 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 
+from bears.general.PersistentCache import PersistentCache
 from bears.general.URLHeadBear import URLHeadBear
 
 from coalib.bears.LocalBear import LocalBear
@@ -10,6 +16,93 @@ from dependency_management.requirements.PipRequirement import PipRequirement
 
 from memento_client import MementoClient
 
+ARCHIVE_STATUS_CACHE_SIZE = 10000
+
+
+class ArchiveStatusChecker:
+    """
+    Looks up whether links are archived, with a bounded number of lookups
+    in flight at once.
+
+    All lookups share one ``MementoClient`` and its ``requests.Session``,
+    so connections to the timegate are reused. Every link is only looked
+    up once per checker, and the answers can also be kept in a
+    ``PersistentCache`` to share them between runs.
+    """
+
+    def __init__(self, max_lookups,
+                 status_cache=None,
+                 status_cache_ttl=0,
+                 negative_status_cache_ttl=0):
+        """
+        Creates a new ArchiveStatusChecker.
+
+        :param max_lookups:               The maximum number of lookups in
+                                          flight at once.
+        :param status_cache:              A ``PersistentCache`` to keep the
+                                          answers in, or None.
+        :param status_cache_ttl:          The number of seconds the answer
+                                          that a link is archived is used
+                                          from the ``status_cache``.
+        :param negative_status_cache_ttl: The number of seconds the answer
+                                          that a link is not archived is
+                                          used from the ``status_cache``.
+        """
+        if max_lookups < 1:
+            raise ValueError('At least one lookup has to be allowed at once.')
+
+        self.status_cache = status_cache
+        self.status_cache_ttl = status_cache_ttl
+        self.negative_status_cache_ttl = negative_status_cache_ttl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_lookups)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.client = MementoClient(session=self.session)
+        self._executor = ThreadPoolExecutor(max_lookups)
+        self._lookups = {}
+        self._lock = threading.Lock()
+
+    def _is_archived(self, link):
+        use_cache = self.status_cache is not None and (
+            self.status_cache_ttl > 0 or self.negative_status_cache_ttl > 0)
+        cache_key = 'memento:' + link
+        if use_cache:
+            entry = self.status_cache.get(cache_key)
+            if entry is not None:
+                timestamp, archived = entry
+                ttl = (self.status_cache_ttl if archived
+                       else self.negative_status_cache_ttl)
+                if time.time() - timestamp < ttl:
+                    return archived
+
+        archived = MementoBear.check_archive(self.client, link)
+        if use_cache:
+            self.status_cache[cache_key] = (time.time(), archived)
+        return archived
+
+    def submit(self, link):
+        """
+        Schedules looking up whether a link is archived. If the link was
+        already looked up, the earlier lookup is reused.
+
+        :param link: The link to look up.
+        :return:     A ``concurrent.futures.Future`` resolving to True if
+                     the link is archived.
+        """
+        with self._lock:
+            if link not in self._lookups:
+                self._lookups[link] = self._executor.submit(
+                    self._is_archived, link)
+            return self._lookups[link]
+
+    def close(self):
+        """
+        Waits for all pending lookups and closes all connections.
+        """
+        self._executor.shutdown()
+        self.session.close()
+
 
 class MementoBear(LocalBear):
     DEFAULT_TIMEOUT = 15
@@ -37,17 +130,45 @@ class MementoBear(LocalBear):
         return True
 
     @staticmethod
-    def get_redirect_urls(link):
-        urls = []
+    def get_redirect_urls(history):
+        """
+        Get the URLs of the redirects a link went through.
 
-        resp = requests.head(link, allow_redirects=True)
-        for redirect in resp.history:
-            urls.append(redirect.url)
+        :param history: The ``history`` of a ``URLHeadResult``.
+        :return:        The URLs of the redirects, starting with the link.
+        """
+        return [redirect.url for redirect in history]
 
-        return urls
+    def get_checker(self, **settings):
+        """
+        Retrieves the ``ArchiveStatusChecker`` of this bear. It is created
+        once and reused for all files, so links are only looked up once per
+        run. A new checker is created if the settings change.
+
+        :param settings: The keyword arguments to create the checker with,
+                         except for ``status_cache``.
+        :return:         An ``ArchiveStatusChecker``.
+        """
+        if getattr(self, '_checker_settings', None) != settings:
+            if getattr(self, '_checker', None) is not None:
+                self._checker.close()
+
+            status_cache = (
+                PersistentCache(self.data_dir, ARCHIVE_STATUS_CACHE_SIZE)
+                if (settings['status_cache_ttl'] > 0 or
+                    settings['negative_status_cache_ttl'] > 0)
+                else None)
+            self._checker = ArchiveStatusChecker(status_cache=status_cache,
+                                                 **settings)
+            self._checker_settings = settings
+
+        return self._checker
 
     def run(self, filename, file, dependency_results=dict(),
             follow_redirects: bool = True,
+            max_concurrent_lookups: int = 5,
+            archive_status_cache_ttl: int = 0,
+            negative_archive_status_cache_ttl: int = 0,
             ):
         """
         Find links in any text file and check if they are archived.
@@ -65,17 +186,42 @@ class MementoBear(LocalBear):
 
         :param dependency_results: Results given by URLHeadBear.
         :param follow_redirects:   Set to true to check all redirect urls.
+        :param max_concurrent_lookups:
+                                   The maximum number of links looked up at
+                                   once.
+        :param archive_status_cache_ttl:
+                                   The number of seconds the answer that a
+                                   link is archived is kept on disk and
+                                   reused by later runs. 0 disables the
+                                   cache.
+        :param negative_archive_status_cache_ttl:
+                                   The number of seconds the answer that a
+                                   link is not archived is kept on disk and
+                                   reused by later runs. 0 disables caching
+                                   it.
         """
-        self._mc = MementoClient()
+        checker = self.get_checker(
+            max_lookups=max_concurrent_lookups,
+            status_cache_ttl=archive_status_cache_ttl,
+            negative_status_cache_ttl=negative_archive_status_cache_ttl)
 
+        # Start all lookups of the file before waiting for any of them
+        lookups = []
         for result in dependency_results.get(URLHeadBear.name, []):
             line_number, link, code, context = result.contents
 
             if not (code and 200 <= code < 400):
                 continue
 
-            status = MementoBear.check_archive(self._mc, link)
-            if not status:
+            redirect_urls = (MementoBear.get_redirect_urls(result.history)
+                             if follow_redirects and 300 <= code < 400
+                             else [])
+            lookups.append((line_number, link, checker.submit(link),
+                            [(url, checker.submit(url))
+                             for url in redirect_urls]))
+
+        for line_number, link, lookup, redirect_lookups in lookups:
+            if not lookup.result():
                 yield Result.from_values(
                     self,
                     ('This link is not archived yet, visit '
@@ -86,19 +232,15 @@ class MementoBear(LocalBear):
                     severity=RESULT_SEVERITY.INFO
                 )
 
-            if follow_redirects and 300 <= code < 400:  # HTTP status 30x
-                redirect_urls = MementoBear.get_redirect_urls(link)
-
-                for url in redirect_urls:
-                    status = MementoBear.check_archive(self._mc, url)
-                    if not status:
-                        yield Result.from_values(
-                            self,
-                            ('This link redirects to %s and not archived yet, '
-                             'visit https://web.archive.org/save/%s to get it '
-                             'archived.'
-                             % (url, url)),
-                            file=filename,
-                            line=line_number,
-                            severity=RESULT_SEVERITY.INFO
-                        )
+            for url, redirect_lookup in redirect_lookups:
+                if not redirect_lookup.result():
+                    yield Result.from_values(
+                        self,
+                        ('This link redirects to %s and not archived yet, '
+                         'visit https://web.archive.org/save/%s to get it '
+                         'archived.'
+                         % (url, url)),
+                        file=filename,
+                        line=line_number,
+                        severity=RESULT_SEVERITY.INFO
+                    )
@@ -0,0 +1,285 @@
+import re
+import zlib
+from collections import OrderedDict, defaultdict
+
+import numpy
+
+# The hash functions are (a * x + b) mod p, cut to 32 bits, with a and b
+# below p and p being the largest Mersenne prime fitting into 64 bits, see
+# https://en.wikipedia.org/wiki/Universal_hashing
+MERSENNE_PRIME = numpy.uint64((1 << 61) - 1)
+MAX_HASH = numpy.uint64((1 << 32) - 1)
+_LOW_29_BITS = numpy.uint64((1 << 29) - 1)
+
+# The number of hashes processed at once when computing a signature, which
+# bounds the memory needed for large files.
+CHUNK_SIZE = 4096
+
+# The number of signature values compared at once when scoring the sets of
+# a bucket, which bounds the memory needed for large buckets.
+BLOCK_SIZE = 1 << 20
+
+_whitespace_regex = re.compile(r'\s+')
+
+
+def get_shingles(lines, shingle_size):
+    """
+    Hashes the shingles of a file, which are all runs of ``shingle_size``
+    consecutive lines. Whitespace is normalized and empty lines are
+    dropped before.
+
+    >>> len(get_shingles(['a\\n', '  b\\n', '\\n', 'a\\n', 'b  \\n'], 2))
+    2
+
+    :param lines:        The lines of the file.
+    :param shingle_size: The number of lines in a shingle. Files with less
+                         lines have a single shingle.
+    :return:             A ``numpy`` array of the unique 32 bit hashes of
+                         the shingles.
+    """
+    normalized = [_whitespace_regex.sub(' ', line).strip() for line in lines]
+    normalized = [line for line in normalized if line]
+    count = max(len(normalized) - shingle_size + 1, 1) if normalized else 0
+    return numpy.unique(numpy.fromiter(
+        (zlib.crc32('\n'.join(normalized[index:index + shingle_size])
+                    .encode('utf-8', 'surrogatepass'))
+         for index in range(count)),
+        dtype=numpy.uint64, count=count))
+
+
+def multiply_mod_prime(a, x):
+    """
+    Computes ``a * x mod MERSENNE_PRIME`` element-wise without the
+    products overflowing 64 bits.
+
+    >>> int(multiply_mod_prime(numpy.uint64(1 << 60), numpy.uint64(4)))
+    2
+
+    :param a: A ``numpy`` array of unsigned 64 bit integers below
+              ``MERSENNE_PRIME``.
+    :param x: A ``numpy`` array of unsigned 64 bit integers below 2^32,
+              broadcastable with ``a``.
+    :return:  The products modulo ``MERSENNE_PRIME`` as ``numpy`` array.
+    """
+    # a = high * 2^32 + low, with high below 2^29 and low below 2^32, so
+    # neither high * x nor low * x overflows. As 2^61 is 1 modulo the
+    # prime, high * x * 2^32 is congruent to the bits of high * x above
+    # the 29th plus the lower 29 bits shifted by 32.
+    high_product = (a >> numpy.uint64(32)) * x
+    high_product = ((high_product >> numpy.uint64(29)) +
+                    ((high_product & _LOW_29_BITS) << numpy.uint64(32)))
+    low_product = (a & MAX_HASH) * x
+    return ((high_product % MERSENNE_PRIME + low_product % MERSENNE_PRIME) %
+            MERSENNE_PRIME)
+
+
+def get_band_layout(threshold, num_permutations, recall=0.95):
+    """
+    Chooses how to split a MinHash signature into bands, so that pairs with
+    a Jaccard similarity of at least ``threshold`` very likely share a band
+    and pairs far below it likely don't.
+
+    >>> get_band_layout(0.8, 128)
+    (32, 4)
+    >>> get_band_layout(0.8, 128, recall=0.9)
+    (16, 8)
+
+    :param threshold:        The Jaccard similarity to detect.
+    :param num_permutations: The length of the signatures.
+    :param recall:           The minimum probability of a pair with a
+                             similarity of exactly ``threshold`` to share a
+                             band. Pairs above the threshold share one even
+                             more likely.
+    :return:                 A tuple of the number of bands and the number
+                             of rows per band.
+    """
+    # Every candidate pair is compared anyway, so use the longest bands,
+    # which give the fewest candidates, that still reach the recall.
+    def get_probability(layout):
+        bands, rows = layout
+        return 1 - (1 - threshold ** rows) ** bands
+
+    layouts = [(num_permutations // rows, rows)
+               for rows in range(1, num_permutations + 1)
+               if num_permutations % rows == 0]
+    return max((layout for layout in layouts
+                if get_probability(layout) >= recall),
+               key=lambda layout: layout[1],
+               default=layouts[0])
+
+
+class MinHashLSH:
+    """
+    Finds pairs of sets with a high Jaccard similarity in sub-quadratic
+    time, using MinHash signatures and locality sensitive hashing.
+
+    The signature of a set holds the minimum of every one of
+    ``num_permutations`` random hash functions over its elements. Two sets
+    have the same minimum for a hash function with a probability equal to
+    their Jaccard similarity. The signatures are split into bands and only
+    sets sharing all values of at least one band are compared.
+
+    At low thresholds the bands are short, so sets sharing some common
+    content, like a license header, land in the same buckets although they
+    are not similar. Buckets with more than ``max_bucket_size`` sets are
+    thus split by the values of the following bands as well, which bounds
+    the number of comparisons. Similar pairs only sharing such a bucket may
+    then be missed, but they most likely share another band too.
+    """
+
+    def __init__(self, threshold, num_permutations=128, seed=1, recall=0.95,
+                 max_bucket_size=300):
+        """
+        Creates a new MinHashLSH.
+
+        :param threshold:        The minimum Jaccard similarity of pairs to
+                                 find, between 0 and 1.
+        :param num_permutations: The number of hash functions to use. More
+                                 hash functions estimate the similarity more
+                                 exactly.
+        :param seed:             The seed to generate the hash functions
+                                 with.
+        :param recall:           The minimum probability of finding a pair
+                                 with a similarity of exactly ``threshold``,
+                                 see ``get_band_layout``. Higher values find
+                                 more pairs, but compare more sets.
+        :param max_bucket_size:  The number of sets in a bucket above which
+                                 it is split further.
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError('The threshold has to be between 0 and 1.')
+
+        self.threshold = threshold
+        self.max_bucket_size = max_bucket_size
+        self.bands, self.rows = get_band_layout(threshold, num_permutations,
+                                                recall)
+        random = numpy.random.RandomState(seed)
+        self._a = random.randint(1, MERSENNE_PRIME, num_permutations,
+                                 dtype=numpy.uint64)
+        self._b = random.randint(0, MERSENNE_PRIME, num_permutations,
+                                 dtype=numpy.uint64)
+        self._signatures = OrderedDict()
+        self._buckets = defaultdict(list)
+
+    def get_signature(self, hashes):
+        """
+        Computes the MinHash signature of a set.
+
+        :param hashes: A ``numpy`` array of the 32 bit hashes of the unique
+                       elements of the set. It must not be empty.
+        :return:       The signature as ``numpy`` array.
+        """
+        signature = numpy.full(len(self._a), MAX_HASH, dtype=numpy.uint64)
+        for start in range(0, len(hashes), CHUNK_SIZE):
+            chunk = hashes[start:start + CHUNK_SIZE]
+            numpy.minimum(
+                signature,
+                ((multiply_mod_prime(self._a, chunk[:, numpy.newaxis]) +
+                  self._b) % MERSENNE_PRIME & MAX_HASH).min(axis=0),
+                out=signature)
+        return signature
+
+    def add(self, key, hashes):
+        """
+        Adds a set.
+
+        :param key:    The key identifying the set.
+        :param hashes: A ``numpy`` array of the 32 bit hashes of the unique
+                       elements of the set. It must not be empty.
+        """
+        signature = self.get_signature(hashes)
+        index = len(self._signatures)
+        self._signatures[key] = signature
+        for band, rows in enumerate(signature.reshape(self.bands,
+                                                      self.rows)):
+            self._buckets[band, rows.tobytes()].append(index)
+
+    def similarity(self, key, other_key):
+        """
+        Estimates the Jaccard similarity of two sets from their signatures.
+
+        :param key:       The key of the first set.
+        :param other_key: The key of the second set.
+        :return:          The estimated similarity between 0 and 1.
+        """
+        return float(numpy.mean(self._signatures[key] ==
+                                self._signatures[other_key]))
+
+    def _split_bucket(self, signatures, band, indices):
+        """
+        Splits an oversized bucket by the values of the bands following
+        ``band``, until every part has at most ``max_bucket_size`` sets or
+        all bands are used.
+
+        :param signatures: A ``numpy`` array of the signatures of all sets.
+        :param band:       The band the bucket belongs to.
+        :param indices:    The indices of the sets in the bucket.
+        :return:           A list of lists of the indices of the sets in
+                           every part with more than one set.
+        """
+        parts = []
+        stack = [(band + 1, indices)]
+        while stack:
+            next_band, indices = stack.pop()
+            if (len(indices) <= self.max_bucket_size or
+                    next_band == band + self.bands):
+                parts.append(indices)
+                continue
+
+            start = next_band % self.bands * self.rows
+            groups = defaultdict(list)
+            for index in indices:
+                groups[signatures[index, start:start + self.rows]
+                       .tobytes()].append(index)
+            stack.extend((next_band + 1, group)
+                         for group in groups.values() if len(group) > 1)
+        return parts
+
+    def _get_bucket_pairs(self, signatures, indices):
+        """
+        Compares all sets of a bucket at once.
+
+        :param signatures: A ``numpy`` array of the signatures of all sets.
+        :param indices:    The ascending indices of the sets in the bucket.
+        :return:           A generator of tuples of ``numpy`` arrays of the
+                           indices of the first and second sets and their
+                           estimated similarities, for the pairs with a
+                           similarity of at least ``threshold``.
+        """
+        indices = numpy.array(indices)
+        bucket = signatures[indices]
+        block_size = max(BLOCK_SIZE // bucket.size, 1)
+        for start in range(0, len(indices) - 1, block_size):
+            similarities = (bucket[start:start + block_size, numpy.newaxis] ==
+                            bucket).mean(axis=2)
+            # Only keep every pair once
+            similarities[numpy.tril_indices(len(similarities), start,
+                                            len(indices))] = -1
+            firsts, seconds = numpy.nonzero(similarities >= self.threshold)
+            yield (indices[firsts + start], indices[seconds],
+                   similarities[firsts, seconds])
+
+    def get_similar_pairs(self):
+        """
+        Finds the pairs of sets whose estimated Jaccard similarity is at
+        least ``threshold``.
+
+        :return: A sorted list of tuples of the keys of both sets, in the
+                 order they were added, and their estimated similarity.
+        """
+        keys = list(self._signatures)
+        if not keys:
+            return []
+        signatures = numpy.array(list(self._signatures.values()))
+
+        pairs = {}
+        for (band, _), indices in self._buckets.items():
+            if len(indices) < 2:
+                continue
+            for part in self._split_bucket(signatures, band, indices):
+                for firsts, seconds, similarities in self._get_bucket_pairs(
+                        signatures, part):
+                    pairs.update(zip(zip(firsts.tolist(), seconds.tolist()),
+                                     similarities.tolist()))
+        return [(keys[first], keys[second], pairs[first, second])
+                for first, second in sorted(pairs)]
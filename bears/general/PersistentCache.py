@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+
+class PersistentCache:
+    """
+    A size bounded key-value store on disk that can be shared between runs
+    (and processes) of a bear.
+
+    Every entry is pickled into its own file inside the cache directory.
+    Reading an entry refreshes its modification time, so once more than
+    ``max_entries`` entries are stored the least recently used ones are
+    evicted first.
+
+    >>> from tempfile import TemporaryDirectory
+    >>> with TemporaryDirectory() as directory:
+    ...     cache = PersistentCache(directory, max_entries=2)
+    ...     cache['answer'] = 42
+    ...     cache.get('answer'), cache.get('question')
+    (42, None)
+    """
+
+    def __init__(self, directory, max_entries):
+        """
+        Creates a new PersistentCache.
+
+        :param directory:   The directory to store the entries in. It is
+                            created if it does not exist.
+        :param max_entries: The maximum number of entries to keep.
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entry_count = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _get_path(self, key):
+        return os.path.join(self.directory,
+                            hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key, fallback=None):
+        """
+        Retrieves the value stored for ``key``.
+
+        :param key:      A string identifying the entry.
+        :param fallback: The value to return if there is no valid entry.
+        :return:         The stored value or ``fallback``.
+        """
+        path = self._get_path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.load(file)
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return fallback
+        except (OSError, pickle.UnpicklingError, EOFError,
+                AttributeError, ImportError):
+            logging.warning('The cache entry {} is corrupted and will be '
+                            'removed.'.format(path))
+            self._remove(path)
+            return fallback
+
+    def __setitem__(self, key, value):
+        path = self._get_path(key)
+        is_new = not os.path.exists(path)
+
+        # Write to a temporary file first so concurrent readers never see a
+        # partially written entry.
+        handle, temp_path = tempfile.mkstemp(dir=self.directory,
+                                             suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                pickle.dump(value, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except OSError as exc:
+            logging.warning('Unable to write cache entry {}: {}'.format(
+                path, exc))
+            self._remove(temp_path)
+            return
+
+        if is_new:
+            self._count_new_entry()
+
+    def __delitem__(self, key):
+        self._remove(self._get_path(key))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        return [os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if not name.endswith('.tmp')]
+
+    @staticmethod
+    def _get_mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
+
+    def _count_new_entry(self):
+        if self._entry_count is None:
+            self._entry_count = len(self._entries())
+        else:
+            self._entry_count += 1
+
+        if self._entry_count > self.max_entries:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until at most
+        ``max_entries`` are left. A tenth of the capacity is freed on top of
+        that, so that the directory is not listed again on every insertion
+        once the cache is full.
+        """
+        entries = self._entries()
+        keep = max(self.max_entries - self.max_entries // 10, 0)
+        if len(entries) > self.max_entries:
+            entries.sort(key=self._get_mtime)
+            for path in entries[:len(entries) - keep]:
+                self._remove(path)
+            entries = entries[len(entries) - keep:]
+
+        self._entry_count = len(entries)
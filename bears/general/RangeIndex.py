@@ -0,0 +1,112 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from itertools import accumulate
+
+
+class RangeIndex(Sequence):
+    """
+    An immutable sequence of SourceRanges, e.g. the strings or comments
+    found by the AnnotationBear, that answers whether a position or a line
+    is inside any of them in logarithmic time.
+
+    The ranges may overlap or be nested. Iterating over the index yields
+    them in the order they were given.
+
+    >>> from coalib.results.SourceRange import SourceRange
+    >>> index = RangeIndex((SourceRange.from_values('f', 1, 3, 1, 8),
+    ...                     SourceRange.from_values('f', 2, 1, 4, 2)))
+    >>> index.contains_position(1, 8), index.contains_position(1, 9)
+    (True, False)
+    >>> index.get_containing_ranges(3, 1) == (index[1],)
+    True
+    >>> index.covers_line(2), index.covers_line(3)
+    (False, True)
+    >>> len(index.ranges_in_line(1))
+    1
+    """
+
+    def __init__(self, ranges=()):
+        """
+        Creates a new RangeIndex.
+
+        :param ranges: An iterable of SourceRanges. All of them need to have
+                       columns.
+        """
+        self._ranges = tuple(ranges)
+        self._sorted_ranges = sorted(
+            self._ranges, key=lambda _range: (_range.start.line,
+                                              _range.start.column))
+        self._starts = [(_range.start.line, _range.start.column)
+                        for _range in self._sorted_ranges]
+        self._start_lines = [start[0] for start in self._starts]
+        # The maximal end of all ranges starting at or before each range,
+        # so nested and overlapping ranges are found by a single lookup.
+        self._max_ends = list(accumulate(
+            ((_range.end.line, _range.end.column)
+             for _range in self._sorted_ranges),
+            max))
+
+    def __getitem__(self, item):
+        return self._ranges[item]
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self._ranges)
+
+    def contains_position(self, line, column):
+        """
+        Checks whether a position is inside any of the ranges. The start and
+        end positions of a range are inside of it.
+
+        :param line:   The line of the position, starting at 1.
+        :param column: The column of the position, starting at 1.
+        :return:       True if any of the ranges contains the position.
+        """
+        index = bisect_right(self._starts, (line, column))
+        return bool(index) and self._max_ends[index - 1] >= (line, column)
+
+    def get_containing_ranges(self, line, column):
+        """
+        Retrieves all ranges a position is inside of.
+
+        :param line:   The line of the position, starting at 1.
+        :param column: The column of the position, starting at 1.
+        :return:       A tuple of the ranges containing the position, ordered
+                       by their start.
+        """
+        index = bisect_right(self._starts, (line, column))
+        ranges = []
+        while index and self._max_ends[index - 1] >= (line, column):
+            index -= 1
+            _range = self._sorted_ranges[index]
+            if (_range.end.line, _range.end.column) >= (line, column):
+                ranges.append(_range)
+
+        return tuple(reversed(ranges))
+
+    def covers_line(self, line):
+        """
+        Checks whether a line is covered by a range that started in a
+        previous line, i.e. whether the line is a continuation of it.
+
+        :param line: The line number, starting at 1.
+        :return:     True if any of the ranges starts before and ends in or
+                     after the line.
+        """
+        index = bisect_left(self._start_lines, line)
+        return bool(index) and self._max_ends[index - 1][0] >= line
+
+    def ranges_in_line(self, line):
+        """
+        Retrieves all ranges that start and end in the given line.
+
+        :param line: The line number, starting at 1.
+        :return:     A tuple of the ranges, ordered by their start.
+        """
+        return tuple(
+            _range for _range in self._sorted_ranges[
+                bisect_left(self._start_lines, line):
+                bisect_right(self._start_lines, line)]
+            if _range.end.line == line)
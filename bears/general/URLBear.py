@@ -1,4 +1,6 @@
 import re
+from bisect import bisect_right
+from itertools import accumulate, chain
 
 from aenum import Flag
 
@@ -14,6 +16,41 @@ from coala_utils.decorators import (enforce_signature, generate_ordering,
                                     generate_repr)
 
 
+URL_REGEX = re.compile(
+    r"""
+    ((git\+|bzr\+|svn\+|hg\+|)  # For VCS URLs
+    https?://                   # http:// or https:// as only these
+                                # are supported by the ``requests``
+                                # library
+    [^.:%\s_/?#[\]@\\]+         # Initial part of domain
+    \.                          # A required dot `.`
+    (
+        ((?:%[A-Fa-f0-9][A-Fa-f0-9])*[^\s()%\'"`<>|\\\[\]]+)
+                                # Path name
+                                # This part allows precentage
+                                # encoding like %3F
+                                # and does not allow
+                                # any parenthesis: balanced or
+                                # unbalanced.
+    |                           # OR
+        \((?:%[A-Fa-f0-9][A-Fa-f0-9])*[^\s()%\'"`<>|\\\[\]]*\)
+                                # Path name contained within ()
+                                # This part allows path names that
+                                # are explicitly enclosed within one
+                                # set of parenthesis.
+                                # An example can be:
+                                # http://wik.org/Hello_(Adele_song)/200
+    )
+    *)
+                                # Thus, the whole part above
+                                # prevents matching of
+                                # Unbalanced parenthesis
+    (?<!\.)(?<!,)               # Exclude trailing `.` or `,` from URL
+    """, re.VERBOSE)
+
+XMLNS_REGEX = re.compile(r'xmlns:?\w*="(.*)"')
+
+
 class LINK_CONTEXT(Flag):
     no_context = 0
     xml_namespace = 1
@@ -71,54 +108,36 @@ class URLBear(LocalBear):
     @staticmethod
     def extract_links_from_file(file, link_ignore_regex, link_ignore_list):
         link_ignore_regex = re.compile(link_ignore_regex)
-        regex = re.compile(
-            r"""
-            ((git\+|bzr\+|svn\+|hg\+|)  # For VCS URLs
-            https?://                   # http:// or https:// as only these
-                                        # are supported by the ``requests``
-                                        # library
-            [^.:%\s_/?#[\]@\\]+         # Initial part of domain
-            \.                          # A required dot `.`
-            (
-                ((?:%[A-Fa-f0-9][A-Fa-f0-9])*[^\s()%\'"`<>|\\\[\]]+)
-                                        # Path name
-                                        # This part allows precentage
-                                        # encoding like %3F
-                                        # and does not allow
-                                        # any parenthesis: balanced or
-                                        # unbalanced.
-            |                           # OR
-                \((?:%[A-Fa-f0-9][A-Fa-f0-9])*[^\s()%\'"`<>|\\\[\]]*\)
-                                        # Path name contained within ()
-                                        # This part allows path names that
-                                        # are explicitly enclosed within one
-                                        # set of parenthesis.
-                                        # An example can be:
-                                        # http://wik.org/Hello_(Adele_song)/200
-            )
-            *)
-                                        # Thus, the whole part above
-                                        # prevents matching of
-                                        # Unbalanced parenthesis
-            (?<!\.)(?<!,)               # Exclude trailing `.` or `,` from URL
-            """, re.VERBOSE)
+
+        # Only lines containing ``://`` can contain a link. Links never
+        # contain whitespace, so the remaining lines can be searched at
+        # once by joining them with newlines.
+        line_numbers = [line_number for line_number, line in enumerate(file)
+                        if '://' in line]
+        lines = [file[line_number] for line_number in line_numbers]
+        line_offsets = list(accumulate(
+            chain((0,), (len(line) + 1 for line in lines))))
+
         file_context = {}
-        for line_number, line in enumerate(file):
-            xmlns_regex = re.compile(r'xmlns:?\w*="(.*)"')
-            for match in re.findall(regex, line):
-                link = match[0]
-                link_context = file_context.get(link)
-                if not link_context:
-                    link_context = LINK_CONTEXT.no_context
-                    xmlns_match = xmlns_regex.search(line)
-                    if xmlns_match and link in xmlns_match.groups():
-                        link_context |= LINK_CONTEXT.xml_namespace
-                    if link.startswith(('hg+', 'bzr+', 'git+', 'svn+')):
-                        link_context |= LINK_CONTEXT.pip_vcs_url
-                    file_context[link] = link_context
-                if not (link_ignore_regex.search(link) or
-                        fnmatch(link, link_ignore_list)):
-                    yield link, line_number, link_context
+        is_ignored = {}
+        for match in URL_REGEX.finditer('\n'.join(lines)):
+            index = bisect_right(line_offsets, match.start()) - 1
+            line_number = line_numbers[index]
+            link = match.group(1)
+            link_context = file_context.get(link)
+            if not link_context:
+                link_context = LINK_CONTEXT.no_context
+                xmlns_match = XMLNS_REGEX.search(lines[index])
+                if xmlns_match and link in xmlns_match.groups():
+                    link_context |= LINK_CONTEXT.xml_namespace
+                if link.startswith(('hg+', 'bzr+', 'git+', 'svn+')):
+                    link_context |= LINK_CONTEXT.pip_vcs_url
+                file_context[link] = link_context
+            if link not in is_ignored:
+                is_ignored[link] = bool(link_ignore_regex.search(link) or
+                                        fnmatch(link, link_ignore_list))
+            if not is_ignored[link]:
+                yield link, line_number, link_context
 
     def analyze_links_in_file(self, file, link_ignore_regex,
                               link_ignore_list):
@@ -1,6 +1,8 @@
 import requests
 from urllib.parse import urlparse
 
+from bears.general.HeadRequestEngine import HeadRequestEngine, get_engine
+from bears.general.HostScheduler import get_host_setting, parse_host_settings
 from bears.general.URLBear import URLBear, LINK_CONTEXT
 
 from coalib.bears.LocalBear import LocalBear
@@ -41,7 +43,29 @@ class URLHeadResult(HiddenResult):
     def __init__(self, origin, affected_code,
                  link: str,
                  head_response: (requests.models.Response, Exception),
-                 link_context: LINK_CONTEXT):
+                 link_context: LINK_CONTEXT,
+                 history: (list, tuple) = (),
+                 final_url: (str, None) = None,
+                 final_response=None):
+        """
+        Creates a new URLHeadResult.
+
+        :param link:          The link the result is about.
+        :param head_response: The response to a HEAD request to the link,
+                              which does not follow redirects, or the
+                              exception raised by it.
+        :param link_context:  The context of the link.
+        :param history:       The responses to the redirects followed from
+                              the link, in order, starting with
+                              ``head_response`` if it is a redirect.
+        :param final_url:     The URL the redirects end at. Defaults to the
+                              link itself.
+        :param final_response: The response to ``final_url`` or the
+                              exception raised by it. It is still a
+                              redirect if the redirects were not followed
+                              to their end, because of a loop or too many
+                              of them. Defaults to ``head_response``.
+        """
 
         http_status_code = (head_response.status_code if
                             isinstance(head_response,
@@ -57,6 +81,10 @@ class URLHeadResult(HiddenResult):
         self.http_status_code = http_status_code
         self.link_context = link_context
         self.head_response = head_response
+        self.history = list(history)
+        self.final_url = link if final_url is None else final_url
+        self.final_response = (head_response if final_response is None
+                               else final_response)
 
 
 class URLHeadBear(LocalBear):
@@ -91,6 +119,15 @@ class URLHeadBear(LocalBear):
     @deprecate_settings(network_timeout=('timeout', lambda t: {'*': t}))
     def run(self, filename, file, dependency_results=dict(),
             network_timeout: typed_dict(str, int, DEFAULT_TIMEOUT) = dict(),
+            max_concurrent_requests: int = (
+                HeadRequestEngine.DEFAULT_MAX_REQUESTS),
+            max_concurrent_requests_per_host: int = (
+                HeadRequestEngine.DEFAULT_MAX_REQUESTS_PER_HOST),
+            status_cache_ttl: int = 0,
+            negative_status_cache_ttl: int = 0,
+            max_requests_per_second: typed_dict(str, float, 0) = dict(),
+            max_connection_failures: int = 5,
+            max_redirects: int = HeadRequestEngine.DEFAULT_MAX_REDIRECTS,
             ):
         """
         Find links in any text file and tells its head response and
@@ -110,22 +147,62 @@ class URLHeadBear(LocalBear):
                                 '*'. The timeout of all the websites not
                                 in the dict will be the value of the key
                                 '*'.
+        :param max_concurrent_requests:
+                                The maximum number of HEAD requests sent
+                                at once.
+        :param max_concurrent_requests_per_host:
+                                The maximum number of HEAD requests sent
+                                at once to the same host.
+        :param status_cache_ttl:
+                                The number of seconds the status codes of
+                                links below 400 are kept on disk and reused
+                                by later runs. 0 disables the cache.
+        :param negative_status_cache_ttl:
+                                The number of seconds links which can't be
+                                connected to or respond with a status code
+                                of 400 or above are kept on disk and reused
+                                by later runs. 0 disables caching them.
+        :param max_requests_per_second:
+                                A dict mapping URLs and the maximum number
+                                of HEAD requests per second sent to the
+                                host of that URL. It can contain a wildcard
+                                entry with key '*' for all other hosts.
+                                Hosts without a positive limit are not
+                                limited.
+        :param max_connection_failures:
+                                The number of failed connections to a host
+                                in a row after which the remaining links to
+                                that host are reported as broken without
+                                requesting them. 0 disables this.
+        :param max_redirects:   The maximum number of redirects followed
+                                from a link to find the URL it ends at,
+                                which is reused by all bears depending on
+                                this one. 0 disables following redirects.
         :param link_ignore_regex: A regex for urls to ignore.
         :param link_ignore_list: Comma separated url globs to ignore
         """
-        network_timeout = {urlparse(url).netloc
-                           if not url == '*' else '*': timeout
-                           for url, timeout in network_timeout.items()}
-
-        for result in dependency_results.get(URLBear.name, []):
-            host = urlparse(result.link).netloc
-            head_resp = self.get_head_response(
-                result.link,
-                network_timeout.get(host)
-                if host in network_timeout
-                else network_timeout.get('*')
-                if '*' in network_timeout
-                else URLHeadBear.DEFAULT_TIMEOUT)
-
+        network_timeout = parse_host_settings(network_timeout)
+
+        def get_timeout(link):
+            return get_host_setting(network_timeout, urlparse(link).netloc,
+                                    URLHeadBear.DEFAULT_TIMEOUT)
+
+        results = list(dependency_results.get(URLBear.name, []))
+        engine = get_engine(
+            self,
+            max_requests=max_concurrent_requests,
+            max_requests_per_host=max_concurrent_requests_per_host,
+            status_cache_ttl=status_cache_ttl,
+            negative_status_cache_ttl=negative_status_cache_ttl,
+            requests_per_second=parse_host_settings(max_requests_per_second),
+            max_connection_failures=max_connection_failures)
+        chains = engine.resolve_all(
+            ((result.link, get_timeout(result.link)) for result in results),
+            max_redirects)
+
+        for result, (responses, final_url) in zip(results, chains):
             yield URLHeadResult(self, result.affected_code, result.link,
-                                head_resp, result.link_context)
+                                responses[0], result.link_context,
+                                history=responses[:-1],
+                                final_url=final_url,
+                                final_response=responses[-1])
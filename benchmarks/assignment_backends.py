@@ -0,0 +1,61 @@
+"""
+Compares the speed of the assignment backends ClangFunctionDifferenceBear
+can match the variables of functions with, see ``get_assignment`` in
+``bears/c_languages/codeclone_detection/CloneDetectionRoutines.py``.
+
+Run it from the root of the repository with::
+
+    python3 -m benchmarks.assignment_backends
+"""
+
+import timeit
+
+import numpy
+
+from bears.c_languages.codeclone_detection.CloneDetectionRoutines import (
+    get_assignment, linear_sum_assignment, munkres_assignment,
+    scipy_assignment)
+
+SIZES = (2, 3, 5, 10, 20, 50)
+MATRICES_PER_SIZE = 50
+REPETITIONS = 3
+
+
+def get_time(backend, matrices):
+    """
+    Measures the average time a backend needs to solve an assignment.
+
+    :param backend:  A function taking a cost matrix and returning the
+                     assigned fields.
+    :param matrices: The cost matrices to solve.
+    :return:         The time per matrix in microseconds.
+    """
+    seconds = timeit.timeit(lambda: [backend(matrix) for matrix in matrices],
+                            number=REPETITIONS)
+    return seconds / REPETITIONS / len(matrices) * 1e6
+
+
+def main():
+    backends = [('munkres', munkres_assignment),
+                ('get_assignment', get_assignment)]
+    if linear_sum_assignment is None:
+        print('SciPy is not installed, only Munkres is measured.')
+    else:
+        backends += [('scipy', scipy_assignment),
+                     ('get_assignment with scipy',
+                      lambda matrix: get_assignment(matrix,
+                                                    scipy_assignment))]
+
+    random = numpy.random.RandomState(0)
+    print('size  ' + '  '.join('{:>26}'.format(name)
+                               for name, _ in backends))
+    for size in SIZES:
+        matrices = [random.rand(size, size)
+                    for _ in range(MATRICES_PER_SIZE)]
+        print('{:4}  '.format(size) + '  '.join(
+            '{:>23.1f} us'.format(get_time(backend, matrices))
+            for _, backend in backends))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import random
+import unittest
+from itertools import combinations
+
+from bears.c_languages.codeclone_detection.ClangFunctionDifferenceBear import (
+    get_differences)
+from bears.c_languages.codeclone_detection.CloneDetectionRoutines import (
+    linear_sum_assignment, scipy_assignment)
+from bears.c_languages.codeclone_detection.CountVector import CountVector
+
+
+class ClangFunctionDifferenceBearTest(unittest.TestCase):
+
+    def setUp(self):
+        rand = random.Random(1)
+        count_matrices = {}
+        for function in range(40):
+            count_matrix = {}
+            for variable in range(rand.randint(1, 5)):
+                count_vector = CountVector(str(variable),
+                                           conditions=[None] * 4)
+                count_vector.count_vector = [rand.randint(0, 5)
+                                             for _ in range(4)]
+                count_matrix[str(variable)] = count_vector
+            count_matrices[('file.c', function, 'f{}()'.format(function))] = (
+                count_matrix)
+        self.count_matrices = count_matrices
+        self.function_pairs = list(combinations(count_matrices, 2))
+        self.options = {'average_calculation': True,
+                        'poly_postprocessing': False,
+                        'exp_postprocessing': True}
+
+    def test_get_differences(self):
+        count_matrices = self.count_matrices
+        function_pairs = self.function_pairs
+        options = self.options
+
+        progress = []
+        differences = get_differences(function_pairs, count_matrices,
+                                      progress.append, **options)
+        self.assertEqual([difference[:2] for difference in differences],
+                         function_pairs)
+        self.assertEqual(progress[0], 0)
+
+        progress = []
+        self.assertEqual(get_differences(function_pairs, count_matrices,
+                                         progress.append, max_workers=2,
+                                         **options),
+                         differences)
+        self.assertEqual(progress, [0, 500 / 780 * 100])
+
+    @unittest.skipIf(linear_sum_assignment is None, 'SciPy is not installed')
+    def test_scipy_assignment(self):
+        differences = get_differences(self.function_pairs,
+                                      self.count_matrices,
+                                      lambda progress: None,
+                                      **self.options)
+        for max_workers in (1, 2):
+            scipy_differences = get_differences(
+                self.function_pairs,
+                self.count_matrices,
+                lambda progress: None,
+                max_workers,
+                assignment_backend=scipy_assignment,
+                **self.options)
+            self.assertEqual([difference[:2]
+                              for difference in scipy_differences],
+                             self.function_pairs)
+            for difference, scipy_difference in zip(differences,
+                                                    scipy_differences):
+                self.assertAlmostEqual(difference[2], scipy_difference[2],
+                                       delta=0.1)
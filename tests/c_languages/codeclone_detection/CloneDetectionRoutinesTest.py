@@ -1,7 +1,14 @@
 import unittest
+from itertools import product
+
+import numpy
 
 from bears.c_languages.codeclone_detection.CloneDetectionRoutines import (
-    relative_difference)
+    compare_functions, get_assignment, get_count_array,
+    get_difference_lower_bound, get_distance_matrices, get_function_features,
+    linear_sum_assignment, munkres_assignment, pad_count_vectors,
+    relative_difference, scipy_assignment)
+from bears.c_languages.codeclone_detection.CountVector import CountVector
 
 
 class CloneDetectionRoutinesTest(unittest.TestCase):
@@ -18,3 +25,99 @@ class CloneDetectionRoutinesTest(unittest.TestCase):
         self.assertEqual(relative_difference(0, 0), 1)
         self.assertEqual(relative_difference(1, 0), 1)
         self.assertEqual(relative_difference(0.5, 2), 0.25)
+
+    def test_difference_lower_bound(self):
+        def get_count_matrix(*count_vectors):
+            count_matrix = {}
+            for index, counts in enumerate(count_vectors):
+                count_vector = CountVector(str(index),
+                                           conditions=[None] * len(counts))
+                count_vector.count_vector = counts
+                count_matrix[str(index)] = count_vector
+            return count_matrix
+
+        count_matrices = [get_count_matrix([1, 2, 0], [3, 0, 1]),
+                          get_count_matrix([3, 0, 1], [1, 2, 0]),
+                          get_count_matrix([1, 2, 1], [3, 1, 1], [0, 0, 1]),
+                          get_count_matrix([9, 0, 0], [0, 9, 0]),
+                          get_count_matrix([0, 0, 0], [0, 0, 0])]
+        for cm1, cm2 in product(count_matrices, repeat=2):
+            for options in product((False, True), repeat=3):
+                self.assertLessEqual(
+                    get_difference_lower_bound(
+                        get_function_features(get_count_array(cm1)),
+                        get_function_features(get_count_array(cm2)),
+                        *options),
+                    compare_functions(cm1, cm2, *options))
+
+        self.assertEqual(
+            get_difference_lower_bound(
+                get_function_features(get_count_array(count_matrices[0])),
+                get_function_features(get_count_array(count_matrices[1]))),
+            0)
+        self.assertGreater(
+            get_difference_lower_bound(
+                get_function_features(get_count_array(count_matrices[0])),
+                get_function_features(get_count_array(count_matrices[3]))),
+            0.185)
+
+    def test_pad_count_vectors(self):
+        cm1 = numpy.array([[1, 2], [3, 4]])
+        cm2 = numpy.array([[5, 6]])
+        for first, second in ((cm1, cm2), (cm2, cm1)):
+            padded_1, padded_2 = pad_count_vectors(first, second)
+            numpy.testing.assert_array_equal(padded_1, cm1)
+            numpy.testing.assert_array_equal(padded_2, [[5, 6], [0, 0]])
+
+        self.assertEqual(pad_count_vectors(cm1, cm1), (cm1, cm1))
+
+    def test_distance_matrices(self):
+        count_vectors = []
+        for counts in ([0, 1.4, 2], [1, 0, 0.6], [3, 3, 0]):
+            count_vector = CountVector('', conditions=[None] * 3)
+            count_vector.count_vector = counts
+            count_vectors.append(count_vector)
+
+        count_array = get_count_array(
+            {index: count_vector
+             for index, count_vector in enumerate(count_vectors)})
+        differences, maxabs = get_distance_matrices(count_array[:2],
+                                                    count_array)
+        # The values are exactly the same as calculated by CountVector
+        self.assertEqual(differences.tolist(),
+                         [[cv1.difference(cv2) for cv2 in count_vectors]
+                          for cv1 in count_vectors[:2]])
+        self.assertEqual(maxabs.tolist(),
+                         [[cv1.maxabs(cv2) for cv2 in count_vectors]
+                          for cv1 in count_vectors[:2]])
+
+    def test_get_assignment(self):
+        self.assertEqual(get_assignment(numpy.array([[0.3]])), [(0, 0)])
+        # Small matrices give the same assignment as Munkres, even if there
+        # are several optimal ones.
+        for costs in product([0, 0.25, 0.5, 1], repeat=4):
+            cost_matrix = numpy.array(costs).reshape(2, 2)
+            self.assertEqual(get_assignment(cost_matrix),
+                             munkres_assignment(cost_matrix))
+
+        cost_matrix = numpy.array([[0.4, 0.1, 0.9],
+                                   [0.2, 0.8, 0.7],
+                                   [0.5, 0.3, 0.6]])
+        self.assertEqual(get_assignment(cost_matrix, munkres_assignment),
+                         [(0, 1), (1, 0), (2, 2)])
+        self.assertEqual(get_assignment(cost_matrix, lambda matrix: []), [])
+
+        # Munkres is used by default, also if several assignments are optimal
+        cost_matrix = numpy.array([[0, 0, 0],
+                                   [0, 0, 1],
+                                   [0, 0, 1]])
+        self.assertEqual(get_assignment(cost_matrix),
+                         [(0, 2), (1, 0), (2, 1)])
+
+    @unittest.skipIf(linear_sum_assignment is None, 'SciPy is not installed')
+    def test_scipy_assignment(self):
+        random = numpy.random.RandomState(1)
+        for size in range(1, 12):
+            cost_matrix = random.rand(size, size)
+            self.assertEqual(scipy_assignment(cost_matrix),
+                             munkres_assignment(cost_matrix))
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from bears.c_languages.codeclone_detection.CloneDetectionRoutines import (
+    get_count_matrices)
+from bears.c_languages.codeclone_detection.CountMatrixCache import (
+    CountMatrixCache, get_count_dict, get_file_entry)
+from bears.c_languages.codeclone_detection.CountVector import CountVector
+from bears.general.PersistentCache import PersistentCache
+
+
+def counted(stack):
+    return True
+
+
+def get_counts(count_matrices):
+    return {function: {variable: (count_vector.count_vector,
+                                  count_vector.unweighted)
+                       for variable, count_vector in count_matrix.items()}
+            for function, count_matrix in count_matrices.items()}
+
+
+class LineCountVectorCreator:
+    """
+    Creates count vectors without clang. Every line ``function a b`` of a
+    file is a function using the variables ``a`` and ``b`` twelve times,
+    every line ``#include file`` includes a file.
+    """
+
+    def __init__(self, weightings=None):
+        self.conditions = [counted]
+        self.weightings = weightings
+        self.parsed = []
+
+    def get_vectors_for_file(self, filename, include_paths, included_files):
+        self.parsed.append(filename)
+        count_dict = {}
+        with open(filename) as file:
+            for line_number, line in enumerate(file, 1):
+                function, *variables = line.split()
+                if function == '#include':
+                    included_files.add(os.path.join(
+                        os.path.dirname(filename), variables[0]))
+                    continue
+
+                count_matrix = {}
+                for variable in variables:
+                    count_vector = CountVector(variable,
+                                               CountVector.Category.reference,
+                                               self.conditions,
+                                               self.weightings)
+                    for _ in range(12):
+                        count_vector.count_reference([])
+                    count_matrix[variable] = count_vector
+                count_dict[(line_number, function)] = count_matrix
+        return count_dict
+
+
+class CountMatrixCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = PersistentCache(os.path.join(self.directory, 'cache'),
+                                     100)
+        self.filenames = [self.write_file('a.c', 'f a b\n#include a.h\n'),
+                          self.write_file('b.c', 'g x y z\nh x\n')]
+        self.write_file('a.h', 'int i;')
+
+    def write_file(self, name, contents):
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'w') as file:
+            file.write(contents)
+        return filename
+
+    def get_count_matrices(self, creator, **kwargs):
+        return get_count_matrices(creator,
+                                  self.filenames,
+                                  lambda progress: None,
+                                  os.path.join(self.directory, 'a.c'),
+                                  [],
+                                  **kwargs)
+
+    def test_file_entry(self):
+        creator = LineCountVectorCreator([1.5])
+        entry = get_file_entry(creator, self.filenames[0], [])
+        self.assertEqual(entry, (
+            ((1, 'f', (('a', 0, (18.0,), (12,)), ('b', 0, (18.0,), (12,)))),),
+            {os.path.join(self.directory, 'a.h'):
+             hashlib.sha1(b'int i;').hexdigest()}))
+
+        count_dict = get_count_dict(entry, creator)
+        self.assertEqual(list(count_dict), [(1, 'f')])
+        count_vector = count_dict[(1, 'f')]['b']
+        self.assertEqual(count_vector.name, 'b')
+        self.assertEqual(count_vector.conditions, [counted])
+        self.assertEqual(count_vector.weightings, [1.5])
+        self.assertEqual(count_vector.count_vector, [18.0])
+        self.assertEqual(count_vector.unweighted, [12])
+
+        cache = CountMatrixCache(self.cache, creator, [])
+        self.assertIsNone(cache.get(self.filenames[0]))
+        cache.add(self.filenames[0], entry)
+        self.assertEqual(cache.get(self.filenames[0]), entry)
+        # The include paths are part of the key
+        cache = CountMatrixCache(self.cache, creator, ['include'])
+        self.assertIsNone(cache.get(self.filenames[0]))
+
+    def test_get_count_matrices(self):
+        creator = LineCountVectorCreator()
+        count_matrices = self.get_count_matrices(creator, cache=self.cache)
+        # Functions with a single variable are excluded
+        self.assertEqual(list(count_matrices),
+                         [(self.filenames[0], 1, 'f'),
+                          (self.filenames[1], 1, 'g')])
+        self.assertEqual(creator.parsed, self.filenames)
+
+        creator = LineCountVectorCreator()
+        self.assertEqual(get_counts(self.get_count_matrices(
+                             creator, cache=self.cache)),
+                         get_counts(count_matrices))
+        self.assertEqual(creator.parsed, [])
+
+        # Files are parsed again if they or the files they include changed
+        self.write_file('a.h', 'int j;')
+        self.write_file('b.c', 'g x y\n')
+        self.get_count_matrices(creator, cache=self.cache)
+        self.assertEqual(creator.parsed, self.filenames)
+
+        # The cache is not used with other weightings
+        creator = LineCountVectorCreator([2])
+        self.get_count_matrices(creator, cache=self.cache)
+        self.assertEqual(creator.parsed, self.filenames)
+
+    def test_get_count_matrices_in_processes(self):
+        creator = LineCountVectorCreator()
+        count_matrices = self.get_count_matrices(creator)
+        self.assertEqual(creator.parsed, self.filenames)
+
+        self.assertEqual(get_counts(self.get_count_matrices(
+                             creator, cache=self.cache, max_workers=2)),
+                         get_counts(count_matrices))
+        creator = LineCountVectorCreator()
+        self.get_count_matrices(creator, cache=self.cache)
+        self.assertEqual(creator.parsed, [])
@@ -1,9 +1,14 @@
+import os
 from queue import Queue
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
 import unittest
 
-from bears.general.AnnotationBear import AnnotationBear
+from bears.general.AnnotationBear import (
+    AnnotationBear, NoCloseError, calc_line_cols, get_line_offsets,
+    get_source_ranges)
 from coalib.results.SourceRange import SourceRange
-from coalib.results.AbsolutePosition import AbsolutePosition
+from coalib.results.AbsolutePosition import AbsolutePosition, calc_line_col
 from coalib.results.HiddenResult import HiddenResult
 from coalib.settings.Section import Section
 from coalib.settings.Setting import Setting
@@ -150,3 +155,139 @@ class AnnotationBearTest(unittest.TestCase):
                 # That lead to a Result being yielded because of unclosed
                 # quotes, this asserts that no such thing happened.
                 self.assertEqual(type(result), HiddenResult)
+
+    def test_multiple_annotations_in_one_line(self):
+        text = ['a = "x\\"y"; /* c */ b = "z"; // "not a string"\n',
+                'c = d;\n']
+        line = text[0]
+        string1 = SourceRange.from_absolute_position(
+            'F',
+            AbsolutePosition(text, line.find('"')),
+            AbsolutePosition(text, line.find('";')))
+        string2 = SourceRange.from_absolute_position(
+            'F',
+            AbsolutePosition(text, line.find('"z"')),
+            AbsolutePosition(text, line.find('"z"') + 2))
+        multiline_comment = SourceRange.from_absolute_position(
+            'F',
+            AbsolutePosition(text, line.find('/*')),
+            AbsolutePosition(text, line.find('*/') + 1))
+        comment = SourceRange.from_absolute_position(
+            'F',
+            AbsolutePosition(text, line.find('//')),
+            AbsolutePosition(text, len(line) - 1))
+        with execute_bear(self.c_uut, 'F', text) as result:
+            self.assertEqual(result[0].contents['strings'],
+                             (string1, string2))
+            self.assertEqual(result[0].contents['comments'],
+                             (multiline_comment, comment))
+
+    def test_line_offsets(self):
+        text = ['first line\n', '\n', '', 'fourth line\n', 'no newline']
+        line_offsets = get_line_offsets(text)
+        self.assertEqual(line_offsets, (0, 11, 12, 12, 24, 34))
+
+        positions = range(len(''.join(text)))
+        self.assertEqual(calc_line_cols(line_offsets, positions),
+                         [calc_line_col(text, position)
+                          for position in positions])
+        self.assertRaises(ValueError, calc_line_cols, line_offsets, [34])
+        self.assertRaises(ValueError, calc_line_cols, line_offsets, [-1])
+
+        ranges = ((11, 11), (0, 5), (13, 30))
+        self.assertEqual(
+            get_source_ranges('F', line_offsets, ranges),
+            tuple(SourceRange.from_absolute_position(
+                      'F',
+                      AbsolutePosition(text, start),
+                      AbsolutePosition(text, end))
+                  for start, end in ranges))
+
+    def test_annotation_cache(self):
+        self.section1.append(Setting('annotation_cache_size', '10'))
+        text = ['"a string" # and a comment\n', "'''multi\n", "line'''\n"]
+        with TemporaryDirectory() as data_dir, \
+                patch.object(AnnotationBear, 'data_dir', data_dir):
+            uut = AnnotationBear(self.section1, Queue())
+            with execute_bear(uut, 'F', text) as result:
+                expected = result[0].contents
+
+            with patch.object(AnnotationBear,
+                              'find_annotation_ranges') as scan:
+                with execute_bear(uut, 'F', text) as result:
+                    self.assertEqual(result[0].contents, expected)
+                with execute_bear(uut, 'G', text) as result:
+                    self.assertEqual(
+                        result[0].contents['strings'][0].file,
+                        os.path.abspath('G'))
+                self.assertFalse(scan.called)
+
+            text[0] = '"a string"\n'
+            with execute_bear(uut, 'F', text) as result:
+                self.assertEqual(result[0].contents['comments'], ())
+
+    def test_update_annotation_ranges(self):
+        delimiters = ({'"': '"'}, {}, {'//': '\n'}, {'/*': '*/'})
+        old_file = ['int a = 1; // one\n',
+                    '/* a\n',
+                    '   comment */\n',
+                    'char *b = "two";\n',
+                    'int c = 3; /* three */\n']
+        old_ranges = self.c_uut.find_annotation_ranges(old_file, 'F',
+                                                       *delimiters)
+        edits = [
+            # Changing a line inside a comment, without changing the lines
+            ['int a = 1; // one\n',
+             '/* a changed\n',
+             '   comment */\n',
+             'char *b = "two";\n',
+             'int c = 3; /* three */\n'],
+            # Inserting lines shifts the rest of the ranges
+            ['int a = 1; // one\n',
+             'char *x = "new";\n',
+             '\n',
+             '/* a\n',
+             '   comment */\n',
+             'char *b = "two";\n',
+             'int c = 3; /* three */\n'],
+            # Opening a comment changes everything after it
+            ['int a = 1; // one\n',
+             '/* a\n',
+             '   comment */ /*\n',
+             'char *b = "two";\n',
+             'int c = 3; /* three */\n'],
+            # Removing lines
+            ['int a = 1; // one\n',
+             'int c = 3; /* three */\n']]
+
+        for file in edits:
+            self.assertEqual(
+                self.c_uut.update_annotation_ranges(old_file, old_ranges,
+                                                    file, 'F', *delimiters),
+                self.c_uut.find_annotation_ranges(file, 'F', *delimiters))
+
+        file = old_file[:3] + ['char *b = "two;\n'] + old_file[4:]
+        with self.assertRaisesRegex(NoCloseError, '" has no closure'):
+            self.c_uut.update_annotation_ranges(old_file, old_ranges,
+                                                file, 'F', *delimiters)
+
+    def test_annotation_cache_incremental(self):
+        self.section2.append(Setting('annotation_cache_size', '10'))
+        text = ['int a; // one\n', 'int b; /* two */\n', 'char *c = "";\n']
+        with TemporaryDirectory() as data_dir, \
+                patch.object(AnnotationBear, 'data_dir', data_dir):
+            uut = AnnotationBear(self.section2, Queue())
+            with execute_bear(uut, 'F', text):
+                pass
+
+            text.insert(1, 'int d; // new\n')
+            expected = self.c_uut.find_annotation_ranges(
+                text, 'F',
+                {'"': '"'}, {}, {'//': '\n'}, {'/*': '*/'})
+            with patch.object(AnnotationBear, 'find_annotation_ranges',
+                              side_effect=AssertionError):
+                with execute_bear(uut, 'F', text) as result:
+                    self.assertEqual(result[0].contents['strings'],
+                                     expected[0])
+                    self.assertEqual(result[0].contents['comments'],
+                                     expected[1])
@@ -3,9 +3,12 @@ import unittest
 
 from queue import Queue
 import logging
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
 
 from bears.general.CPDBear import CPDBear
+from bears.general.CopyPasteDetector import tokenize
 from coalib.bearlib.languages import Language
 from coalib.testing.BearTestHelper import generate_skip_decorator
 from coalib.settings.Section import Section
@@ -25,6 +28,12 @@ class CPDBearTest(unittest.TestCase):
         self.section.language = Language['Java']
         self.queue = Queue()
 
+        data_dir = TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        data_dir_patch = patch.object(CPDBear, 'data_dir', data_dir.name)
+        data_dir_patch.start()
+        self.addCleanup(data_dir_patch.stop)
+
     def test_good_file(self):
         good_file = os.path.join(self.base_test_path, 'good_code.java')
 
@@ -67,3 +76,83 @@ class CPDBearTest(unittest.TestCase):
             self.uut.message_queue.queue[0].log_level, logging.ERROR)
         self.assertIn('Hypertext Markup Language',
                       self.uut.message_queue.queue[0].message)
+
+    def test_affected_code(self):
+        bad_file = os.path.join(self.base_test_path, 'bad_code.java')
+
+        with open(bad_file) as file:
+            bad_filelines = file.readlines()
+
+        copy_file = os.path.join(self.base_test_path, 'copy', 'bad_code.java')
+        self.uut = CPDBear({bad_file: bad_filelines,
+                            copy_file: bad_filelines},
+                           self.section,
+                           self.queue)
+
+        result, = self.uut.run_bear_from_section([], {})
+        self.assertEqual([(code.file, code.start.line, code.end.line)
+                          for code in result.affected_code],
+                         [(bad_file, 4, 11), (bad_file, 11, 18)])
+
+        self.section.append(Setting('skip_duplicate_files', 'False'))
+        result, *_ = self.uut.run_bear_from_section([], {})
+        self.assertEqual([(code.file, code.start.line, code.end.line)
+                          for code in result.affected_code],
+                         [(bad_file, 1, 20), (copy_file, 1, 20)])
+
+    def test_ignore_identifiers(self):
+        file_dict = {'a.java': ['int f() { int a = 0; a += 1; a *= 2; '
+                                'return a; }\n'],
+                     'b.java': ['int g() { int b = 0; b += 1; b *= 2; '
+                                'return b; }\n']}
+        self.uut = CPDBear(file_dict, self.section, self.queue)
+        self.assertEqual(len(list(self.uut.run_bear_from_section([], {}))),
+                         1)
+
+        self.section.append(Setting('ignore_identifiers', 'False'))
+        self.assertEqual(list(self.uut.run_bear_from_section([], {})), [])
+
+    def test_changed_files(self):
+        bad_file = os.path.join(self.base_test_path, 'bad_code.java')
+        good_file = os.path.join(self.base_test_path, 'good_code.java')
+
+        with open(bad_file) as file:
+            bad_filelines = file.readlines()
+        with open(good_file) as file:
+            good_filelines = file.readlines()
+
+        def get_affected_files(file_dict):
+            self.uut = CPDBear(file_dict, self.section, self.queue)
+            return [[code.file for code in result.affected_code]
+                    for result in self.uut.run_bear_from_section([], {})]
+
+        file_dict = {bad_file: bad_filelines, good_file: good_filelines}
+        # Without the index all duplicates are reported on every run
+        self.section.append(Setting('only_changed_files', 'True'))
+        for _ in range(2):
+            with patch('bears.general.CopyPasteDetector.tokenize',
+                       wraps=tokenize) as tokenize_mock:
+                self.assertEqual(get_affected_files(file_dict),
+                                 [[bad_file, bad_file]])
+                self.assertEqual(tokenize_mock.call_count, 2)
+
+        self.section.append(Setting('clone_index_size', '100'))
+        self.assertEqual(get_affected_files(file_dict),
+                         [[bad_file, bad_file]])
+        self.assertEqual(get_affected_files(file_dict), [])
+
+        # The unchanged file is still compared to the changed one
+        copy_file = os.path.join(self.base_test_path, 'copy.java')
+        file_dict[copy_file] = bad_filelines
+        affected_files = [[bad_file, copy_file],
+                          [bad_file, bad_file, copy_file, copy_file]]
+        self.assertEqual(get_affected_files(file_dict), affected_files)
+
+        with patch('bears.general.CopyPasteDetector.tokenize',
+                   wraps=tokenize) as tokenize_mock:
+            file_dict[good_file] = good_filelines[:-1]
+            self.assertEqual(get_affected_files(file_dict), [])
+            self.assertEqual(tokenize_mock.call_count, 1)
+
+        self.section.append(Setting('only_changed_files', 'False'))
+        self.assertEqual(get_affected_files(file_dict), affected_files)
@@ -0,0 +1,134 @@
+import time
+import unittest
+
+from bears.general.CopyPasteDetector import (
+    HASH_BASE, HASH_MODULUS, SYNTAXES, find_duplicates, get_token_ids,
+    get_window_hashes, tokenize)
+from bears.general.CPDBear import CPDBear
+
+
+class CopyPasteDetectorTest(unittest.TestCase):
+
+    def test_syntaxes(self):
+        self.assertEqual(set(CPDBear.language_dict.values()), set(SYNTAXES))
+        for language in SYNTAXES:
+            self.assertEqual(tokenize('', language), ([], [], []))
+
+    def test_tokenize(self):
+        text = ('/* A\n'
+                '   comment */\n'
+                'String s = "a // b" + 1.5e-3; // c\n'
+                'if (s) {\n'
+                '}\n')
+        values, start_lines, end_lines = tokenize(text, 'java')
+        self.assertEqual(values, ['ID', 'ID', '=', '"a // b"', '+', '1.5e-3',
+                                  ';', 'if', '(', 'ID', ')', '{', '}'])
+        self.assertEqual(start_lines, [3] * 7 + [4] * 5 + [5])
+        self.assertEqual(end_lines, start_lines)
+
+        values, _, _ = tokenize(text, 'java', ignore_identifiers=False,
+                                ignore_literals=True)
+        self.assertEqual(values[:7],
+                         ['String', 's', '=', 'LITERAL', '+', 'LITERAL',
+                          ';'])
+
+        _, start_lines, end_lines = tokenize('s = """a\nb\n"""\n', 'python')
+        self.assertEqual(start_lines, [1, 1, 1])
+        self.assertEqual(end_lines, [1, 1, 3])
+
+        # Keywords of case insensitive languages are normalized
+        values, _, _ = tokenize('BEGIN null; End;', 'plsql')
+        self.assertEqual(values, ['begin', 'null', ';', 'end', ';'])
+
+    def test_ignore_annotations(self):
+        text = ('@Override\n'
+                '@SuppressWarnings({"a", "b"})\n'
+                'public @javax.annotation.Nullable String f() {}\n')
+        values, start_lines, _ = tokenize(text, 'java',
+                                          ignore_annotations=True)
+        self.assertEqual(values, ['public', 'ID', 'ID', '(', ')', '{', '}'])
+        self.assertEqual(start_lines, [3] * 7)
+        self.assertIn('@', tokenize(text, 'java')[0])
+
+    def test_ignore_usings(self):
+        text = ('using System.IO;\n'
+                'using (var file = Open()) {}\n')
+        values, _, _ = tokenize(text, 'cs', ignore_usings=True)
+        self.assertEqual(values, ['using', '(', 'var', 'ID', '=', 'ID', '(',
+                                  ')', ')', '{', '}'])
+
+    def test_get_window_hashes(self):
+        token_ids = get_token_ids(['a', 'b', 'c', 'a', 'b', 'c', 'a'])
+        self.assertEqual(get_token_ids(['a']), token_ids[:1])
+
+        def get_hash(window):
+            result = 0
+            for token_id in window:
+                result = (result * HASH_BASE + token_id) % HASH_MODULUS
+            return result
+
+        self.assertEqual(get_window_hashes(token_ids, 3),
+                         [get_hash(token_ids[index:index + 3])
+                          for index in range(5)])
+        self.assertEqual(get_window_hashes(token_ids, 8), [])
+
+    def test_find_duplicates(self):
+        def get_file(key, text):
+            values = text.split()
+            return key, values, get_window_hashes(get_token_ids(values), 4)
+
+        files = [get_file('a', 'x 1 2 3 4 5 y 1 2 3 4 5 z'),
+                 get_file('b', '0 1 2 3 4 5 6 w 1 2 3 4'),
+                 get_file('c', '1 2 3 z')]
+        duplicates = [(5, [('a', 1), ('a', 7), ('b', 1)]),
+                      (4, [('a', 1), ('a', 7), ('b', 1), ('b', 8)])]
+        self.assertEqual(find_duplicates(files, 4), duplicates)
+        self.assertEqual(find_duplicates(files, 4, changed={'b'}),
+                         duplicates)
+        self.assertEqual(find_duplicates(files, 4, changed={'c'}), [])
+
+    def test_find_overlapping_duplicates(self):
+        values = 'a b c d a b c d a'.split()
+        files = [('a', values, get_window_hashes(get_token_ids(values), 3))]
+        self.assertEqual(find_duplicates(files, 3),
+                         [(4, [('a', 0), ('a', 4)])])
+
+        # Periodic runs count as a single occurrence
+        values = 'a b a b a b a b a b'.split()
+        files = [('a', values, get_window_hashes(get_token_ids(values), 4))]
+        self.assertEqual(find_duplicates(files, 4), [])
+        files.append(('b', values, files[0][2]))
+        self.assertEqual(find_duplicates(files, 4),
+                         [(10, [('a', 0), ('b', 0)])])
+
+    def test_find_repetitive_duplicates(self):
+        def get_files(text, language, count=1):
+            values, _, _ = tokenize(text, language)
+            hashes = get_window_hashes(get_token_ids(values), 20)
+            return [(key, values, hashes) for key in range(count)]
+
+        def get_duplicates(files):
+            start = time.perf_counter()
+            duplicates = find_duplicates(files, 20)
+            self.assertLess(time.perf_counter() - start, 1)
+            return [(length, len(positions))
+                    for length, positions in duplicates]
+
+        zeros = ('class A {\n    int[] zeros = {' + ', '.join(['0'] * 800) +
+                 '};\n}\n')
+        self.assertEqual(get_duplicates(get_files(zeros, 'java')), [])
+        self.assertEqual(get_duplicates(get_files(zeros, 'java', 2)),
+                         [(1611, 2)])
+
+        fields = 'def __init__(self):\n' + ''.join(
+            '    self.field_{} = None\n'.format(index)
+            for index in range(200))
+        self.assertEqual(get_duplicates(get_files(fields, 'python')), [])
+
+        # Blocks repeated in a row are a single duplicate
+        block = ''.join('    self.field_{} = {}\n'.format(index, index)
+                        for index in range(4))
+        self.assertEqual(get_duplicates(get_files(
+                             'def __init__(self):\n' + block * 100,
+                             'python')),
+                         [(20, 100)])
@@ -1,5 +1,7 @@
 import unittest
 import os
+from collections import OrderedDict
+from unittest.mock import patch
 
 from coalib.settings.Section import Section
 from coalib.results.RESULT_SEVERITY import RESULT_SEVERITY
@@ -63,3 +65,69 @@ class DuplicateFileBearTest(unittest.TestCase):
         messages = [result.message for result in results]
         self.assertEqual(messages, ['You included only one file'])
         self.assertEqual(results[0].severity, RESULT_SEVERITY.MAJOR)
+
+    def test_results_group(self):
+        self.file_dict = OrderedDict([('a', ('x\n', 'y\n')),
+                                      ('b', ('x\n', 'z\n')),
+                                      ('c', ('x\n', 'y\n')),
+                                      ('d', ('xy\n', '\n')),
+                                      ('e', ('x\n', 'y\n')),
+                                      ('f', ('x\n', 'z\n'))])
+        self.uut = DuplicateFileBear(self.file_dict, self.section,
+                                     self.queue)
+        results = list(self.uut.run())
+        self.assertEqual([result.message for result in results],
+                         ['File a is identical to File c, File e',
+                          'File b is identical to File f'])
+        self.assertEqual([result.affected_code[0].file
+                          for result in results],
+                         [os.path.abspath('a'), os.path.abspath('b')])
+
+    def test_digest_collision(self):
+        self.file_dict = {'a': ('x\n', 'y\n'), 'b': ('x\n', 'z\n')}
+        self.uut = DuplicateFileBear(self.file_dict, self.section,
+                                     self.queue)
+        with patch('bears.general.DuplicateFileBear.get_digest',
+                   return_value=b''):
+            self.assertEqual(list(self.uut.run()), [])
+
+    def test_near_duplicates(self):
+        code = ['def function_{}(argument):\n'.format(index)
+                for index in range(30)]
+        self.file_dict = OrderedDict([
+            ('original.py', ['# Copyright coala\n'] + code),
+            ('copy.py', ['# Copyright someone else\n', '\n'] + code),
+            ('identical.py', ['# Copyright coala\n'] + code),
+            ('formatted.py', ['  def   function_{}(argument):  \n'.format(
+                index) for index in range(30)]),
+            ('other.py', ['value_{} = {}\n'.format(index, index)
+                          for index in range(30)]),
+            ('empty.py', [])])
+        self.uut = DuplicateFileBear(self.file_dict, self.section,
+                                     self.queue)
+
+        results = list(self.uut.run(near_duplicate_threshold=0.8))
+        # The exact similarities are 28/30, 28/29 and 28/29
+        self.assertEqual(
+            [result.message for result in results],
+            ['File original.py is identical to File identical.py',
+             'File original.py is similar to File copy.py (88% of their '
+             'contents are shared)',
+             'File original.py is similar to File formatted.py (95% of '
+             'their contents are shared)',
+             'File copy.py is similar to File formatted.py (92% of their '
+             'contents are shared)'])
+
+        results = list(self.uut.run(near_duplicate_threshold=1))
+        self.assertEqual(len(results), 1)
+
+    def test_near_duplicates_without_numpy(self):
+        self.file_dict = OrderedDict([('a.py', ['a\n']), ('b.py', ['a\n'])])
+        self.uut = DuplicateFileBear(self.file_dict, self.section,
+                                     self.queue)
+
+        with patch('bears.general.DuplicateFileBear.MinHashLSH', None):
+            results = list(self.uut.run(near_duplicate_threshold=0.8))
+        self.assertEqual([result.message for result in results],
+                         ['File a.py is identical to File b.py'])
+        self.assertIn('needs NumPy', self.queue.get(timeout=0).message)
@@ -1,6 +1,7 @@
 import io
 from queue import Queue
 import requests
+import threading
 import requests_mock
 import unittest
 import unittest.mock
@@ -19,6 +20,9 @@ def custom_matcher_https(request):
     URL to be the response and if it is 'i' then the https returns a 400
     code.
 
+    The root page of every host responds with 200, so all hosts support
+    https.
+
     For connection checking url, it always passes 200 (prerequisite checking).
 
     For URLs with no status codes appended, a ``RequestException`` is raised.
@@ -32,7 +36,8 @@ def custom_matcher_https(request):
 
     # the connection check url needs to be explicitly
     # set to 200
-    if request.url == URLHeadBear.check_connection_url:
+    if (request.url == URLHeadBear.check_connection_url or
+            request.path_url == '/'):
         status_code = 200
     else:
         try:
@@ -107,3 +112,57 @@ class HTTPSBearTest(LocalBearTestHelper):
         with requests_mock.Mocker() as m:
             m.add_matcher(custom_matcher_https)
             self.check_validity(self.uut, test_link)
+
+    def test_host_probes(self):
+        test_file = """
+        http://coala.io/v200
+        http://coala.io/v201
+        http://gitlab.com/v200
+        http://gitlab.com/v201
+        http://github.com/v200
+        """.splitlines()
+
+        with requests_mock.Mocker() as m:
+            m.add_matcher(custom_matcher_https)
+            m.head('https://gitlab.com/', exc=requests.exceptions.SSLError)
+            m.head('https://github.com/',
+                   exc=requests.exceptions.ConnectTimeout)
+
+            self.check_line_result_count(self.uut, test_file, [1, 1])
+
+            requested_urls = [request.url for request in m.request_history]
+            self.assertEqual(requested_urls.count('https://coala.io/'), 1)
+            self.assertIn('https://coala.io/v201', requested_urls)
+            for link in ('https://gitlab.com/v200', 'https://gitlab.com/v201',
+                         'https://github.com/v200'):
+                self.assertNotIn(link, requested_urls)
+
+    def test_host_probe_read_timeout(self):
+        test_file = """
+        http://coala.io/v200
+        """.splitlines()
+
+        with requests_mock.Mocker() as m:
+            m.add_matcher(custom_matcher_https)
+            m.head('https://coala.io/', exc=requests.exceptions.ReadTimeout)
+
+            self.check_line_result_count(self.uut, test_file, [1])
+
+    def test_slow_host_probe(self):
+        test_file = ['http://slow.io/v200 http://coala.io/v200']
+        link_probed = threading.Event()
+        waited_for_host = []
+
+        def matcher(request):
+            if request.url == 'https://slow.io/':
+                # The links of other hosts are probed meanwhile
+                waited_for_host.append(link_probed.wait(5))
+            elif request.url == 'https://coala.io/v200':
+                link_probed.set()
+            return custom_matcher_https(request)
+
+        with requests_mock.Mocker() as m:
+            m.add_matcher(matcher)
+            self.check_line_result_count(self.uut, test_file, [2])
+
+        self.assertEqual(waited_for_host, [True])
@@ -0,0 +1,246 @@
+import socket
+import threading
+import time
+import unittest
+import unittest.mock
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from tempfile import TemporaryDirectory
+
+import requests
+
+from bears.general.HeadRequestEngine import HeadRequestEngine
+from bears.general.HostScheduler import HostUnavailableError
+from bears.general.PersistentCache import PersistentCache
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """
+    Responds with the status code given by the last three characters of
+    the path, after a short delay so requests overlap.
+
+    Paths starting with ``/redirect`` redirect to the path without that
+    prefix and ``/loop`` redirects to itself.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        server = self.server
+        host = self.headers['Host']
+        with server.lock:
+            server.requests[host] += 1
+            server.in_flight[host] += 1
+            server.max_in_flight[host] = max(server.max_in_flight[host],
+                                             server.in_flight[host])
+            server.max_in_flight_total = max(
+                server.max_in_flight_total,
+                sum(server.in_flight.values()))
+
+        time.sleep(0.02)
+        if self.path.startswith('/redirect/'):
+            self.send_response(302)
+            self.send_header('Location', self.path[len('/redirect'):])
+        elif self.path == '/loop':
+            self.send_response(301)
+            self.send_header('Location', '/loop')
+        else:
+            self.send_response(int(self.path[-3:]))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+        with server.lock:
+            server.in_flight[host] -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class HeadRequestEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = Counter()
+        self.server.in_flight = Counter()
+        self.server.max_in_flight = Counter()
+        self.server.max_in_flight_total = 0
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_head_all(self):
+        hosts = ('127.0.0.1:{}'.format(self.port),
+                 'localhost:{}'.format(self.port))
+        urls = ['http://{}/{}/status/{}'.format(hosts[index % 2], index,
+                                                200 + index % 7)
+                for index in range(30)]
+        uut = HeadRequestEngine(max_requests=3, max_requests_per_host=2)
+        try:
+            responses = list(uut.head_all((url, 5) for url in urls))
+        finally:
+            uut.close()
+
+        self.assertEqual([response.status_code for response in responses],
+                         [200 + index % 7 for index in range(30)])
+        self.assertEqual([response.url for response in responses], urls)
+        self.assertEqual(self.server.requests,
+                         Counter({hosts[0]: 15, hosts[1]: 15}))
+        self.assertLessEqual(self.server.max_in_flight_total, 3)
+        self.assertLessEqual(max(self.server.max_in_flight.values()), 2)
+
+    def test_memo(self):
+        url = 'http://127.0.0.1:{}/status/404'.format(self.port)
+        other_url = 'HTTP://127.0.0.1:{}/status/404#anchor'.format(self.port)
+        uut = HeadRequestEngine()
+        try:
+            responses = list(uut.head_all([(url, 5), (other_url, 5),
+                                           (url, 5)]))
+            self.assertEqual(uut.head(url, 5), responses[0])
+            uut.head(url, 10)
+        finally:
+            uut.close()
+
+        self.assertIs(responses[0], responses[1])
+        self.assertIs(responses[0], responses[2])
+        self.assertEqual(sum(self.server.requests.values()), 2)
+
+    def test_resolve_all(self):
+        base_url = 'http://127.0.0.1:{}'.format(self.port)
+        uut = HeadRequestEngine()
+        try:
+            chains = list(uut.resolve_all(
+                (base_url + path, 5)
+                for path in ('/redirect/redirect/200', '/redirect/200',
+                             '/404', '/loop')))
+            (limited_chain, final_url), = uut.resolve_all(
+                [(base_url + '/redirect/redirect/200', 5)], max_redirects=1)
+        finally:
+            uut.close()
+
+        def get_status_codes(chain):
+            return [response.status_code for response in chain[0]]
+
+        self.assertEqual([get_status_codes(chain) for chain in chains],
+                         [[302, 302, 200], [302, 200], [404], [301]])
+        self.assertEqual([chain[1] for chain in chains],
+                         [base_url + '/200', base_url + '/200',
+                          base_url + '/404', base_url + '/loop'])
+        self.assertEqual(chains[0][0][1:], chains[1][0])
+        self.assertEqual(sum(self.server.requests.values()), 5)
+
+        self.assertEqual(
+            [response.status_code for response in limited_chain],
+            [302, 302])
+        self.assertEqual(final_url, base_url + '/redirect/200')
+
+    def test_status_cache(self):
+        urls = ['http://127.0.0.1:{}/status/{}'.format(self.port, status)
+                for status in (200, 301, 404)]
+        with TemporaryDirectory() as directory:
+            def get_status_codes(status_cache_ttl, negative_status_cache_ttl):
+                uut = HeadRequestEngine(
+                    status_cache=PersistentCache(directory, 10),
+                    status_cache_ttl=status_cache_ttl,
+                    negative_status_cache_ttl=negative_status_cache_ttl)
+                try:
+                    return [response.status_code
+                            for response in uut.head_all((url, 5)
+                                                         for url in urls)]
+                finally:
+                    uut.close()
+
+            self.assertEqual(get_status_codes(60, 0), [200, 301, 404])
+            self.assertEqual(sum(self.server.requests.values()), 3)
+
+            # Only the negative result expired
+            self.assertEqual(get_status_codes(60, 0), [200, 301, 404])
+            self.assertEqual(sum(self.server.requests.values()), 4)
+
+            self.assertEqual(get_status_codes(60, 60), [200, 301, 404])
+            self.assertEqual(get_status_codes(60, 60), [200, 301, 404])
+            self.assertEqual(sum(self.server.requests.values()), 4)
+
+            with unittest.mock.patch('time.time',
+                                     return_value=time.time() + 120):
+                self.assertEqual(get_status_codes(60, 60), [200, 301, 404])
+            self.assertEqual(sum(self.server.requests.values()), 7)
+
+    def test_status_cache_redirect(self):
+        url = 'http://127.0.0.1:{}/redirect/200'.format(self.port)
+        with TemporaryDirectory() as directory:
+            for _ in range(2):
+                uut = HeadRequestEngine(
+                    status_cache=PersistentCache(directory, 10),
+                    status_cache_ttl=60)
+                try:
+                    (responses, final_url), = uut.resolve_all([(url, 5)])
+                finally:
+                    uut.close()
+
+                self.assertEqual(final_url,
+                                 'http://127.0.0.1:{}/200'.format(self.port))
+        self.assertEqual(sum(self.server.requests.values()), 2)
+
+    def test_status_cache_connection_error(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        url = 'http://127.0.0.1:{}/200'.format(port)
+        with TemporaryDirectory() as directory:
+            for _ in range(2):
+                uut = HeadRequestEngine(
+                    status_cache=PersistentCache(directory, 10),
+                    negative_status_cache_ttl=60)
+                try:
+                    response = uut.head(url, 5)
+                finally:
+                    uut.close()
+
+                self.assertIsInstance(response,
+                                      requests.exceptions.ConnectionError)
+
+    def test_connection_error(self):
+        # Find a port nothing listens on
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        uut = HeadRequestEngine(max_requests=1, max_requests_per_host=1)
+        try:
+            response = uut.head('http://127.0.0.1:{}/200'.format(port), 5)
+        finally:
+            uut.close()
+
+        self.assertIsInstance(response, requests.exceptions.ConnectionError)
+
+    def test_circuit_breaker(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        uut = HeadRequestEngine(max_requests=1, max_connection_failures=2)
+        try:
+            responses = list(uut.head_all(
+                ('http://127.0.0.1:{}/{}'.format(port, index), 5)
+                for index in range(4)))
+        finally:
+            uut.close()
+
+        self.assertEqual([type(response) for response in responses],
+                         [requests.exceptions.ConnectionError] * 2 +
+                         [HostUnavailableError] * 2)
+
+    def test_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            HeadRequestEngine(max_requests=0)
@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from bears.general.HostScheduler import (HostScheduler, HostUnavailableError,
+                                         get_host_setting,
+                                         parse_host_settings)
+
+
+class HostSettingsTest(unittest.TestCase):
+
+    def test_host_settings(self):
+        settings = parse_host_settings({'https://coala.io/docs': 10,
+                                        'http://gitlab.com': 2,
+                                        '*': 20})
+        self.assertEqual(settings, {'coala.io': 10, 'gitlab.com': 2,
+                                    '*': 20})
+
+        self.assertEqual(get_host_setting(settings, 'coala.io', 15), 10)
+        self.assertEqual(get_host_setting(settings, 'github.com', 15), 20)
+        self.assertEqual(get_host_setting({}, 'github.com', 15), 15)
+
+
+class HostSchedulerTest(unittest.TestCase):
+
+    def test_rate_limit(self):
+        uut = HostScheduler(2, {'coala.io': 4, '*': 0})
+        sleeps = []
+        with patch('time.monotonic', return_value=100), \
+                patch('time.sleep', side_effect=sleeps.append):
+            for _ in range(3):
+                with uut.request('coala.io'):
+                    pass
+            with uut.request('gitlab.com'):
+                pass
+
+        self.assertEqual(sleeps, [0.25, 0.5])
+
+    def test_circuit_breaker(self):
+        uut = HostScheduler(2, max_connection_failures=2)
+        failure = requests.exceptions.ConnectTimeout()
+
+        uut.report('coala.io', failure)
+        uut.report('coala.io', requests.models.Response())
+        uut.report('coala.io', failure)
+        self.assertTrue(uut.is_available('coala.io'))
+        with uut.request('coala.io'):
+            pass
+
+        uut.report('coala.io', requests.exceptions.ReadTimeout())
+        self.assertFalse(uut.is_available('coala.io'))
+        self.assertTrue(uut.is_available('gitlab.com'))
+        with self.assertRaises(HostUnavailableError):
+            with uut.request('coala.io'):
+                pass
+
+        # Skipped requests don't count, other errors reset the count
+        uut.report('coala.io', HostUnavailableError())
+        uut.report('gitlab.com', failure)
+        uut.report('gitlab.com', requests.exceptions.InvalidURL())
+        uut.report('gitlab.com', failure)
+        self.assertTrue(uut.is_available('gitlab.com'))
+
+    def test_circuit_breaker_disabled(self):
+        uut = HostScheduler(2)
+        for _ in range(10):
+            uut.report('coala.io', requests.exceptions.ConnectionError())
+        self.assertTrue(uut.is_available('coala.io'))
@@ -2,8 +2,10 @@ import unittest
 
 from queue import Queue
 
-from bears.general.IndentationBear import IndentationBear
+from bears.general.IndentationBear import (IndentationBear,
+                                           UnmatchedIndentError)
 from bears.general.AnnotationBear import AnnotationBear
+from bears.general.RangeIndex import RangeIndex
 from coalib.settings.Section import Section
 from coalib.settings.Setting import Setting
 from coalib.bearlib.languages import Language
@@ -291,3 +293,30 @@ class IndentationBearTest(unittest.TestCase):
         valid_file = ('This is a valid specifier: # A comment\n',
                       '\tand so it indents\n')
         self.verify_bear(valid_file)
+
+    def test_get_block_ranges(self):
+        file = ('{ ( "}" \\{\n',
+                '} ) /* ) */\n',
+                '(<)>\n')
+        annotation_dict = {
+            kind: RangeIndex(ranges) for kind, ranges in
+            list(self.dep_uut.execute('file', file))[0].contents.items()}
+        uut = IndentationBear(self.section, Queue())
+
+        ranges = uut.get_block_ranges(file, 'file', {'{': '}', '(': ')'},
+                                      annotation_dict)
+        self.assertEqual(
+            [(_range.start.line, _range.start.column,
+              _range.end.line, _range.end.column) for _range in ranges],
+            [(1, 1, 2, 1), (1, 3, 2, 3), (3, 1, 3, 3)])
+
+        ranges = uut.get_block_ranges(file, 'file', {'(': ')', '<': '>'},
+                                      annotation_dict)
+        self.assertEqual(
+            [(_range.start.line, _range.start.column,
+              _range.end.line, _range.end.column) for _range in ranges],
+            [(1, 3, 2, 3), (3, 1, 3, 3), (3, 2, 3, 4)])
+
+        with self.assertRaisesRegex(UnmatchedIndentError, r'\[, \]'):
+            uut.get_block_ranges(file + ('[]]\n', '{\n'), 'file',
+                                 {'[': ']', '{': '}'}, annotation_dict)
@@ -275,6 +275,44 @@ class InvalidLinkBearTest(LocalBearTestHelper):
                 settings={'follow_redirects': 'true'},
                 filename='short_url_redirect_text')
 
+    def test_unresolved_redirects(self):
+        moved = ['http://coala.io/moved\n']
+        loop = ['http://coala.io/loop\n']
+
+        with requests_mock.Mocker() as m:
+            m.head('http://coala.io/moved', status_code=301,
+                   headers={'Location': 'http://coala.io/moved/'})
+            m.head('http://coala.io/moved/', status_code=200)
+            m.head('http://coala.io/loop', status_code=301,
+                   headers={'Location': 'http://coala.io/loop/'})
+            m.head('http://coala.io/loop/', status_code=302,
+                   headers={'Location': 'http://coala.io/loop'})
+
+            diff = Diff(moved)
+            diff.modify_line(1, 'http://coala.io/moved/\n')
+            self.check_results(
+                self.uut, moved,
+                [Result.from_values(
+                    'InvalidLinkBear',
+                    'This link redirects to http://coala.io/moved/',
+                    severity=RESULT_SEVERITY.NORMAL,
+                    line=1,
+                    file='moved',
+                    diffs={'moved': diff})],
+                settings={'follow_redirects': 'true'},
+                filename='moved')
+
+            # The redirect isn't followed, so where it ends is unknown
+            dep_bear = URLHeadBear(self.section, Queue())
+            deps_results = dict(URLHeadBear=list(dep_bear.run(
+                'moved', moved, max_redirects=0)))
+            self.assertEqual(list(self.uut.run('moved', moved, deps_results,
+                                               follow_redirects=True)),
+                             [])
+            # The redirects never end
+            self.check_validity(self.uut, loop,
+                                settings={'follow_redirects': 'true'})
+
     def test_multiple_results_per_line(self):
         test_file = """
         http://httpbin.org/status/410
@@ -448,7 +486,7 @@ class InvalidLinkBearTest(LocalBearTestHelper):
             return res
 
         with unittest.mock.patch(
-                'tests.general.InvalidLinkBearTest.requests.head',
+                'tests.general.InvalidLinkBearTest.requests.Session.head',
                 return_value=response(status_code=200)) as mock:
             self.check_validity(self.uut, file_contents,
                                 settings={'network_timeout': nt})
@@ -462,7 +500,8 @@ class InvalidLinkBearTest(LocalBearTestHelper):
                                   'instead.'])
 
             self.check_validity(self.uut, ['https://gitmate.io'])
-            mock.assert_has_calls([
+            # The requests are sent concurrently
+            mock.assert_has_calls(any_order=True, calls=[
                 unittest.mock.call('https://facebook.com/', timeout=2,
                                    allow_redirects=False),
                 unittest.mock.call('https://google.com/',
@@ -217,6 +217,71 @@ class KeywordBearDiffTest(unittest.TestCase):
                                                 " 'Issue #123' which resulted "
                                                 'in a match with given regex.')
 
+    def test_keywords_and_regex(self):
+        text = ['# ToDo: fix issue #12 and (issue #12)\n',
+                'todo = 1\n']
+
+        regex_keyword = r'(\()?[iI]ssue #[1-9][0-9]*(?(1)\))'
+
+        with execute_bear(self.uut, filename='F', file=text,
+                          regex_keyword=regex_keyword,
+                          dependency_results=self.dep_results) as result:
+            self.assertEqual(
+                [(res.affected_code[0].start.line,
+                  res.affected_code[0].start.column,
+                  res.message) for res in result],
+                [(1, 3, "The line contains the keyword 'ToDo'."),
+                 (2, 1, "The line contains the keyword 'todo'."),
+                 (1, 13, "The line contains the keyword 'issue #12' which "
+                         'resulted in a match with given regex.'),
+                 (1, 27, "The line contains the keyword '(issue #12)' which "
+                         'resulted in a match with given regex.')])
+
+    def test_keyword_overlapping_regex(self):
+        text = ['# TODO(alice)\n']
+
+        with execute_bear(self.uut, filename='F', file=text,
+                          regex_keyword=r'TODO\(\w+\)',
+                          dependency_results=self.dep_results) as result:
+            self.assertEqual(
+                [(res.affected_code[0].start.column,
+                  res.affected_code[0].end.column,
+                  res.message) for res in result],
+                [(3, 7, "The line contains the keyword 'TODO'."),
+                 (3, 14, "The line contains the keyword 'TODO(alice)' which "
+                         'resulted in a match with given regex.')])
+
+    def test_comments_only(self):
+        self.section.append(Setting('keywords', 'todo, fixme'))
+        text = ['todo = "todo"  # TODO: one\n',
+                '/* fixme\n',
+                '   todo */ todo\n']
+        comments = [SourceRange.from_values('F', 1, 16, 1, 27),
+                    SourceRange.from_values('F', 2, 1, 3, 10)]
+        dep_results = {
+            'AnnotationBear': [
+                self.annotation_bear_result_type({'comments': comments})
+            ]
+        }
+
+        with execute_bear(self.uut, filename='F', file=text,
+                          comments_only=True,
+                          dependency_results=dep_results) as result:
+            self.assertEqual(
+                [(res.affected_code[0].start.line,
+                  res.affected_code[0].start.column,
+                  res.message) for res in result],
+                [(1, 18, "The line contains the keyword 'TODO'."),
+                 (2, 4, "The line contains the keyword 'fixme'."),
+                 (3, 4, "The line contains the keyword 'todo'.")])
+            self.assertEqual(result[0].diffs['F'].modified[0],
+                             'todo = "todo"\n')
+
+        with execute_bear(self.uut, filename='F', file=text,
+                          comments_only=True,
+                          dependency_results=self.dep_results) as result:
+            self.assertEqual(result, [])
+
     def test_wrong_language(self):
         self.section.append(Setting('language', 'anything'))
         logger = logging.getLogger()
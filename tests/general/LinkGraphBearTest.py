@@ -0,0 +1,170 @@
+import os
+import unittest
+from queue import Queue
+from tempfile import TemporaryDirectory
+
+import requests_mock
+
+from bears.general.LinkGraphBear import (LinkGraphBear, SiteIndex,
+                                         get_anchors, get_local_links)
+from coalib.settings.Section import Section
+from coalib.settings.Setting import Setting
+from tests.general.InvalidLinkBearTest import custom_matcher
+
+
+class LinkGraphFunctionsTest(unittest.TestCase):
+
+    def test_get_anchors(self):
+        markdown = ['# Getting Started\n',
+                    '```\n',
+                    '# Not a heading\n',
+                    '```\n',
+                    'Usage\n',
+                    '-----\n',
+                    '## Usage ##\n',
+                    '<a name="custom"></a>\n']
+        self.assertEqual(get_anchors('README.md', markdown),
+                         {'getting-started', 'usage', 'usage-1', 'custom'})
+
+        rst = ['.. _install-guide:\n',
+               '\n',
+               '=====\n',
+               'Title\n',
+               '=====\n',
+               '\n',
+               '1. Installing coala\n',
+               '--------------------\n',
+               'Too long\n',
+               '---\n']
+        self.assertEqual(get_anchors('index.rst', rst),
+                         {'install-guide', 'title', 'installing-coala'})
+
+        self.assertEqual(get_anchors('page.html', ['<h1 id="top">\n']),
+                         {'top'})
+        self.assertIsNone(get_anchors('setup.py', ['# Heading\n']))
+
+    def test_get_local_links(self):
+        markdown = ['See [the guide](guide.md#usage "Guide") and '
+                    '![logo](<img/logo.png>).\n',
+                    '[coala](https://coala.io) [mail](mailto:a@b.c)\n',
+                    '```\n',
+                    '[code](not-a-link.md)\n',
+                    '```\n',
+                    '[ref]: ../index.md\n',
+                    '<a href="#top">top</a>\n']
+        self.assertEqual(list(get_local_links('README.md', markdown)),
+                         [(1, 17, 'guide.md#usage'),
+                          (1, 54, 'img/logo.png'),
+                          (6, 8, '../index.md'),
+                          (7, 10, '#top')])
+
+        rst = ['`Guide <guide.html>`_ and `label <label_>`_\n',
+               '.. _coala: https://coala.io\n',
+               '.. _guide: /docs/guide.html\n']
+        self.assertEqual(list(get_local_links('index.rst', rst)),
+                         [(1, 9, 'guide.html'), (3, 12, '/docs/guide.html')])
+
+        self.assertEqual(list(get_local_links('a.py', ['[a](b.md)\n'])), [])
+
+    def test_site_index(self):
+        with TemporaryDirectory() as directory:
+            files = [os.path.join(directory, name)
+                     for name in ('README.md',
+                                  os.path.join('docs', 'index.rst'),
+                                  os.path.join('docs', 'guide.md'))]
+            uut = SiteIndex({filename: () for filename in files})
+
+            self.assertEqual(uut.find_file(files[0]), files[0])
+            self.assertEqual(uut.find_file(
+                os.path.join(directory, 'docs', '..', 'README.md')), files[0])
+            self.assertEqual(uut.find_file(os.path.join(directory, 'docs')),
+                             files[1])
+            self.assertEqual(
+                uut.find_file(os.path.join(directory, 'docs', 'guide.html')),
+                files[2])
+            self.assertEqual(
+                uut.find_file(os.path.join(directory, 'docs', 'guide')),
+                files[2])
+            self.assertIsNone(uut.find_file(
+                os.path.join(directory, 'docs', 'guide.txt')))
+            self.assertIsNone(uut.find_file(os.path.join(directory, 'api')))
+
+
+class LinkGraphBearTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.section = Section('')
+        self.section.append(Setting('site_root', self.directory.name))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def get_results(self, files):
+        file_dict = {os.path.join(self.directory.name, name): lines
+                     for name, lines in files.items()}
+        uut = LinkGraphBear(file_dict, self.section, Queue())
+        with requests_mock.Mocker() as m:
+            m.add_matcher(custom_matcher)
+            results = list(uut.run_bear_from_section([], {}))
+        self.request_history = m.request_history
+        return results
+
+    def test_local_links(self):
+        with open(os.path.join(self.directory.name, 'logo.png'), 'w'):
+            pass
+
+        results = self.get_results({
+            'README.md': ['# coala\n',
+                          '[Guide](docs/guide.md#usage) '
+                          '[Missing](docs/missing.md)\n',
+                          '![Logo](logo.png) [Top](#coala) [Bad](#nope)\n',
+                          '[Rendered](docs/guide.html#nope)\n'],
+            os.path.join('docs', 'guide.md'): ['## Usage\n',
+                                               '[Home](../README.md)\n',
+                                               '[Root](/README.md#coala)\n']})
+
+        self.assertEqual(
+            [(os.path.basename(result.affected_code[0].file),
+              result.affected_code[0].start.line,
+              result.affected_code[0].start.column, result.message)
+             for result in results],
+            [('README.md', 2, 40,
+              'Broken link - docs/missing.md points to a file that does not '
+              'exist'),
+             ('README.md', 3, 39,
+              'Broken link - #nope points to an anchor that does not exist '
+              'in ' + os.path.join(self.directory.name, 'README.md')),
+             ('README.md', 4, 12,
+              'Broken link - docs/guide.html#nope points to an anchor that '
+              'does not exist in ' +
+              os.path.join(self.directory.name, 'docs', 'guide.md'))])
+        self.assertEqual(list(self.request_history), [])
+
+    def test_site_url(self):
+        self.section.append(Setting('site_url', 'https://docs.coala.io'))
+        results = self.get_results({
+            'index.rst': ['Installation\n',
+                          '============\n',
+                          'https://docs.coala.io/index.html#installation\n',
+                          'https://docs.coala.io/missing.html\n']})
+
+        self.assertEqual([result.affected_code[0].start.line
+                          for result in results], [4])
+        self.assertEqual(list(self.request_history), [])
+
+    def test_external_links(self):
+        files = {'README.md': ['https://coala.io/200 https://coala.io/404\n',
+                               '[Guide](https://gitlab.com/coala/500)\n']}
+        results = self.get_results(files)
+
+        self.assertEqual([result.message for result in results],
+                         ['Broken link - HTTP Error: 404 generated when '
+                          'connecting to https://coala.io/404',
+                          'Broken link - HTTP Error: 500 generated when '
+                          'connecting to https://gitlab.com/coala/500'])
+        self.assertEqual(len(self.request_history), 3)
+
+        self.section.append(Setting('check_external_links', False))
+        self.assertEqual(self.get_results(files), [])
+        self.assertEqual(list(self.request_history), [])
@@ -4,12 +4,16 @@ import os
 import requests
 import requests_mock
 import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
+from bears.general.HeadRequestEngine import HeadRequestEngine
 from bears.general.MementoBear import MementoBear
 from bears.general.URLHeadBear import URLHeadBear
 
 from coalib.results.Result import Result
 from coalib.settings.Section import Section
+from coalib.settings.Setting import Setting
 from coalib.results.RESULT_SEVERITY import RESULT_SEVERITY
 from coalib.testing.LocalBearTestHelper import LocalBearTestHelper
 
@@ -249,17 +253,23 @@ class MementoBearTest(LocalBearTestHelper):
             memento_archive_status_mock(m, 'http://redirect9times.com')
             generate_redirects(m, 'http://redirect9times.com', 9)
 
-            redirect_links = MementoBear.get_redirect_urls(
-                'http://redirect9times.com')
+            engine = HeadRequestEngine()
+            (responses, final_url), = engine.resolve_all(
+                [('http://redirect9times.com', 15)])
+            engine.close()
+            redirect_links = MementoBear.get_redirect_urls(responses[:-1])
             self.assertTrue(len(redirect_links) == 9)
+            self.assertEqual(final_url, 'http://redirect9times.com/9')
 
             self.check_line_result_count(self.uut, invalid_file, [9])
 
-            # Mark the first redirect url as archived
+            # Mark the first redirect url as archived. Answers are kept for
+            # the whole run, so this needs a new run.
             memento_archive_status_mock(m, 'http://redirect9times.com/1',
                                         override_head=False)
 
-            self.check_line_result_count(self.uut, invalid_file, [8])
+            uut = MementoBear(self.section, Queue())
+            self.check_line_result_count(uut, invalid_file, [8])
 
     def test_settings_follow_redirects(self):
         invalid_file = """
@@ -282,6 +292,58 @@ class MementoBearTest(LocalBearTestHelper):
             self.check_validity(self.uut, invalid_file,
                                 settings={'follow_redirects': False})
 
+    def test_lookups_are_shared(self):
+        test_file = """
+        http://coala.io/200
+        http://coala.io/200
+        """.splitlines()
+
+        with requests_mock.Mocker() as m:
+            m.add_matcher(custom_matcher)
+            memento_archive_status_mock(m, 'http://coala.io/200', False,
+                                        override_head=False)
+
+            def get_timegate_requests(request_history):
+                return [request.url for request in request_history
+                        if 'timetravel' in request.url]
+
+            self.check_line_result_count(self.uut, test_file, [1, 1])
+            first_run_requests = list(m.request_history)
+            self.check_line_result_count(self.uut, test_file, [1, 1])
+
+            # The link was looked up only once, by the first run
+            self.assertTrue(get_timegate_requests(first_run_requests))
+            self.assertFalse(get_timegate_requests(
+                m.request_history[len(first_run_requests):]))
+
+    def test_archive_status_cache(self):
+        test_file = """
+        http://coala.io/200
+        """.splitlines()
+
+        with TemporaryDirectory() as directory, \
+                patch.object(MementoBear, 'data_dir', directory):
+            self.section.append(Setting('archive_status_cache_ttl', 60))
+            self.section.append(Setting('negative_archive_status_cache_ttl',
+                                        60))
+            with requests_mock.Mocker() as m:
+                m.add_matcher(custom_matcher)
+                memento_archive_status_mock(m, 'http://coala.io/200', False,
+                                            override_head=False)
+                self.check_line_result_count(self.uut, test_file, [1])
+
+            with requests_mock.Mocker() as m:
+                m.add_matcher(custom_matcher)
+                memento_archive_status_mock(m, 'http://coala.io/200',
+                                            override_head=False)
+                uut = MementoBear(self.section, Queue())
+                self.check_line_result_count(uut, test_file, [1])
+
+                self.section.append(Setting(
+                    'negative_archive_status_cache_ttl', 0))
+                uut = MementoBear(self.section, Queue())
+                self.check_validity(uut, test_file)
+
     def test_links_to_ignore(self):
         valid_file = """
         http://coalaisthebest.compile
@@ -0,0 +1,83 @@
+import time
+import unittest
+
+import numpy
+
+from bears.general.MinHash import MinHashLSH, get_band_layout, get_shingles
+
+
+class MinHashTest(unittest.TestCase):
+
+    def test_get_shingles(self):
+        self.assertEqual(len(get_shingles([], 3)), 0)
+        self.assertEqual(len(get_shingles(['a\n', '\n', ' \t\n'], 3)), 1)
+        self.assertEqual(len(get_shingles(['a\n', 'b\n', 'c\n', 'd\n'], 3)),
+                         2)
+        numpy.testing.assert_array_equal(
+            get_shingles(['a  b\n', 'c\n'], 1),
+            get_shingles(['\n', '  a b\n', 'c  \n'], 1))
+
+    def test_get_band_layout(self):
+        for threshold in (0.3, 0.5, 0.8, 0.9, 1):
+            bands, rows = get_band_layout(threshold, 128)
+            self.assertEqual(bands * rows, 128)
+            self.assertGreaterEqual(1 - (1 - threshold ** rows) ** bands,
+                                    0.95)
+
+    def test_get_signature(self):
+        uut = MinHashLSH(0.5, num_permutations=16)
+        hashes = numpy.array([0, 1, 12345, (1 << 32) - 1], dtype=numpy.uint64)
+        prime = (1 << 61) - 1
+        self.assertEqual(
+            uut.get_signature(hashes).tolist(),
+            [min((int(a) * int(x) + int(b)) % prime & ((1 << 32) - 1)
+                 for x in hashes)
+             for a, b in zip(uut._a, uut._b)])
+
+    def test_similar_pairs(self):
+        sets = {'a': range(100),
+                'b': range(5, 105),
+                'c': range(50, 150),
+                'd': range(1000, 1100)}
+        uut = MinHashLSH(0.8)
+        for key, values in sorted(sets.items()):
+            uut.add(key, numpy.array(values, dtype=numpy.uint64))
+
+        self.assertAlmostEqual(uut.similarity('a', 'b'), 95 / 105,
+                               delta=0.1)
+        self.assertAlmostEqual(uut.similarity('a', 'c'), 50 / 150,
+                               delta=0.1)
+        self.assertEqual([pair[:2] for pair in uut.get_similar_pairs()],
+                         [('a', 'b')])
+
+    def test_common_content(self):
+        # Sets sharing a quarter of their elements land in the same buckets
+        # at low thresholds, but are not compared with each other.
+        random = numpy.random.RandomState(0)
+        common = random.randint(0, 1 << 32, 15, dtype=numpy.uint64)
+        sets = [numpy.concatenate((common, random.randint(
+                    0, 1 << 32, 45, dtype=numpy.uint64)))
+                for _ in range(2000)]
+        sets[1][15:50] = sets[0][15:50]
+        uut = MinHashLSH(0.3)
+        for index, values in enumerate(sets):
+            uut.add(index, numpy.unique(values))
+
+        start = time.perf_counter()
+        pairs = uut.get_similar_pairs()
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual([pair[:2] for pair in pairs], [(0, 1)])
+
+    def test_split_bucket(self):
+        uut = MinHashLSH(0.5, max_bucket_size=2)
+        for key in 'abc':
+            uut.add(key, numpy.arange(100, dtype=numpy.uint64))
+        uut.add('d', numpy.arange(1, 101, dtype=numpy.uint64))
+        # Identical sets are found even if their buckets are oversized
+        self.assertEqual(uut.get_similar_pairs(),
+                         [('a', 'b', 1.0), ('a', 'c', 1.0), ('b', 'c', 1.0)])
+        self.assertEqual(max(map(len, uut._buckets.values())), 4)
+
+    def test_invalid_threshold(self):
+        with self.assertRaises(ValueError):
+            MinHashLSH(0)
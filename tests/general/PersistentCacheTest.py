@@ -0,0 +1,54 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from bears.general.PersistentCache import PersistentCache
+
+
+class PersistentCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.uut = PersistentCache(self.directory.name, max_entries=10)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_set(self):
+        self.assertIsNone(self.uut.get('key'))
+        self.assertEqual(self.uut.get('key', 'fallback'), 'fallback')
+
+        self.uut['key'] = {'strings': ((1, 1, 1, 5),)}
+        self.assertEqual(self.uut.get('key'), {'strings': ((1, 1, 1, 5),)})
+
+        # Entries are shared with other instances on the same directory
+        other = PersistentCache(self.directory.name, max_entries=10)
+        self.assertEqual(other.get('key'), {'strings': ((1, 1, 1, 5),)})
+
+        del self.uut['key']
+        self.assertIsNone(other.get('key'))
+
+    def test_corrupted_entry(self):
+        self.uut['key'] = 'value'
+        with open(self.uut._get_path('key'), 'wb') as file:
+            file.write(b'no pickle')
+
+        with self.assertLogs(level='WARNING'):
+            self.assertIsNone(self.uut.get('key'))
+        self.assertFalse(os.path.exists(self.uut._get_path('key')))
+
+    def test_eviction(self):
+        for i in range(10):
+            self.uut[str(i)] = i
+            os.utime(self.uut._get_path(str(i)), (i, i))
+
+        # Reading an entry marks it as recently used
+        self.assertEqual(self.uut.get('0'), 0)
+
+        self.uut['10'] = 10
+        self.assertEqual(len(os.listdir(self.directory.name)), 9)
+        self.assertEqual(self.uut.get('0'), 0)
+        self.assertEqual(self.uut.get('10'), 10)
+        self.assertIsNone(self.uut.get('1'))
+        self.assertIsNone(self.uut.get('2'))
+        self.assertEqual(self.uut.get('3'), 3)
@@ -0,0 +1,57 @@
+import unittest
+
+from bears.general.RangeIndex import RangeIndex
+from coalib.results.SourceRange import SourceRange
+
+
+class RangeIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ranges = (SourceRange.from_values('f', 5, 1, 9, 1),
+                       SourceRange.from_values('f', 1, 2, 1, 4),
+                       SourceRange.from_values('f', 6, 3, 7, 2),
+                       SourceRange.from_values('f', 1, 8, 1, 9))
+        self.uut = RangeIndex(self.ranges)
+
+    def test_sequence(self):
+        self.assertEqual(tuple(self.uut), self.ranges)
+        self.assertEqual(len(self.uut), 4)
+        self.assertEqual(self.uut[1], self.ranges[1])
+        self.assertFalse(RangeIndex())
+
+    def test_contains_position(self):
+        def contains(line, column):
+            return self.uut.contains_position(line, column)
+
+        self.assertFalse(contains(1, 1))
+        self.assertTrue(contains(1, 2))
+        self.assertTrue(contains(1, 4))
+        self.assertFalse(contains(1, 5))
+        self.assertTrue(contains(1, 9))
+        self.assertFalse(contains(2, 1))
+        # Inside the outer range after the nested one ended
+        self.assertTrue(contains(7, 5))
+        self.assertTrue(contains(9, 1))
+        self.assertFalse(contains(9, 2))
+        self.assertFalse(RangeIndex().contains_position(1, 1))
+
+    def test_get_containing_ranges(self):
+        self.assertEqual(self.uut.get_containing_ranges(1, 3),
+                         (self.ranges[1],))
+        self.assertEqual(self.uut.get_containing_ranges(6, 3),
+                         (self.ranges[0], self.ranges[2]))
+        self.assertEqual(self.uut.get_containing_ranges(8, 1),
+                         (self.ranges[0],))
+        self.assertEqual(self.uut.get_containing_ranges(1, 5), ())
+        self.assertEqual(RangeIndex().get_containing_ranges(1, 1), ())
+
+    def test_covers_line(self):
+        self.assertEqual([line for line in range(1, 11)
+                          if self.uut.covers_line(line)],
+                         [6, 7, 8, 9])
+
+    def test_ranges_in_line(self):
+        self.assertEqual(self.uut.ranges_in_line(1),
+                         (self.ranges[1], self.ranges[3]))
+        self.assertEqual(self.uut.ranges_in_line(6), ())
+        self.assertEqual(self.uut.ranges_in_line(2), ())
@@ -53,6 +53,24 @@ class URLBearTest(unittest.TestCase):
                                'yes-green.svg/200'),
                               LINK_CONTEXT.no_context])
 
+    def test_extract_links_from_file(self):
+        file = ['<ruleset xmlns="http://xmlns.org/ns">\n',
+                'no links here\n',
+                'http://xmlns.org/ns http://coala.io/skip\n',
+                'git+https://gitlab.com/coala/bear.git@master http://coala.io',
+                '\n',
+                'see http://coala.io/about, or http://example.com\n']
+
+        self.assertEqual(
+            list(URLBear.extract_links_from_file(
+                file, r'([.\/]example\.com|\{|\$)', ['http://coala.io/skip'])),
+            [('http://xmlns.org/ns', 0, LINK_CONTEXT.xml_namespace),
+             ('http://xmlns.org/ns', 2, LINK_CONTEXT.xml_namespace),
+             ('git+https://gitlab.com/coala/bear.git@master', 3,
+              LINK_CONTEXT.pip_vcs_url),
+             ('http://coala.io', 3, LINK_CONTEXT.no_context),
+             ('http://coala.io/about', 5, LINK_CONTEXT.no_context)])
+
 
 class URLResultTest(unittest.TestCase):
 
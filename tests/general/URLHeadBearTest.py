@@ -1,4 +1,7 @@
 import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
 import requests
 import requests_mock
 
@@ -6,6 +9,7 @@ from bears.general.URLHeadBear import URLHeadBear, LINK_CONTEXT, URLHeadResult
 from coalib.results.SourceRange import SourceRange
 from coalib.testing.LocalBearTestHelper import get_results
 from coalib.settings.Section import Section
+from coalib.settings.Setting import Setting
 from queue import Queue
 from .InvalidLinkBearTest import custom_matcher
 
@@ -60,6 +64,58 @@ class URLHeadBearTest(unittest.TestCase):
                              [3, 'http://www.google.com/404',
                               404, LINK_CONTEXT.no_context])
 
+    def test_same_link_in_several_files(self):
+        file = ['http://www.google.com/200\n',
+                'http://www.google.com/200#section\n']
+
+        with requests_mock.Mocker() as m:
+            m.add_matcher(custom_matcher)
+
+            first_results = get_results(self.uut, file)
+            second_results = get_results(self.uut, file)
+
+            self.assertEqual(m.call_count, 1)
+
+        self.assertEqual([result.http_status_code
+                          for result in first_results + second_results],
+                         [200] * 4)
+
+    def test_status_cache(self):
+        file = ['http://www.google.com/200\n']
+        with TemporaryDirectory() as directory, \
+                patch.object(URLHeadBear, 'data_dir', directory):
+            self.section.append(Setting('status_cache_ttl', 60))
+            with requests_mock.Mocker() as m:
+                m.add_matcher(custom_matcher)
+                get_results(self.uut, file)
+
+            with requests_mock.Mocker() as m:
+                uut = URLHeadBear(self.section, Queue())
+                results = get_results(uut, file)
+                self.assertEqual(m.call_count, 0)
+
+        self.assertEqual(results[0].http_status_code, 200)
+
+    def test_redirects(self):
+        file = ['http://coala.io/301\n', 'http://coala.io/200\n']
+        with requests_mock.Mocker() as m:
+            m.head('http://coala.io/301', status_code=301,
+                   headers={'Location': '/new/301'})
+            m.head('http://coala.io/new/301', status_code=301,
+                   headers={'Location': 'https://coala.io/'})
+            m.head('https://coala.io/', status_code=200)
+            m.head('http://coala.io/200', status_code=200)
+
+            results = get_results(self.uut, file)
+            self.assertEqual(m.call_count, 4)
+
+        self.assertEqual(results[0].http_status_code, 301)
+        self.assertEqual([response.url for response in results[0].history],
+                         ['http://coala.io/301', 'http://coala.io/new/301'])
+        self.assertEqual(results[0].final_url, 'https://coala.io/')
+        self.assertEqual(results[1].history, [])
+        self.assertEqual(results[1].final_url, 'http://coala.io/200')
+
 
 class URLHeadResultTest(unittest.TestCase):
 